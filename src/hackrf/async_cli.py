@@ -0,0 +1,295 @@
+"""
+HackRF asyncio 介面
+以 asyncio 子程序執行 hackrf_transfer / hackrf_sweep，每個任務回傳一個 HackRFSession：
+- await session / await session.wait() 等待結束並取得結束碼
+- async for stats in session.stats()  逐筆取得每秒統計
+- async for sweep in session.sweeps() 逐輪取得掃描結果 (start_sweep 且未指定輸出檔時)
+- await session.cancel() 或 async with 結束時終止子程序 (含其程序群組)
+同一個事件迴圈即可同時驅動多台 HackRF 與多個工具，不需每個阻塞呼叫一個執行緒
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from collections import deque
+
+from hackrf.process_monitor import parse_transfer_stats, register_process, terminate_process, unregister_process
+from hackrf.sweep_stream import SweepStream
+from hackrf_wrapper import OUTPUT_HISTORY_LINES, HackRFCLI
+
+
+READ_SIZE = 65536
+# 統計 / 掃描佇列上限；消費端跟不上時丟棄最舊的資料
+FEED_SIZE = 256
+
+
+class _Feed:
+    """有界的非同步佇列 (滿時丟棄最舊項目)，close() 後迭代結束"""
+
+    _END = object()
+
+    def __init__(self, maxsize=FEED_SIZE):
+        self._queue = asyncio.Queue(maxsize)
+        self._finished = False
+        self.dropped = 0
+
+    def put(self, item):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    def close(self):
+        self.put(self._END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is self._END:
+            self._finished = True
+            raise StopAsyncIteration
+        return item
+
+
+class _TrackedProcess:
+    """
+    asyncio 子程序的 Popen 相容介面，供 process_monitor 登錄表 (atexit / 信號處理) 終止使用
+    事件迴圈已停止時子程序不會被回收，因此殭屍狀態 (Z) 也視為已結束
+    """
+
+    def __init__(self, process):
+        self._process = process
+        self.pid = process.pid
+
+    def poll(self):
+        if self._process.returncode is not None:
+            return self._process.returncode
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                state = f.read().rsplit(")", 1)[1].split()[0]
+        except FileNotFoundError:
+            return -1
+        return -1 if state == "Z" else None
+
+    def send_signal(self, sig):
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(str(self.pid), timeout)
+            time.sleep(0.02)
+        return self.poll()
+
+
+class HackRFSession:
+    """單一 hackrf_transfer / hackrf_sweep 子程序"""
+
+    def __init__(self, process, name, sweep_stream=None, on_data=None):
+        """
+        :param process: asyncio.subprocess.Process (stdout / stderr 為 PIPE，以 start_new_session=True 啟動)
+        :param name: 任務名稱
+        :param sweep_stream: 解析 stdout 掃描資料的 SweepStream
+        :param on_data: stdout 原始資料的處理函式 (例如 hackrf_transfer -r -)
+        """
+        self.process = process
+        self.name = name
+        self._tracked = _TrackedProcess(process)
+        self.start_time = time.monotonic()
+        self.total_mib = 0.0
+        self.last_stats = None
+        self.output = deque(maxlen=OUTPUT_HISTORY_LINES)
+
+        self._stats = _Feed()
+        self._sweeps = None
+        self.sweep_stream = sweep_stream
+        if sweep_stream is not None:
+            self._sweeps = _Feed()
+            sweep_stream.subscribe(self._sweeps.put)
+            on_data = sweep_stream.feed
+
+        readers = [asyncio.ensure_future(self._read_lines(process.stderr, "stderr"))]
+        if on_data is not None:
+            readers.append(asyncio.ensure_future(self._read_raw(process.stdout, on_data)))
+        else:
+            readers.append(asyncio.ensure_future(self._read_lines(process.stdout, "stdout")))
+        self._done = asyncio.ensure_future(self._finish(readers))
+
+    # ---------------- 讀取 ----------------
+
+    async def _read_lines(self, stream, stream_name):
+        buffer = b""
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            # hackrf 工具以 \n 或 \r 換行
+            *lines, buffer = (buffer + chunk).replace(b"\r", b"\n").split(b"\n")
+            for line in lines:
+                if line.strip():
+                    self._dispatch_line(stream_name, line.decode("utf-8", "replace"))
+        if buffer.strip():
+            self._dispatch_line(stream_name, buffer.decode("utf-8", "replace"))
+
+    async def _read_raw(self, stream, handler):
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                return
+            handler(chunk)
+
+    def _dispatch_line(self, stream_name, line):
+        self.output.append((stream_name, line))
+        stats = parse_transfer_stats(line)
+        if stats is None:
+            return
+        self.total_mib += stats["mib"]
+        stats["elapsed_s"] = time.monotonic() - self.start_time
+        stats["total_mib"] = self.total_mib
+        self.last_stats = stats
+        self._stats.put(stats)
+
+    async def _finish(self, readers):
+        try:
+            await asyncio.gather(*readers)
+            returncode = await self.process.wait()
+        except asyncio.CancelledError:
+            # 事件迴圈關閉 (例如 asyncio.run 結束) 時仍在執行的子程序不可留在背景繼續發射
+            terminate_process(self._tracked, timeout=1.0)
+            raise
+        finally:
+            unregister_process(self._tracked)
+            if self.sweep_stream is not None:
+                self.sweep_stream.close()
+                self._sweeps.close()
+            self._stats.close()
+        return returncode
+
+    # ---------------- 公開介面 ----------------
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    def done(self) -> bool:
+        return self._done.done()
+
+    async def wait(self):
+        """
+        等待子程序結束，回傳結束碼
+        呼叫端被取消 (例如 asyncio.wait_for 逾時) 時會一併終止子程序
+        """
+        try:
+            return await asyncio.shield(self._done)
+        except asyncio.CancelledError:
+            await self.cancel()
+            raise
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def stats(self):
+        """每秒統計的非同步迭代器 (dict，格式同 ProcessSupervisor.subscribe)；子程序結束時停止"""
+        return self._stats
+
+    def sweeps(self):
+        """完整掃描的非同步迭代器 (dict，見 SweepStream.subscribe)；子程序結束時停止"""
+        if self._sweeps is None:
+            raise ValueError("此任務沒有即時掃描資料 (需以 start_sweep 且不指定輸出檔啟動)")
+        return self._sweeps
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def cancel(self, timeout=2.0):
+        """終止子程序 (先 SIGTERM，逾時後 SIGKILL)，回傳結束碼"""
+        if self.process.returncode is None:
+            self._signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(self._done), timeout)
+            except asyncio.TimeoutError:
+                self._signal(signal.SIGKILL)
+        return await asyncio.shield(self._done)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.cancel()
+
+
+class AsyncHackRF:
+    """HackRFCLI 的 asyncio 版本 (指令由 HackRFCLI.build_*_cmd 建構)"""
+
+    def __init__(self, serial=None, transfer_exec="hackrf_transfer", sweep_exec="hackrf_sweep", hackrf=None):
+        """
+        :param serial: 指定裝置序號 (-d)
+        :param hackrf: 既有的 HackRFCLI (例如自 HackRFDevicePool 租借)，提供執行檔與序號設定
+        """
+        self.cli = hackrf if hackrf is not None else HackRFCLI(transfer_exec, sweep_exec, serial=serial)
+
+    async def _spawn(self, cmd, name, sweep_stream=None, on_data=None):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except FileNotFoundError as e:
+            print(f"[Error] 找不到執行檔: {e.filename}，請確認已安裝 hackrf 套件。")
+            return None
+        session = HackRFSession(process, name, sweep_stream=sweep_stream, on_data=on_data)
+        # 獨立的程序群組收不到本程式的終止信號，登錄後由 atexit / 信號處理一併停止
+        register_process(session._tracked, owner=self.cli)
+        return session
+
+    async def start_tx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0, repeat=False):
+        """[hackrf_transfer] 定頻發射，回傳 HackRFSession (失敗回傳 None)"""
+        if not os.path.exists(filename):
+            print(f"[Error] 發射檔案不存在: {filename}")
+            return None
+        cmd = self.cli.build_tx_cmd(filename, freq_hz, sample_rate_hz, amp, tx_gain, repeat)
+        print(f"[*] 啟動 TX 發射: Freq={freq_hz}Hz, Gain={tx_gain}, File={filename}")
+        return await self._spawn(cmd, "tx")
+
+    async def start_rx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, lna_gain=16, vga_gain=20,
+                       num_samples=None, on_data=None):
+        """
+        [hackrf_transfer] 定頻接收，回傳 HackRFSession (失敗回傳 None)
+        :param filename: 錄製檔路徑；"-" 則輸出到 stdout，由 on_data(data) 接收 (必須提供)
+        """
+        if filename == "-" and on_data is None:
+            # 原始 I/Q 不可當成文字行解析
+            print("[Error] 輸出到 stdout (\"-\") 時必須提供 on_data 接收 I/Q 資料")
+            return None
+        cmd = self.cli.build_rx_cmd(filename, freq_hz, sample_rate_hz, amp, lna_gain, vga_gain, num_samples)
+        print(f"[*] 啟動 RX 接收: Freq={freq_hz}Hz, LNA={lna_gain}, VGA={vga_gain} -> {filename}")
+        return await self._spawn(cmd, "rx", on_data=on_data if filename == "-" else None)
+
+    async def start_sweep(self, output_file, freq_min_mhz, freq_max_mhz, bin_width_hz=1000000,
+                          amp=False, lna_gain=16, vga_gain=20, one_shot=False, num_sweeps=None, binary=False):
+        """
+        [hackrf_sweep] 頻譜掃描，回傳 HackRFSession (失敗回傳 None)；參數順序同 HackRFCLI.start_sweep
+        output_file 為 None 時可用 session.sweeps() 逐輪取得掃描結果
+        """
+        cmd = self.cli.build_sweep_cmd(output_file, freq_min_mhz, freq_max_mhz, bin_width_hz,
+                                       amp, lna_gain, vga_gain, one_shot, num_sweeps, binary)
+        stream = None if output_file else SweepStream(freq_min_mhz, freq_max_mhz, binary=binary)
+        print(f"[*] 啟動 Sweep 掃描: Range={int(freq_min_mhz)}:{int(freq_max_mhz)} MHz, "
+              f"Width={bin_width_hz}Hz -> {output_file or 'stream'}")
+        return await self._spawn(cmd, "sweep", sweep_stream=stream)
@@ -0,0 +1,251 @@
+"""
+gps-sdr-sim 基頻信號快取模組
+以 (星曆內容, 軌跡/靜態座標, 時長, 位元深度, 模擬器執行檔) 的雜湊作為 key，
+重複的情境直接沿用已生成的 .bin，並以 LRU 方式限制快取總容量
+"""
+
+import contextlib
+import copy
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK_NAME = "manifest.lock"
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def hash_file(path, h=None):
+    """
+    以分段讀取的方式計算檔案 SHA-256
+    parameter:
+        path (str): 檔案路徑
+        h: 既有的 hashlib 物件 (若提供則直接更新並回傳)
+    return: hashlib 物件
+    """
+    if h is None:
+        h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h
+
+
+def link_or_copy(src, dst) -> None:
+    """以硬連結輸出檔案 (瞬間完成、不佔額外空間)，跨檔案系統時改為複製"""
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    tmp = f"{dst}.tmp{os.getpid()}"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class BasebandCache:
+    """以內容雜湊定址、容量受限 (LRU) 的 .bin 快取"""
+
+    def __init__(self, cache_dir, max_bytes=20 * 1024**3):
+        """
+        :param cache_dir: 快取目錄
+        :param max_bytes: 快取容量上限 (bytes)，超過時淘汰最久未使用的項目
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(cache_dir, MANIFEST_LOCK_NAME)
+        self._lock = threading.Lock()
+        # 模擬器執行檔的雜湊以 (路徑, 大小, mtime) 快取，避免每次重算
+        self._exe_hash = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries = self._load_manifest()
+
+    # ---------------- manifest ----------------
+
+    def _load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"[Warning] 快取 manifest 讀取失敗，將重新建立: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        # 暫存檔名不可固定，否則多個行程同時寫入會互相覆蓋
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=MANIFEST_NAME + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.manifest_path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        (內部方法) 修改 manifest 的交易區段
+        持有執行緒 lock 與跨行程檔案鎖 (flock)，進入時重新讀取 manifest 以合併其他實例的修改，
+        區段內修改 self._entries 後寫回 (未修改時不寫入)
+        """
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._entries = self._load_manifest()
+                before = copy.deepcopy(self._entries)
+                yield self._entries
+                if self._entries != before:
+                    self._save_manifest()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------------- key ----------------
+
+    def _hash_exe(self, exe_path) -> str:
+        st = os.stat(exe_path)
+        stamp = (exe_path, st.st_size, st.st_mtime_ns)
+        if stamp not in self._exe_hash:
+            self._exe_hash[stamp] = hash_file(exe_path).hexdigest()
+        return self._exe_hash[stamp]
+
+    def make_key(
+            self,
+            sim_exe_path,
+            ephemeris_file_path,
+            bits,
+            csv_file=None,
+            static_coords=None,
+            duration=None,
+            extra=(),
+        ) -> str:
+        """
+        計算情境的快取 key
+        :param sim_exe_path: gps-sdr-sim 執行檔路徑
+        :param ephemeris_file_path: 星曆檔案路徑 (以內容計算)
+        :param bits: I/Q 位元深度 (-b)
+        :param csv_file: 動態模式的軌跡檔 (以內容計算)
+        :param static_coords: 靜態模式座標 (lat, lon, alt)
+        :param duration: 模擬時長 (秒)
+        :param extra: 其他會影響輸出的指令參數
+        :return: str (SHA-256 hex)
+        """
+        h = hashlib.sha256()
+        h.update(f"exe:{self._hash_exe(sim_exe_path)}\n".encode())
+        h.update(b"ephemeris:")
+        hash_file(ephemeris_file_path, h)
+        h.update(f"\nbits:{bits}\nduration:{duration}\n".encode())
+        if static_coords is not None:
+            h.update(("static:" + ",".join(repr(float(v)) for v in static_coords) + "\n").encode())
+        if csv_file is not None:
+            h.update(b"csv:")
+            hash_file(csv_file, h)
+        h.update(("\nextra:" + " ".join(map(str, extra))).encode())
+        return h.hexdigest()
+
+    # ---------------- 查詢 / 寫入 ----------------
+
+    def path_for(self, key) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def temp_path_for(self, key) -> str:
+        """生成中的暫存檔路徑 (與快取同一個檔案系統，完成後可直接 rename)"""
+        return self.path_for(key) + ".part"
+
+    def lookup(self, key):
+        """
+        查詢快取
+        :return: str (快取檔路徑) 或 None (未命中)
+        """
+        with self._transaction() as entries:
+            entry = entries.get(key)
+            if entry is None:
+                return None
+
+            path = self.path_for(key)
+            if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+                # 檔案遺失或不完整，移除該筆記錄
+                entries.pop(key, None)
+                return None
+
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            return path
+
+    def commit(self, key, meta=None) -> str:
+        """
+        將 temp_path_for(key) 生成完成的檔案加入快取，並視需要淘汰舊項目
+        :param meta: 記錄在 manifest 中的說明資訊
+        :return: str (快取檔路徑)
+        """
+        path = self.path_for(key)
+        with self._transaction() as entries:
+            # 在檔案鎖內改名，其他實例淘汰時才不會把尚未記錄的新檔當成孤兒刪除
+            os.replace(self.temp_path_for(key), path)
+            now = time.time()
+            entries[key] = {
+                "file": os.path.basename(path),
+                "size": os.path.getsize(path),
+                "created": now,
+                "last_used": now,
+                "hits": 0,
+                "meta": meta or {},
+            }
+            self._evict(keep=key)
+        return path
+
+    def discard(self, key) -> None:
+        """刪除生成失敗留下的暫存檔"""
+        try:
+            os.remove(self.temp_path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def total_bytes(self) -> int:
+        return sum(e["size"] for e in self._entries.values())
+
+    def _untracked_files(self) -> dict:
+        """(內部方法) 目錄中未記錄在 manifest 的 .bin (例如寫入 manifest 前中斷)，{key: (size, mtime)}"""
+        untracked = {}
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            if ext != ".bin" or key in self._entries:
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            untracked[key] = (st.st_size, st.st_mtime)
+        return untracked
+
+    def _evict(self, keep=None) -> None:
+        """
+        依最後使用時間淘汰項目，直到總容量低於上限 (呼叫端需在 _transaction 內)
+        未記錄在 manifest 的 .bin 也計入容量，並以修改時間作為最後使用時間一併淘汰
+        """
+        candidates = {k: (e["size"], e["last_used"]) for k, e in self._entries.items()}
+        candidates.update(self._untracked_files())
+        total = sum(size for size, _ in candidates.values())
+        for key in sorted(candidates, key=lambda k: candidates[k][1]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._entries.pop(key, None)
+            size = candidates[key][0]
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            print(f"[快取] 淘汰 {key[:12]}... ({size / 1024**2:.1f} MB)")
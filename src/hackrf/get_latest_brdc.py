@@ -1,9 +1,11 @@
 from dotenv import load_dotenv
 import requests
 import datetime
+import json
 import os
-import gzip
-import shutil
+import time
+import zlib
+from urllib.parse import urlparse
 from requests.auth import HTTPBasicAuth
 
 from utils.tool import get_project_root
@@ -15,18 +17,27 @@ from utils.tool import get_project_root
 PROJECT_ROOT = get_project_root()
 # 預設存檔路徑
 DEFAULT_SAVE_DIR = os.path.join(PROJECT_ROOT, "data", "ephemeris")
+# 下載 / 解壓縮的區塊大小
+CHUNK_SIZE = 1024 * 1024
+# 網路讀取的區塊大小 (連線中斷時，尚未湊滿一個區塊的資料無法寫入續傳檔)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# 記錄各檔案 ETag / Last-Modified 的清單檔 (位於儲存目錄內)
+MANIFEST_NAME = "manifest.json"
+# NASA Earthdata 登入主機 (CDDIS 會將下載重新導向到此處驗證)
+EARTHDATA_HOST = "urs.earthdata.nasa.gov"
 # =========================================
 
 
-def check_newst_brdc()-> bool:
+def check_newst_brdc(save_dir=DEFAULT_SAVE_DIR)-> bool:
     """
     檢查是否已有最新的星歷檔案
-    parameter: None
+    parameter:
+        save_dir (str): 星歷目錄
     return: bool
     """
 
     url, filename = get_brdc_url()
-    local_path = os.path.join(DEFAULT_SAVE_DIR, filename.replace(".gz", ""))
+    local_path = os.path.join(save_dir, filename.replace(".gz", ""))
     
     if os.path.exists(local_path):
         print(f"已存在最新的星歷檔案: {local_path}")
@@ -79,7 +90,8 @@ def cleanup_old_files(directory, limit=5)-> None:
         return
 
     files = [os.path.join(directory, f) for f in os.listdir(directory)]
-    files = [f for f in files if os.path.isfile(f)]
+    # manifest.json / index.json 等中繼資料與 .npz 解析快取不列入計算
+    files = [f for f in files if os.path.isfile(f) and not f.endswith((".json", ".npz"))]
     
     if len(files) <= limit:
         return
@@ -89,72 +101,232 @@ def cleanup_old_files(directory, limit=5)-> None:
     
     print(f"[清理機制] 刪除 {num_to_remove} 個舊檔案...")
     for i in range(num_to_remove):
-        try:
-            os.remove(files[i])
-        except Exception:
-            pass
+        for path in (files[i], files[i] + ".npz"):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+
+def _gunzip_to_file(chunks, out_path)-> None:
+    """
+    內部函數：將 gzip 資料區塊邊讀邊解壓，寫入暫存檔後以 os.replace 原子性地換成 out_path
+    中途失敗時不會留下不完整的 out_path
+    parameter:
+        chunks (iterable): gzip 壓縮資料的 bytes 區塊 (例如 HTTP 回應串流)
+        out_path (str): 解壓後的檔案路徑
+    return: None (資料不完整或完全沒有資料時拋出 EOFError)
+    """
+    tmp_path = out_path + ".tmp"
+    # 16 + MAX_WBITS: 解析 gzip 檔頭
+    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    fed = False
+    members = 0
+    try:
+        with open(tmp_path, "wb") as f_out:
+            for chunk in chunks:
+                while chunk:
+                    f_out.write(decomp.decompress(chunk))
+                    fed = True
+                    if not decomp.eof:
+                        break
+                    # gzip 可由多個 member 串接而成
+                    members += 1
+                    chunk = decomp.unused_data
+                    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    fed = False
+            f_out.write(decomp.flush())
+        if fed and not decomp.eof:
+            raise EOFError("gzip 資料不完整 (下載中斷?)")
+        if members == 0:
+            # 例如伺服器回傳空的 200 內容，不可換成 0 byte 的星歷檔
+            raise EOFError("沒有完整的 gzip 資料")
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class EarthdataSession(requests.Session):
+    """
+    在 CDDIS <-> Earthdata 登入主機之間的重新導向保留帳密
+    requests 預設在跨主機重新導向時會移除 Authorization，導致驗證失敗
+    """
+
+    auth_host = EARTHDATA_HOST
+
+    def rebuild_auth(self, prepared_request, response):
+        headers = prepared_request.headers
+        if "Authorization" in headers:
+            original = urlparse(response.request.url).hostname
+            redirect = urlparse(prepared_request.url).hostname
+            if original != redirect and self.auth_host not in (original, redirect):
+                del headers["Authorization"]
 
 
-def download_file(url, filename, save_dir, user, password)-> str:
+def load_manifest(save_dir)-> dict:
     """
-    下載星歷檔案並儲存到指定目錄
+    讀取下載清單 (filename -> url, etag, last_modified, size, downloaded, checked)
+    parameter:
+        save_dir (str): 儲存目錄
+    return: dict (檔案不存在或損毀時回傳空 dict)
+    """
+    try:
+        with open(os.path.join(save_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(save_dir, manifest)-> None:
+    """內部函數：原子性地寫入下載清單"""
+    path = os.path.join(save_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_file_chunks(path, limit):
+    """內部函數：分塊讀取檔案前 limit 個位元組"""
+    with open(path, "rb") as f:
+        while limit > 0:
+            chunk = f.read(min(CHUNK_SIZE, limit))
+            if not chunk:
+                return
+            limit -= len(chunk)
+            yield chunk
+
+
+def download_file(url, filename, save_dir, user, password, refresh=False, session=None)-> str:
+    """
+    下載星歷檔案並邊下載邊解壓縮
+    - 壓縮資料同時寫入 <filename>.part，中斷後下次以 Range 請求從斷點續傳
+    - 伺服器的 ETag / Last-Modified 記錄於 manifest.json，refresh 時以條件式 GET 確認，
+      未變更 (304) 只需一次小請求
     parameter:
         url (str): 下載連結
-        filename (str): 檔案名稱
+        filename (str): 檔案名稱 (.gz)
         save_dir (str): 儲存目錄
         user (str): 帳號
         password (str): 密碼
+        refresh (bool): 已有解壓檔時是否向伺服器確認是否更新
+        session (requests.Session): 自訂連線 (None 則建立 EarthdataSession)
+    return: str (解壓後的檔案路徑) or None (失敗)
     """
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
-        
+
+    unzipped_path = os.path.join(save_dir, filename.replace(".gz", ""))
     local_path = os.path.join(save_dir, filename)
-    
-    if os.path.exists(local_path):
-        print(f"檔案已存在，跳過下載: {local_path}")
-        return local_path
-    
-    # 檢查本地是否已經有解壓縮後的版本 (避免重複下載)
-    unzipped_path = local_path.replace(".gz", "")
+    part_path = local_path + ".part"
+    manifest = load_manifest(save_dir)
+    entry = manifest.get(filename, {})
+    validator = entry.get("etag") or entry.get("last_modified")
+
+    headers = {}
+    offset = 0
     if os.path.exists(unzipped_path):
-        print(f"已解壓檔案已存在，跳過下載: {unzipped_path}")
-        return None # 回傳 None 代表不需要後續解壓縮
+        if not refresh:
+            print(f"已解壓檔案已存在，跳過下載: {unzipped_path}")
+            return unzipped_path
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    elif os.path.exists(local_path):
+        # 舊版流程留下的 .gz 直接解壓即可
+        print(f"檔案已存在，跳過下載: {local_path}")
+        return uncompress_file(local_path)
+    elif os.path.exists(part_path) and validator and entry.get("url") == url:
+        offset = os.path.getsize(part_path)
+        if offset:
+            # If-Range: 伺服器上的檔案已改變時回傳完整內容 (200) 而非片段
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
 
-    print(f"正在從 {url} 下載...")
-    
+    print(f"正在從 {url} 下載..." + (f" (自 {offset} bytes 續傳)" if offset else ""))
+
+    own_session = session is None
+    if own_session:
+        session = EarthdataSession()
+        session.auth = (user, password)
     try:
-        with requests.Session() as session:
-            session.auth = (user, password)
-            r1 = session.request('get', url)
-            r = session.get(r1.url, auth=(user, password), stream=True)
-            
-            if r.status_code == 200:
-                with open(local_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=1024):
-                        if chunk:
-                            f.write(chunk)
-                print(f"下載成功: {local_path}")
-                return local_path
-            else:
+        with session.get(url, headers=headers, stream=True, timeout=30) as r:
+            entry.update(url=url, checked=time.time())
+            if r.status_code == 304:
+                manifest[filename] = entry
+                _save_manifest(save_dir, manifest)
+                print(f"伺服器檔案未變更: {unzipped_path}")
+                return unzipped_path
+
+            resumed = offset and r.status_code == 206 and \
+                r.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+            if r.status_code != 200 and not resumed:
+                if r.status_code == 416 and os.path.exists(part_path):
+                    # 斷點已超出伺服器檔案大小，下次從頭下載
+                    os.remove(part_path)
                 print(f"下載失敗 (HTTP {r.status_code})")
                 return None
-    except Exception as e:
-        print(f"連線錯誤: {e}")
+            if not resumed:
+                offset = 0
+
+            # 開始寫入前先記錄驗證值，中斷後才能安全續傳
+            entry.update(
+                etag=r.headers.get("ETag"),
+                last_modified=r.headers.get("Last-Modified"),
+            )
+            manifest[filename] = entry
+            _save_manifest(save_dir, manifest)
+
+            with open(part_path, "ab" if offset else "wb") as journal:
+                def _chunks():
+                    if offset:
+                        yield from _read_file_chunks(part_path, offset)
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        journal.write(chunk)
+                        yield chunk
+
+                try:
+                    _gunzip_to_file(_chunks(), unzipped_path)
+                except zlib.error:
+                    # 已下載的資料損毀，下次從頭下載
+                    journal.close()
+                    os.remove(part_path)
+                    raise
+
+        entry.update(size=os.path.getsize(part_path), downloaded=time.time())
+        os.remove(part_path)
+        manifest[filename] = entry
+        _save_manifest(save_dir, manifest)
+        print(f"下載並解壓成功: {unzipped_path}")
+        return unzipped_path
+    except (requests.RequestException, EOFError, zlib.error, OSError) as e:
+        print(f"下載或解壓縮失敗: {e}")
+        if os.path.exists(part_path):
+            print(f"已下載的部分保留於 {part_path}，下次將續傳")
         return None
+    finally:
+        if own_session:
+            session.close()
+
 
 def uncompress_file(gz_path):
-    """解壓縮 .gz 檔案"""
+    """解壓縮磁碟上的 .gz 檔案 (成功後刪除 .gz)"""
     if not gz_path:
         return None
-    
+
     out_path = gz_path.replace(".gz", "")
     print(f"正在解壓縮到: {out_path}")
-    
+
+    def _read_chunks():
+        with open(gz_path, "rb") as f_in:
+            while chunk := f_in.read(CHUNK_SIZE):
+                yield chunk
+
     try:
-        with gzip.open(gz_path, 'rb') as f_in:
-            with open(out_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        
+        _gunzip_to_file(_read_chunks(), out_path)
         os.remove(gz_path)
         return out_path
     except Exception as e:
@@ -162,18 +334,16 @@ def uncompress_file(gz_path):
         return None
 
 
-
-
-
 # ================= 對外介面 (API) =================
 
-def fetch_latest_ephemeris(save_dir=DEFAULT_SAVE_DIR, cleanup=True)-> str|None:
+def fetch_latest_ephemeris(save_dir=DEFAULT_SAVE_DIR, cleanup=True, refresh=False)-> str|None:
     """
     主要功能函數：自動下載、解壓並回傳星歷檔案路徑。
     其他程式只需呼叫此函數即可。
     parameter:
         save_dir (str): 儲存目錄
         cleanup (bool): 是否啟用清理舊檔機制
+        refresh (bool): 已有當日檔案時是否向伺服器確認是否更新 (條件式 GET)
     return: str (檔案路徑) or None (失敗)
     """
     # 1. 檢查帳密
@@ -185,19 +355,10 @@ def fetch_latest_ephemeris(save_dir=DEFAULT_SAVE_DIR, cleanup=True)-> str|None:
     # 2. 取得連結
     url, filename = get_brdc_url()
     
-    # 3. 下載
-    gz_file = download_file(url, filename, save_dir, user, password)
-    
-    # 4. 如果下載成功 (或是需要解壓縮)
-    final_file = uncompress_file(gz_file)
-    
-    # 如果剛剛回傳 None，可能是因為檔案已經存在並解壓過了，我們嘗試直接回傳路徑
-    if not final_file:
-        expected_path = os.path.join(save_dir, filename.replace(".gz", ""))
-        if os.path.exists(expected_path):
-            final_file = expected_path
-    
-    # 5. 清理舊檔
+    # 3. 下載 (同時解壓縮)
+    final_file = download_file(url, filename, save_dir, user, password, refresh=refresh)
+
+    # 4. 清理舊檔
     if cleanup and final_file:
         cleanup_old_files(save_dir)
         
@@ -1,16 +1,108 @@
 import subprocess
 import os
 import shutil
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from hackrf.process_monitor import (
+    ProcessSupervisor,
+    register_process,
+    terminate_process,
+    unregister_process,
+)
+from hackrf.stream_pump import StreamPump
+from hackrf.sweep_stream import SweepStream
+
+
+# 每個任務保留的最近輸出行數 / 吞吐量樣本數 (環形緩衝區)
+OUTPUT_HISTORY_LINES = 500
+THROUGHPUT_HISTORY = 3600
+# hackrf_info 結果的快取秒數
+INFO_CACHE_SECONDS = 30.0
+
+_info_cache = {}
+_info_lock = threading.Lock()
+
+
+def parse_hackrf_info(text) -> list:
+    """
+    解析 hackrf_info 的輸出
+    parameter:
+        text (str): hackrf_info stdout
+    return: list of dict (index, serial, board, firmware, hardware)
+    """
+    devices = []
+    fields = {
+        "Index": "index",
+        "Serial number": "serial",
+        "Board ID Number": "board",
+        "Firmware Version": "firmware",
+        "Hardware Revision": "hardware",
+    }
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("Found HackRF"):
+            devices.append({})
+            continue
+        if not devices or ":" not in line:
+            continue
+        key, value = (part.strip() for part in line.split(":", 1))
+        if key in fields:
+            devices[-1][fields[key]] = int(value) if key == "Index" else value
+    return [d for d in devices if d.get("serial")]
+
+
+def list_devices(info_exec="hackrf_info", max_age_s=INFO_CACHE_SECONDS, refresh=False) -> list:
+    """
+    列出已連接的 HackRF (快取 hackrf_info 結果，避免每次查詢都重新開啟 USB)
+    注意: 正在被其他程序使用的裝置不一定會出現在 hackrf_info 中，
+    因此裝置清單應在開始任務前取得並沿用
+    parameter:
+        info_exec (str): hackrf_info 執行檔
+        max_age_s (float): 快取有效秒數
+        refresh (bool): 強制重新執行 hackrf_info
+    return: list of dict (見 parse_hackrf_info)
+    """
+    with _info_lock:
+        cached = _info_cache.get(info_exec)
+        if cached and not refresh and time.monotonic() - cached[0] < max_age_s:
+            return list(cached[1])
+        try:
+            result = subprocess.run([info_exec], capture_output=True, text=True, timeout=10)
+            devices = parse_hackrf_info(result.stdout)
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            devices = []
+        _info_cache[info_exec] = (time.monotonic(), devices)
+        return list(devices)
+
 
 class HackRFCLI:
-    def __init__(self):
+    def __init__(self, transfer_exec="hackrf_transfer", sweep_exec="hackrf_sweep", serial=None,
+                 info_exec="hackrf_info"):
         """
         初始化 HackRF CLI 封裝器
         會自動檢查系統中是否有 hackrf_transfer 和 hackrf_sweep
+        :param transfer_exec: hackrf_transfer 執行檔 (可替換為測試用的替身程式)
+        :param sweep_exec: hackrf_sweep 執行檔
+        :param serial: 指定裝置序號 (-d)，None 則使用第一台
+        :param info_exec: hackrf_info 執行檔
         """
-        self.transfer_exec = "hackrf_transfer"
-        self.sweep_exec = "hackrf_sweep"
+        self.transfer_exec = transfer_exec
+        self.sweep_exec = sweep_exec
+        self.serial = serial
+        self.info_exec = info_exec
         self.process = None
+        # 目前任務的輸出監控 (持續讀取 stdout / stderr，避免 pipe 填滿使程序卡住)
+        self.supervisor = None
+        self.output = deque(maxlen=OUTPUT_HISTORY_LINES)
+        self.throughput = deque(maxlen=THROUGHPUT_HISTORY)
+        # start_sweep(output_file=None) 時的即時掃描解析器
+        self.sweep_stream = None
+        # start_tx_stream() 時搬運 I/Q 區塊到 hackrf_transfer stdin 的 StreamPump
+        self.tx_pump = None
 
     def is_installed(self):
         """檢查必要指令是否存在"""
@@ -19,15 +111,22 @@ class HackRFCLI:
         return t_check and s_check
 
     def is_device_connected(self):
-        """透過 hackrf_info 檢查連接"""
-        try:
-            result = subprocess.run(["hackrf_info"], capture_output=True, text=True)
-            return "Found HackRF" in result.stdout
-        except FileNotFoundError:
-            return False
+        """透過 hackrf_info (快取) 檢查連接；指定 serial 時檢查該裝置"""
+        devices = list_devices(self.info_exec)
+        if self.serial is None:
+            return bool(devices)
+        return any(d["serial"] == self.serial for d in devices)
+
+    def _device_args(self):
+        """(內部方法) 指定裝置的參數"""
+        return ["-d", self.serial] if self.serial else []
 
-    def _start_process(self, cmd_args):
-        """(內部方法) 啟動子進程"""
+    def _start_process(self, cmd_args, stdin=None, stdout_handler=None):
+        """
+        (內部方法) 啟動子進程
+        :param stdin: 傳入 subprocess.PIPE 時可由 self.process.stdin 串流寫入資料
+        :param stdout_handler: stdout 原始資料的處理函式 (見 ProcessSupervisor)，None 則視為文字輸出
+        """
         if self.is_running():
             print("[Warning] 上一個任務尚未結束，正在強制停止...")
             self.stop()
@@ -36,11 +135,13 @@ class HackRFCLI:
             # 使用 Popen 啟動 (非阻塞)
             self.process = subprocess.Popen(
                 cmd_args,
+                stdin=stdin,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                # 獨立的程序群組: 停止時只終止自己的程序樹，也不會收到終端機的 Ctrl+C
+                start_new_session=True
             )
-            return True
         except FileNotFoundError as e:
             print(f"[Error] 找不到執行檔: {e.filename}，請確認已安裝 hackrf 套件。")
             return False
@@ -48,18 +149,31 @@ class HackRFCLI:
             print(f"[Error] 啟動失敗: {e}")
             return False
 
-    def start_tx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0, repeat=False):
+        # 每個任務一個新的監控與緩衝區
+        self.output = deque(maxlen=OUTPUT_HISTORY_LINES)
+        self.throughput = deque(maxlen=THROUGHPUT_HISTORY)
+        self.supervisor = ProcessSupervisor(
+            self.process, name=os.path.basename(cmd_args[0]), stdout_handler=stdout_handler
+        )
+        self.supervisor.on_line(lambda stream, line, out=self.output: out.append((stream, line)))
+        self.supervisor.subscribe(self.throughput.append)
+        register_process(self.process, owner=self)
+        self.supervisor.on_exit(lambda code, process=self.process: unregister_process(process))
+        self.supervisor.start()
+        return True
+
+    # ---------------- 指令建構 ----------------
+
+    def build_tx_cmd(self, source, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0, repeat=False):
         """
-        [hackrf_transfer] 定頻發射 (GPS模擬用這個)
+        hackrf_transfer 發射指令
+        :param source: 發射檔路徑、FIFO，或 "-" (stdin)
         :param tx_gain: 0-47dB
         """
-        if not os.path.exists(filename):
-            print(f"[Error] 發射檔案不存在: {filename}")
-            return False
-
         cmd = [
             self.transfer_exec,
-            "-t", filename,
+            *self._device_args(),
+            "-t", source,
             "-f", str(int(freq_hz)),
             "-s", str(int(sample_rate_hz)),
             "-a", "1" if amp else "0",
@@ -67,18 +181,19 @@ class HackRFCLI:
         ]
         if repeat:
             cmd.append("-R")
+        return cmd
 
-        print(f"[*] 啟動 TX 發射: Freq={freq_hz}Hz, Gain={tx_gain}, File={filename}")
-        return self._start_process(cmd)
-
-    def start_rx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, lna_gain=16, vga_gain=20, num_samples=None):
+    def build_rx_cmd(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, lna_gain=16, vga_gain=20,
+                     num_samples=None):
         """
-        [hackrf_transfer] 定頻接收 (錄製訊號)
+        hackrf_transfer 接收指令
+        :param filename: 錄製檔路徑，或 "-" (stdout)
         :param lna_gain: 0-40dB (8dB steps)
         :param vga_gain: 0-62dB (2dB steps) -> 對應文件中的 -g
         """
         cmd = [
             self.transfer_exec,
+            *self._device_args(),
             "-r", filename,
             "-f", str(int(freq_hz)),
             "-s", str(int(sample_rate_hz)),
@@ -88,24 +203,20 @@ class HackRFCLI:
         ]
         if num_samples is not None:
             cmd.extend(["-n", str(int(num_samples))])
+        return cmd
 
-        print(f"[*] 啟動 RX 接收: Freq={freq_hz}Hz, LNA={lna_gain}, VGA={vga_gain} -> {filename}")
-        return self._start_process(cmd)
-
-    def start_sweep(self, output_file, freq_min_mhz, freq_max_mhz, bin_width_hz=1000000, 
-                    amp=False, lna_gain=16, vga_gain=20, one_shot=False, num_sweeps=None):
+    def build_sweep_cmd(self, output_file, freq_min_mhz, freq_max_mhz, bin_width_hz=1000000,
+                        amp=False, lna_gain=16, vga_gain=20, one_shot=False, num_sweeps=None, binary=False):
         """
-        [hackrf_sweep] 頻譜掃描
-        :param freq_min_mhz: 起始頻率 (MHz)
-        :param freq_max_mhz: 結束頻率 (MHz)
-        :param bin_width_hz: 解析度頻寬 (Hz)
-        :param output_file: 儲存結果的 CSV 檔案路徑 (若為 None 則不會存檔，但通常建議存檔)
+        hackrf_sweep 掃描指令
+        :param output_file: 輸出檔路徑，None 則輸出到 stdout
         """
         # 根據文件: -f freq_min:freq_max (單位 MHz)
         freq_range = f"{int(freq_min_mhz)}:{int(freq_max_mhz)}"
         
         cmd = [
             self.sweep_exec,
+            *self._device_args(),
             "-f", freq_range,
             "-w", str(int(bin_width_hz)),
             "-a", "1" if amp else "0",
@@ -115,28 +226,132 @@ class HackRFCLI:
 
         if output_file:
             cmd.extend(["-r", output_file])
+
+        if binary:
+            cmd.append("-B")
         
         if one_shot:
             cmd.append("-1")
         
         if num_sweeps:
             cmd.extend(["-N", str(int(num_sweeps))])
+        return cmd
+
+    # ---------------- 任務 ----------------
+
+    def start_tx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0, repeat=False):
+        """
+        [hackrf_transfer] 定頻發射 (GPS模擬用這個)
+        :param tx_gain: 0-47dB
+        """
+        if not os.path.exists(filename):
+            print(f"[Error] 發射檔案不存在: {filename}")
+            return False
 
-        print(f"[*] 啟動 Sweep 掃描: Range={freq_range} MHz, Width={bin_width_hz}Hz -> {output_file}")
+        cmd = self.build_tx_cmd(filename, freq_hz, sample_rate_hz, amp, tx_gain, repeat)
+        print(f"[*] 啟動 TX 發射: Freq={freq_hz}Hz, Gain={tx_gain}, File={filename}")
         return self._start_process(cmd)
 
+    def start_tx_stdin(self, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0, fifo_path=None):
+        """
+        [hackrf_transfer] 串流發射，I/Q 資料由 stdin (hackrf_transfer -t -) 或 FIFO 提供
+        啟動後由呼叫端寫入 self.process.stdin (或開啟 fifo_path 寫入)
+        :param fifo_path: 若提供，改由該具名管道讀取資料，而非 stdin
+        """
+        source = fifo_path if fifo_path else "-"
+        cmd = self.build_tx_cmd(source, freq_hz, sample_rate_hz, amp, tx_gain)
+
+        print(f"[*] 啟動 TX 串流發射: Freq={freq_hz}Hz, Gain={tx_gain}, Source={source}")
+        return self._start_process(cmd, stdin=None if fifo_path else subprocess.PIPE)
+
+    def start_tx_stream(self, blocks, freq_hz, sample_rate_hz=2600000, amp=False, tx_gain=0,
+                        queue_blocks=16, prebuffer_blocks=4):
+        """
+        [hackrf_transfer] 由 Python 迭代器串流發射 (hackrf_transfer -t -)，不需先寫入檔案
+        區塊經有界佇列預取，再以 memoryview 直接寫入 stdin (不複製)；迭代器結束時關閉 stdin，發射隨之結束
+        搬運狀態見 self.tx_pump.stats()
+        :param blocks: 產生 int8 交錯 I/Q numpy 陣列 (或 bytes-like) 的迭代器，見 hackrf.signal_sources
+        :param queue_blocks: 佇列最多預取的區塊數 (決定記憶體上限)
+        :param prebuffer_blocks: 開始寫入 hackrf_transfer 前需累積的區塊數
+        """
+        if not self.start_tx_stdin(freq_hz, sample_rate_hz, amp, tx_gain):
+            return False
+
+        def _flat(source):
+            # 2 維 (N, 2) 陣列攤平為 1 維 view，StreamPump 以 len() 計算位元組數
+            for block in source:
+                if isinstance(block, np.ndarray):
+                    block = np.ascontiguousarray(block, dtype=np.int8).reshape(-1)
+                yield block
+
+        pump = StreamPump(
+            _flat(blocks),
+            self.process.stdin,
+            queue_chunks=max(1, queue_blocks),
+            prebuffer_chunks=prebuffer_blocks,
+            name="tx-stream",
+        )
+        self.tx_pump = pump.start()
+        # hackrf_transfer 結束時立即停止搬運
+        self.supervisor.on_exit(lambda code: pump.stop())
+        return True
+
+    def start_rx(self, filename, freq_hz, sample_rate_hz=2600000, amp=False, lna_gain=16, vga_gain=20, num_samples=None,
+                 on_data=None):
+        """
+        [hackrf_transfer] 定頻接收 (錄製訊號)
+        :param filename: 錄製檔路徑；"-" 則輸出到 stdout，由 on_data 接收
+        :param lna_gain: 0-40dB (8dB steps)
+        :param vga_gain: 0-62dB (2dB steps) -> 對應文件中的 -g
+        :param on_data: filename 為 "-" 時，I/Q 原始資料 (bytes) 的處理函式 on_data(data)
+        """
+        cmd = self.build_rx_cmd(filename, freq_hz, sample_rate_hz, amp, lna_gain, vga_gain, num_samples)
+
+        print(f"[*] 啟動 RX 接收: Freq={freq_hz}Hz, LNA={lna_gain}, VGA={vga_gain} -> {filename}")
+        if filename == "-" and on_data is not None:
+            return self._start_process(cmd, stdout_handler=on_data)
+        return self._start_process(cmd)
+
+    def start_sweep(self, output_file, freq_min_mhz, freq_max_mhz, bin_width_hz=1000000, 
+                    amp=False, lna_gain=16, vga_gain=20, one_shot=False, num_sweeps=None,
+                    binary=False, on_sweep=None):
+        """
+        [hackrf_sweep] 頻譜掃描
+        :param freq_min_mhz: 起始頻率 (MHz)
+        :param freq_max_mhz: 結束頻率 (MHz)
+        :param bin_width_hz: 解析度頻寬 (Hz)
+        :param output_file: 儲存結果的檔案路徑；None 則不存檔，改由 self.sweep_stream 即時解析 stdout
+        :param binary: 使用 hackrf_sweep -B 二進位輸出 (資料量較小、解析較快)
+        :param on_sweep: 即時解析時每完成一輪掃描呼叫 on_sweep(sweep) (見 SweepStream.subscribe)
+        """
+        cmd = self.build_sweep_cmd(output_file, freq_min_mhz, freq_max_mhz, bin_width_hz,
+                                   amp, lna_gain, vga_gain, one_shot, num_sweeps, binary)
+
+        freq_range = f"{int(freq_min_mhz)}:{int(freq_max_mhz)}"
+        print(f"[*] 啟動 Sweep 掃描: Range={freq_range} MHz, Width={bin_width_hz}Hz -> {output_file or 'stream'}")
+        if output_file:
+            self.sweep_stream = None
+            return self._start_process(cmd)
+
+        stream = SweepStream(freq_min_mhz, freq_max_mhz, binary=binary)
+        if on_sweep is not None:
+            stream.subscribe(on_sweep)
+        if not self._start_process(cmd, stdout_handler=stream.feed):
+            return False
+        self.sweep_stream = stream
+        self.supervisor.on_exit(lambda code: stream.close())
+        return True
+
     def is_running(self):
         if self.process is None: return False
         return self.process.poll() is None
 
     def stop(self):
+        if self.tx_pump is not None:
+            self.tx_pump.stop()
         if self.is_running():
             print("[*] 正在停止 HackRF...")
-            self.process.terminate()
-            try:
-                self.process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
+            terminate_process(self.process, timeout=2)
             self.process = None
             print("[V] HackRF 已停止")
 
@@ -145,6 +360,22 @@ class HackRFCLI:
         if self.is_running():
             self.process.wait()
 
+    def recent_output(self, n=None):
+        """
+        目前 (或上一個) 任務最近的輸出
+        :param n: 行數，None 為緩衝區內全部
+        :return: list of (stream_name, line)
+        """
+        lines = list(self.output)
+        return lines if n is None else lines[-n:]
+
+    def throughput_samples(self):
+        """
+        目前 (或上一個) 任務解析出的每秒吞吐量樣本
+        :return: list of dict (elapsed_s, mib, interval_s, rate_mib_s, power_dbfs, underruns, total_mib)
+        """
+        return list(self.throughput)
+
 if __name__ == "__main__":
     # === 使用範例 ===
     hackrf = HackRFCLI()
@@ -0,0 +1,160 @@
+"""
+KML 串流讀取模組
+以 iterparse 逐個 Placemark 讀取座標，不建立完整的 XML 樹
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+def _local_tag(tag) -> str:
+    """去除 XML namespace，例如 {http://www.opengis.net/kml/2.2}Placemark -> Placemark"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_coordinates_text(text, default_height) -> np.ndarray:
+    """
+    將 <coordinates> 內容 (lon,lat[,alt] 以空白分隔) 轉為 float64 陣列
+    parameter:
+        text (str): <coordinates> 標籤文字
+        default_height (float): 缺少高度時的預設值 (m)
+    return: np.ndarray shape (N, 3)，欄位為 (lat, lon, alt)
+    """
+    tuples = (text or "").split()
+    if not tuples:
+        return np.empty((0, 3), dtype=np.float64)
+
+    if text.count(",") == 2 * len(tuples):
+        # 快速路徑: 每個點都有 lon,lat,alt 三個欄位
+        values = np.array(",".join(tuples).split(","), dtype=np.float64).reshape(-1, 3)
+    else:
+        values = np.full((len(tuples), 3), default_height, dtype=np.float64)
+        for i, p in enumerate(tuples):
+            parts = p.split(",")
+            values[i, 0] = float(parts[0])
+            values[i, 1] = float(parts[1])
+            if len(parts) > 2:
+                values[i, 2] = float(parts[2])
+
+    # KML 格式為 lon,lat,alt，轉為 lat,lon,alt
+    return values[:, [1, 0, 2]]
+
+
+def iter_kml_tracks(kml_file, default_height=100.0):
+    """
+    串流讀取 KML，每個 Placemark 產生一條軌跡
+    同一個 Placemark 內的多個 LineString (MultiGeometry) 會依出現順序串接
+    parameter:
+        kml_file (str): KML 檔案路徑
+        default_height (float): 缺少高度時的預設值 (m)
+    yield: tuple (name, points)，points 為 shape (N, 3) 的 (lat, lon, alt) 陣列
+    """
+    if not os.path.exists(kml_file):
+        raise FileNotFoundError(f"找不到檔案: {kml_file}")
+
+    root = None
+    in_placemark = 0
+    name = None
+    segments = []
+    index = 0
+
+    for event, elem in ET.iterparse(kml_file, events=("start", "end")):
+        tag = _local_tag(elem.tag)
+
+        if event == "start":
+            if root is None:
+                root = elem
+            if tag == "Placemark":
+                in_placemark += 1
+                if in_placemark == 1:
+                    name, segments = None, []
+            continue
+
+        if tag == "name" and in_placemark and name is None:
+            name = (elem.text or "").strip() or None
+
+        elif tag == "coordinates":
+            points = parse_coordinates_text(elem.text, default_height)
+            if in_placemark:
+                segments.append(points)
+            elif len(points):
+                # 不在 Placemark 內的座標 (非標準但常見於簡易匯出) 視為獨立軌跡
+                yield f"track_{index}", points
+                index += 1
+
+        elif tag == "Placemark":
+            in_placemark -= 1
+            if in_placemark == 0:
+                if segments:
+                    points = np.concatenate(segments) if len(segments) > 1 else segments[0]
+                    if len(points):
+                        yield name or f"track_{index}", points
+                        index += 1
+                # 已處理完的 Placemark 從樹上移除，維持記憶體用量固定
+                elem.clear()
+                root.clear()
+
+
+def list_kml_tracks(kml_file, default_height=100.0) -> list:
+    """
+    列出 KML 中所有軌跡
+    return: list of tuple (index, name, 點數)
+    """
+    return [
+        (i, name, len(points))
+        for i, (name, points) in enumerate(iter_kml_tracks(kml_file, default_height))
+    ]
+
+
+def load_kml_track(kml_file, default_height=100.0, track=None, concat=False) -> np.ndarray:
+    """
+    讀取 KML 軌跡
+    parameter:
+        kml_file (str): KML 檔案路徑
+        default_height (float): 缺少高度時的預設值 (m)
+        track (int | str | list | None): 要使用的軌跡 (索引或 Placemark 名稱)，
+                                         None 代表第一條；傳入 list 時依序選取多條
+        concat (bool): True 時將選取的軌跡 (未指定則為全部) 依序串接成一條
+    return: np.ndarray shape (N, 3)，欄位為 (lat, lon, alt)
+    raise: ValueError 選取多條軌跡但 concat=False 時
+    """
+    if track is None:
+        wanted = None
+    elif isinstance(track, (list, tuple)):
+        wanted = list(track)
+    else:
+        wanted = [track]
+
+    if wanted is not None and len(wanted) > 1 and not concat:
+        raise ValueError(f"選取了多條軌跡 {wanted}，需指定 concat=True 串接")
+
+    if wanted is None and not concat:
+        # 只需要第一條軌跡，讀到就停止，不必掃描整個檔案
+        for _, points in iter_kml_tracks(kml_file, default_height):
+            return points
+        raise ValueError("在 KML 中找不到 <coordinates> 標籤")
+
+    found = {}
+    for i, (name, points) in enumerate(iter_kml_tracks(kml_file, default_height)):
+        if wanted is None:
+            found[i] = points
+            continue
+        for key in wanted:
+            if (key == i or key == name) and key not in found:
+                found[key] = points
+
+    if wanted is not None:
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            raise ValueError(f"在 KML 中找不到指定的軌跡: {missing}")
+        selected = [found[key] for key in wanted]
+    else:
+        selected = list(found.values())
+
+    if not selected:
+        raise ValueError("在 KML 中找不到 <coordinates> 標籤")
+    if not concat:
+        return selected[0]
+    return np.concatenate(selected)
@@ -0,0 +1,194 @@
+"""
+分段平行生成模組
+將動態軌跡 CSV 依時間切成多段，各段以正確的起始時間平行執行 gps-sdr-sim，
+再把各段 I/Q 依序拼接成一個連續的 .bin，並檢查拼接邊界
+"""
+
+import datetime
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from hackrf.trajectory import load_trajectory, trajectory_to_track, write_track_csv
+
+
+# gps-sdr-sim 的軌跡更新率固定為 10 Hz (每列 0.1 秒)
+SIM_UPDATE_RATE_HZ = 10
+# gps-sdr-sim 單次最多讀取 USER_MOTION_SIZE (預設 3000) 列軌跡，N 列產生 N-1 個 epoch，
+# 每段又多帶下一段的第一列，因此每段最多 2999 個 epoch (299.9 秒)
+USER_MOTION_SIZE = 3000
+MAX_WINDOW_EPOCHS = USER_MOTION_SIZE - 1
+DEFAULT_WINDOW_S = MAX_WINDOW_EPOCHS / SIM_UPDATE_RATE_HZ
+SPLICE_COPY_BUFFER = 16 * 1024 * 1024
+
+
+def read_first_nav_epoch(ephemeris_file_path) -> datetime.datetime:
+    """
+    讀取 RINEX 2 導航檔中最早的星曆時間 (TOC)，即 gps-sdr-sim 未指定 -t 時的起始時間
+    parameter:
+        ephemeris_file_path (str): 星曆檔案路徑
+    return: datetime.datetime (GPS 時間)
+    """
+    earliest = None
+    in_header = True
+    with open(ephemeris_file_path, "r") as f:
+        for line in f:
+            if in_header:
+                if "END OF HEADER" in line:
+                    in_header = False
+                continue
+            # 每筆記錄第一行以 PRN 開頭，後續 7 行以空白開頭
+            if len(line) < 22 or not line[:2].strip():
+                continue
+            yy, mm, dd, hh, mi = (int(line[i:i + 3]) for i in range(2, 17, 3))
+            sec = float(line[17:22])
+            year = yy + (2000 if yy < 80 else 1900)
+            epoch = datetime.datetime(year, mm, dd, hh, mi) + datetime.timedelta(seconds=sec)
+            if earliest is None or epoch < earliest:
+                earliest = epoch
+
+    if earliest is None:
+        raise ValueError(f"星曆檔中沒有導航記錄: {ephemeris_file_path}")
+    return earliest
+
+
+def format_sim_time(t) -> str:
+    """datetime -> gps-sdr-sim -t 參數格式 (YYYY/MM/DD,hh:mm:ss)"""
+    return f"{t:%Y/%m/%d,%H:%M:}{t.second + t.microsecond / 1e6:04.1f}"
+
+
+def split_motion_csv(csv_file, out_dir, window_s=DEFAULT_WINDOW_S) -> list:
+    """
+    將軌跡 CSV 依時間切段
+    gps-sdr-sim 對 N 列軌跡會產生 N-1 個 0.1 秒的信號，因此每段多帶下一段的第一列，
+    讓各段長度剛好是 window_s，拼接後總長度與單次執行相同
+    parameter:
+        csv_file (str): 軌跡 CSV (time,lat,lon,alt) 或二進位軌跡檔 (.npy)
+        out_dir (str): 分段 CSV 輸出目錄
+        window_s (float): 每段秒數 (最多 299.9 秒，即 MAX_WINDOW_EPOCHS 個 epoch)
+    return: list of dict (csv, offset_s, epochs)
+    """
+    rows_per_window = int(round(window_s * SIM_UPDATE_RATE_HZ))
+    if not 1 <= rows_per_window <= MAX_WINDOW_EPOCHS:
+        raise ValueError(
+            f"window_s={window_s} 需 {rows_per_window + 1} 列軌跡，"
+            f"超過 gps-sdr-sim 上限 {USER_MOTION_SIZE} 列 (最多 {DEFAULT_WINDOW_S} 秒)"
+        )
+    if csv_file.endswith(".npy"):
+        track = trajectory_to_track(load_trajectory(csv_file))
+    else:
+        track = np.loadtxt(csv_file, delimiter=",", ndmin=2)
+    total_epochs = len(track) - 1
+    if total_epochs < 1:
+        raise ValueError(f"軌跡過短，無法分段: {csv_file}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    segments = []
+    for k, start in enumerate(range(0, total_epochs, rows_per_window)):
+        stop = min(start + rows_per_window, total_epochs)
+        seg = track[start:stop + 1].copy()
+        # 時間欄重新從 0 起算 (與 kml_to_csv 相同的逐項累加)
+        seg[0, 0] = 0.0
+        seg[1:, 0] = np.cumsum(np.full(len(seg) - 1, 1.0 / SIM_UPDATE_RATE_HZ))
+
+        seg_csv = os.path.join(out_dir, f"segment_{k:04d}.csv")
+        write_track_csv(seg, seg_csv)
+        segments.append({
+            "csv": seg_csv,
+            "offset_s": start / SIM_UPDATE_RATE_HZ,
+            "epochs": stop - start,
+        })
+    return segments
+
+
+def run_segments(base_cmd, segments, start_time, out_dir, workers=None) -> list:
+    """
+    平行執行各段的 gps-sdr-sim
+    實際運算在 gps-sdr-sim 子程序中進行，因此以執行緒池管理子程序即可用滿所有核心
+    parameter:
+        base_cmd (list): 不含 -u / -t / -o 的 gps-sdr-sim 指令
+        segments (list): split_motion_csv 的結果，完成後會填入 "bin"
+        start_time (datetime): 第一段的模擬起始時間 (GPS 時間)
+        out_dir (str): 分段 .bin 輸出目錄
+        workers (int): 同時執行的數量，None 為 CPU 核心數
+    return: list of str (失敗的分段錯誤訊息，成功時為空 list)
+    """
+    workers = workers or os.cpu_count() or 1
+
+    def _run(k, seg):
+        seg["bin"] = os.path.join(out_dir, f"segment_{k:04d}.bin")
+        seg_start = start_time + datetime.timedelta(seconds=seg["offset_s"])
+        cmd = base_cmd + [
+            "-u", seg["csv"],
+            "-t", format_sim_time(seg_start),
+            "-o", seg["bin"],
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            return f"segment {k} (code {result.returncode}): {result.stderr.strip()[-500:]}"
+        print(f"    - 分段 {k + 1}/{len(segments)} 完成 (起始 {format_sim_time(seg_start)})")
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run, range(len(segments)), segments))
+    return [r for r in results if r]
+
+
+def splice_segments(segments, output_bin) -> None:
+    """依序將各段 .bin 串接為單一檔案"""
+    tmp = output_bin + ".splice"
+    with open(tmp, "wb") as dst:
+        for seg in segments:
+            with open(seg["bin"], "rb") as src:
+                shutil.copyfileobj(src, dst, SPLICE_COPY_BUFFER)
+    os.replace(tmp, output_bin)
+
+
+def verify_splice(output_bin, segments, sample_rate, bytes_per_sample=2,
+                  window_ms=1.0, max_ratio_db=6.0) -> list:
+    """
+    檢查拼接結果
+    1. 各段長度必須剛好等於 epochs x 0.1 秒的樣本數
+    2. 每個邊界前後 window_ms 內不可全為 0，且 RMS 差異不超過 max_ratio_db
+    parameter:
+        output_bin (str): 拼接後的 .bin
+        segments (list): 含 "bin" 與 "epochs" 的分段資訊
+        sample_rate (int): 取樣率 (Hz)
+        bytes_per_sample (int): 每個 I/Q 樣本的位元組數 (-b 8 為 2)
+    return: list of str (問題描述，通過時為空 list)
+    """
+    problems = []
+    step_bytes = int(round(sample_rate / SIM_UPDATE_RATE_HZ)) * bytes_per_sample
+
+    boundaries = []
+    offset = 0
+    for k, seg in enumerate(segments):
+        size = os.path.getsize(seg["bin"])
+        expected = seg["epochs"] * step_bytes
+        if size != expected:
+            problems.append(f"分段 {k} 長度 {size} bytes，預期 {expected} bytes")
+        offset += size
+        boundaries.append(offset)
+
+    if os.path.getsize(output_bin) != offset:
+        problems.append(f"輸出檔長度 {os.path.getsize(output_bin)} 與分段總和 {offset} 不符")
+        return problems
+
+    data = np.memmap(output_bin, dtype=np.int8, mode="r")
+    win = max(bytes_per_sample, int(sample_rate * window_ms / 1000) * bytes_per_sample)
+    for k, b in enumerate(boundaries[:-1]):
+        before = data[max(0, b - win):b].astype(np.float32)
+        after = data[b:b + win].astype(np.float32)
+        rms_before = float(np.sqrt(np.mean(before ** 2))) if len(before) else 0.0
+        rms_after = float(np.sqrt(np.mean(after ** 2))) if len(after) else 0.0
+        if rms_before == 0.0 or rms_after == 0.0:
+            problems.append(f"邊界 {k}/{k + 1} 出現空白樣本 (offset {b})")
+            continue
+        ratio_db = 20 * np.log10(rms_after / rms_before)
+        if abs(ratio_db) > max_ratio_db:
+            problems.append(f"邊界 {k}/{k + 1} 功率跳動 {ratio_db:+.1f} dB (offset {b})")
+    del data
+    return problems
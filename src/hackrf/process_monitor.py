@@ -0,0 +1,345 @@
+"""
+子程序監控模組
+以 selector 同時等待 stdout / stderr / 程序結束 (pidfd) 事件：
+- 持續讀取輸出，避免 pipe 填滿使子程序阻塞
+- 解析 hackrf_transfer 每秒輸出的統計行 (吞吐量、功率、underrun)
+- 程序結束時立即觸發回呼，不需輪詢
+另提供以程序群組為單位的終止函式，以及本程式啟動之子程序的登錄表，
+只終止自己啟動的程序，不影響同一台主機上的其他 HackRF 任務
+"""
+
+import atexit
+import os
+import re
+import selectors
+import signal
+import subprocess
+import threading
+import time
+
+
+READ_SIZE = 65536
+
+# hackrf_transfer 統計行，例如:
+# "19.9 MiB / 1.000 sec = 19.9 MiB/second, average power -7.4 dBfs, 0 bytes free in buffer, 0 underruns, longest 0 bytes"
+_RATE_RE = re.compile(r"([\d.]+)\s*MiB\s*/\s*([\d.]+)\s*sec\s*=\s*([\d.]+)\s*MiB/second")
+_POWER_RE = re.compile(r"average power\s+(-?[\d.]+|-inf)\s*dBfs")
+_UNDERRUN_RE = re.compile(r"(\d+)\s+(?:underruns?|overruns?)")
+
+
+def parse_transfer_stats(line):
+    """
+    解析 hackrf_transfer 的統計行
+    parameter:
+        line (str): 一行輸出
+    return: dict (mib, interval_s, rate_mib_s, power_dbfs, underruns) 或 None (不是統計行)
+    """
+    m = _RATE_RE.search(line)
+    if not m:
+        return None
+
+    stats = {
+        "mib": float(m.group(1)),
+        "interval_s": float(m.group(2)),
+        "rate_mib_s": float(m.group(3)),
+        "power_dbfs": None,
+        "underruns": None,
+    }
+    p = _POWER_RE.search(line)
+    if p:
+        stats["power_dbfs"] = float(p.group(1))
+    u = _UNDERRUN_RE.search(line)
+    if u:
+        stats["underruns"] = int(u.group(1))
+    return stats
+
+
+def terminate_process(process, timeout=2.0) -> None:
+    """
+    終止子程序；若子程序以 start_new_session=True 啟動，則連同其程序群組一起終止
+    先送 SIGTERM，逾時後送 SIGKILL
+    parameter:
+        process (subprocess.Popen): 子程序
+        timeout (float): 等待正常結束的秒數
+    """
+    if process.poll() is not None:
+        return
+
+    def _signal(sig):
+        try:
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, sig)
+            else:
+                process.send_signal(sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    _signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _signal(signal.SIGKILL)
+        process.wait()
+
+
+# ---------------- 子程序登錄表 ----------------
+
+# 可重入: 信號處理函式可能在主執行緒持有鎖時執行
+_registry_lock = threading.RLock()
+_registry = {}
+# 程序終止信號的原處理函式 (已安裝時才有)
+_previous_handlers = {}
+TERMINATION_SIGNALS = (signal.SIGTERM, signal.SIGHUP)
+
+
+def register_process(process, owner=None) -> None:
+    """登錄由本程式啟動的子程序 (owner 用來區分不同的 HackRFCLI / 裝置)"""
+    install_signal_handlers()
+    with _registry_lock:
+        _registry[process.pid] = (process, owner)
+
+
+def unregister_process(process) -> None:
+    with _registry_lock:
+        _registry.pop(process.pid, None)
+
+
+def tracked_processes(owner=None) -> list:
+    """目前仍在執行的已登錄子程序；owner 為 None 時回傳全部"""
+    with _registry_lock:
+        items = list(_registry.values())
+    return [p for p, o in items if p.poll() is None and (owner is None or o is owner)]
+
+
+def terminate_tracked(owner=None, timeout=2.0) -> int:
+    """
+    終止已登錄的子程序 (只影響本程式啟動的程序)
+    parameter:
+        owner: 只終止此擁有者的程序，None 則終止全部
+    return: int (終止的程序數)
+    """
+    procs = tracked_processes(owner)
+    for p in procs:
+        terminate_process(p, timeout)
+        unregister_process(p)
+    return len(procs)
+
+
+def _on_termination_signal(signum, frame):
+    """收到 SIGTERM / SIGHUP 時先停止已登錄的子程序，再交由原本的處理方式"""
+    terminate_tracked(timeout=1.0)
+    previous = _previous_handlers.get(signum, signal.SIG_DFL)
+    if callable(previous):
+        previous(signum, frame)
+        return
+    # 原為預設行為: 恢復後重新送出信號，讓程式照常結束
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def install_signal_handlers() -> bool:
+    """
+    安裝 SIGTERM / SIGHUP 處理函式 (register_process 時自動呼叫)
+    子程序以 start_new_session=True 啟動後不會收到終端機關閉或 kill 送給本程式的信號，
+    而 atexit 在這些信號下不會執行，因此需自行攔截，避免發射程序持續發射
+    已被忽略的信號 (例如 nohup 下的 SIGHUP) 維持忽略
+    只能在主執行緒安裝；其他執行緒呼叫時回傳 False，待下次登錄時再試
+    return: bool (是否已安裝)
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return bool(_previous_handlers)
+    with _registry_lock:
+        for sig in TERMINATION_SIGNALS:
+            if sig in _previous_handlers:
+                continue
+            current = signal.getsignal(sig)
+            if current is signal.SIG_IGN or current is None:
+                continue
+            _previous_handlers[sig] = current
+            signal.signal(sig, _on_termination_signal)
+    return True
+
+
+# 程式正常結束 (含 Ctrl+C) 時確保自己啟動的發射程序都已停止
+atexit.register(terminate_tracked)
+
+
+class ProcessSupervisor:
+    """
+    監控單一子程序 (subprocess.Popen，stdout / stderr 需為 PIPE)
+    回呼皆在監控執行緒中呼叫；GUI 端應透過 Qt Signal 轉回主執行緒再更新畫面
+    """
+
+    def __init__(self, process, name="hackrf", stdout_handler=None):
+        """
+        :param process: subprocess.Popen 物件
+        :param name: 監控執行緒名稱
+        :param stdout_handler: 若提供，stdout 的原始資料 (bytes) 直接交給 stdout_handler(data)，
+                               不做分行 (例如 hackrf_sweep / hackrf_transfer -r - 的資料輸出)
+        """
+        self.process = process
+        self.name = name
+        self.stdout_handler = stdout_handler
+        self.start_time = time.monotonic()
+        self.exited = threading.Event()
+        self.returncode = None
+
+        self.total_mib = 0.0
+        self.last_stats = None
+
+        self._metrics_callbacks = []
+        self._line_callbacks = []
+        self._exit_callbacks = []
+        # 保護 exited 與 _exit_callbacks，確保每個結束回呼只呼叫一次
+        self._exit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-supervisor", daemon=True)
+
+    # ---------------- 訂閱 ----------------
+
+    def subscribe(self, callback):
+        """
+        訂閱即時統計，每收到一行統計呼叫一次 callback(metrics)
+        metrics: dict (elapsed_s, mib, interval_s, rate_mib_s, power_dbfs, underruns, total_mib)
+        """
+        self._metrics_callbacks.append(callback)
+        return callback
+
+    def on_line(self, callback):
+        """訂閱原始輸出，callback(stream_name, line)，stream_name 為 "stdout" / "stderr\""""
+        self._line_callbacks.append(callback)
+        return callback
+
+    def on_exit(self, callback):
+        """訂閱程序結束事件，callback(returncode)；若已結束則立即呼叫 (每個回呼只呼叫一次)"""
+        with self._exit_lock:
+            done = self.exited.is_set()
+            if not done:
+                self._exit_callbacks.append(callback)
+        if done:
+            callback(self.returncode)
+        return callback
+
+    # ---------------- 控制 ----------------
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """等待程序結束，回傳 returncode (逾時回傳 None)"""
+        if self.exited.wait(timeout):
+            return self.returncode
+        return None
+
+    def metrics(self) -> dict:
+        """目前的統計快照"""
+        snapshot = dict(self.last_stats or {})
+        snapshot.update({
+            "elapsed_s": time.monotonic() - self.start_time,
+            "total_mib": self.total_mib,
+            "returncode": self.returncode,
+        })
+        return snapshot
+
+    # ---------------- 監控執行緒 ----------------
+
+    def _dispatch_line(self, stream_name, line):
+        for cb in self._line_callbacks:
+            cb(stream_name, line)
+
+        stats = parse_transfer_stats(line)
+        if stats is None:
+            return
+        self.total_mib += stats["mib"]
+        stats["elapsed_s"] = time.monotonic() - self.start_time
+        stats["total_mib"] = self.total_mib
+        self.last_stats = stats
+        for cb in self._metrics_callbacks:
+            cb(dict(stats))
+
+    def _run(self):
+        sel = selectors.DefaultSelector()
+        buffers = {}
+        for stream_name in ("stdout", "stderr"):
+            stream = getattr(self.process, stream_name)
+            if stream is not None:
+                sel.register(stream.fileno(), selectors.EVENT_READ, stream_name)
+                buffers[stream_name] = b""
+
+        # Linux 5.3+ 可用 pidfd 直接等待程序結束 (即使 pipe 被孫程序持有也能即時得知)
+        pidfd = None
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(self.process.pid)
+                sel.register(pidfd, selectors.EVENT_READ, "exit")
+            except OSError:
+                pidfd = None
+
+        open_streams = len(buffers)
+        process_done = False
+        try:
+            while open_streams and not process_done:
+                for key, _ in sel.select():
+                    tag = key.data
+                    if tag == "exit":
+                        process_done = True
+                        continue
+
+                    chunk = os.read(key.fd, READ_SIZE)
+                    if not chunk:
+                        sel.unregister(key.fd)
+                        open_streams -= 1
+                        if buffers[tag]:
+                            self._dispatch_line(tag, buffers[tag].decode("utf-8", "replace"))
+                            buffers[tag] = b""
+                        continue
+
+                    if tag == "stdout" and self.stdout_handler is not None:
+                        self.stdout_handler(chunk)
+                        continue
+
+                    # hackrf 工具以 \n 或 \r 換行
+                    data = (buffers[tag] + chunk).replace(b"\r", b"\n")
+                    *lines, buffers[tag] = data.split(b"\n")
+                    for line in lines:
+                        if line.strip():
+                            self._dispatch_line(tag, line.decode("utf-8", "replace"))
+
+            if process_done:
+                # 程序已結束，讀完 pipe 中剩餘的輸出
+                for key in list(sel.get_map().values()):
+                    if key.data == "exit":
+                        continue
+                    os.set_blocking(key.fd, False)
+                    rest = buffers[key.data]
+                    raw = key.data == "stdout" and self.stdout_handler is not None
+                    while True:
+                        try:
+                            chunk = os.read(key.fd, READ_SIZE)
+                        except OSError:
+                            break
+                        if not chunk:
+                            break
+                        if raw:
+                            self.stdout_handler(chunk)
+                        else:
+                            rest += chunk
+                    for line in rest.replace(b"\r", b"\n").split(b"\n"):
+                        if line.strip():
+                            self._dispatch_line(key.data, line.decode("utf-8", "replace"))
+        except (OSError, ValueError):
+            # pipe 已被其他地方關閉 (例如 stop() 之後)
+            pass
+        finally:
+            sel.close()
+            if pidfd is not None:
+                os.close(pidfd)
+
+        returncode = self.process.wait()
+        with self._exit_lock:
+            self.returncode = returncode
+            self.exited.set()
+            callbacks = list(self._exit_callbacks)
+        # 在鎖外呼叫，回呼中可再呼叫 on_exit
+        for cb in callbacks:
+            cb(returncode)
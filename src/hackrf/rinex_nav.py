@@ -0,0 +1,160 @@
+"""
+RINEX 2 GPS 導航檔解析
+將 brdcDDD0.YYn 轉為 NumPy 結構化陣列 (每顆衛星、每個星曆時刻一筆克卜勒軌道參數)，
+並以 .npz 快取於原檔旁 (以原檔 SHA-256 驗證)，之後載入只需數毫秒
+"""
+
+import datetime
+import os
+
+import numpy as np
+
+from hackrf.bin_cache import hash_file
+
+
+CACHE_SUFFIX = ".npz"
+GPS_EPOCH = np.datetime64("1980-01-06T00:00:00", "s")
+SECONDS_PER_WEEK = 604800
+
+# 每筆記錄 8 行：第一行為 PRN / 時刻 / 時鐘參數，其後 7 行各 4 個參數 (依 RINEX 2.11 順序)
+ORBIT_FIELDS = (
+    "iode", "crs", "delta_n", "m0",
+    "cuc", "e", "cus", "sqrt_a",
+    "toe", "cic", "omega0", "cis",
+    "i0", "crc", "omega", "omega_dot",
+    "idot", "l2_codes", "week", "l2p_flag",
+    "sv_accuracy", "sv_health", "tgd", "iodc",
+    "transmit_time", "fit_interval", "spare1", "spare2",
+)
+
+NAV_DTYPE = np.dtype(
+    [("prn", "i2"), ("epoch", "M8[s]"), ("toc", "f8"), ("af0", "f8"), ("af1", "f8"), ("af2", "f8")]
+    + [(name, "f8") for name in ORBIT_FIELDS]
+)
+
+
+def _float(text) -> float:
+    """RINEX 浮點數 (指數以 D 表示，空白視為 0)"""
+    text = text.strip().replace("D", "E").replace("d", "e")
+    return float(text) if text else 0.0
+
+
+def _fields(line, start, count=4, width=19) -> list:
+    line = line.rstrip("\n").ljust(start + count * width)
+    return [_float(line[start + k * width:start + (k + 1) * width]) for k in range(count)]
+
+
+def _parse_header(lines) -> dict:
+    header = {"ion_alpha": np.zeros(4), "ion_beta": np.zeros(4), "leap_seconds": 0}
+    for line in lines:
+        label = line[60:].strip()
+        if label == "ION ALPHA":
+            header["ion_alpha"] = np.array(_fields(line, 2, 4, 12))
+        elif label == "ION BETA":
+            header["ion_beta"] = np.array(_fields(line, 2, 4, 12))
+        elif label == "LEAP SECONDS":
+            header["leap_seconds"] = int(line[:6])
+    return header
+
+
+def parse_rinex_nav(path) -> tuple:
+    """
+    解析 RINEX 2 GPS 導航檔
+    parameter:
+        path (str): 星曆檔案路徑
+    return: tuple (records, header)
+        records (np.ndarray): NAV_DTYPE 結構化陣列，依 (epoch, prn) 排序；epoch 為 GPS 時間
+        header (dict): ion_alpha, ion_beta (np.ndarray), leap_seconds (int)
+    """
+    with open(path, "r") as f:
+        lines = f.readlines()
+
+    end = next((i for i, line in enumerate(lines) if "END OF HEADER" in line), None)
+    if end is None:
+        raise ValueError(f"不是有效的 RINEX 檔案 (找不到 END OF HEADER): {path}")
+    header = _parse_header(lines[:end])
+    body = [line for line in lines[end + 1:] if line.strip()]
+    if len(body) % 8:
+        raise ValueError(f"導航記錄行數不完整 ({len(body)} 行): {path}")
+
+    records = np.zeros(len(body) // 8, dtype=NAV_DTYPE)
+    for n in range(len(records)):
+        first = body[8 * n]
+        yy, mm, dd, hh, mi = (int(first[i:i + 3]) for i in range(2, 17, 3))
+        year = yy + (2000 if yy < 80 else 1900)
+        epoch = datetime.datetime(year, mm, dd, hh, mi) + datetime.timedelta(seconds=float(first[17:22]))
+
+        rec = records[n]
+        rec["prn"] = int(first[:2])
+        rec["epoch"] = np.datetime64(epoch, "s")
+        rec["af0"], rec["af1"], rec["af2"] = _fields(first, 22, 3)
+        values = []
+        for line in body[8 * n + 1:8 * n + 8]:
+            values.extend(_fields(line, 3))
+        for name, value in zip(ORBIT_FIELDS, values):
+            rec[name] = value
+
+    records["toc"] = (records["epoch"] - GPS_EPOCH).astype(np.int64) % SECONDS_PER_WEEK
+    records.sort(order=["epoch", "prn"])
+    return records, header
+
+
+def cache_path(path) -> str:
+    return path + CACHE_SUFFIX
+
+
+def load_nav(path, use_cache=True, with_header=False):
+    """
+    載入導航檔的結構化陣列，優先使用原檔旁的 .npz 快取 (原檔內容改變時重新解析)
+    parameter:
+        path (str): 星曆檔案路徑
+        use_cache (bool): 是否讀寫 .npz 快取
+        with_header (bool): 是否一併回傳標頭
+    return: np.ndarray (NAV_DTYPE)，with_header 時為 tuple (records, header)
+    """
+    digest = hash_file(path).hexdigest() if use_cache else None
+    npz_path = cache_path(path)
+
+    if use_cache and os.path.exists(npz_path):
+        try:
+            with np.load(npz_path) as data:
+                if str(data["sha256"]) == digest and data["records"].dtype == NAV_DTYPE:
+                    records = data["records"]
+                    header = {
+                        "ion_alpha": data["ion_alpha"],
+                        "ion_beta": data["ion_beta"],
+                        "leap_seconds": int(data["leap_seconds"]),
+                    }
+                    return (records, header) if with_header else records
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[Warning] 星曆快取讀取失敗，將重新解析: {e}")
+
+    records, header = parse_rinex_nav(path)
+    if use_cache:
+        tmp = npz_path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, records=records, sha256=np.array(digest), **header)
+            os.replace(tmp, npz_path)
+        except OSError as e:
+            print(f"[Warning] 無法寫入星曆快取 {npz_path}: {e}")
+    return (records, header) if with_header else records
+
+
+def latest_per_satellite(records, when) -> np.ndarray:
+    """
+    每顆衛星取 epoch 最接近 when 的一筆星曆 (健康狀態非 0 的衛星不列入)
+    parameter:
+        records (np.ndarray): load_nav 的結果
+        when (datetime.datetime | np.datetime64): GPS 時間
+    return: np.ndarray (NAV_DTYPE)，依 PRN 排序
+    """
+    healthy = records[records["sv_health"] == 0]
+    if len(healthy) == 0:
+        return healthy
+    dt = np.abs((healthy["epoch"] - np.datetime64(when, "s")).astype(np.int64))
+    order = np.lexsort((dt, healthy["prn"]))
+    ranked = healthy[order]
+    first = np.ones(len(ranked), dtype=bool)
+    first[1:] = ranked["prn"][1:] != ranked["prn"][:-1]
+    return ranked[first]
@@ -0,0 +1,179 @@
+"""
+環形緩衝連續錄製模組
+hackrf_transfer -r - 的 I/Q 資料持續寫入固定大小的記憶體環形緩衝區，
+能量觸發 (或操作者手動要求) 時，將觸發前 pre_s 秒 + 觸發後 post_s 秒的樣本寫入磁碟；
+錄製時間不受限制，記憶體與磁碟用量皆有上限
+"""
+
+import datetime
+import os
+import queue
+import threading
+
+import numpy as np
+
+
+# 緩衝區額外保留的位元組數 (需大於單次 stdout 讀取量，觸發後才不會被覆寫)
+RING_MARGIN_BYTES = 1024 * 1024
+
+class RingCapture:
+    """int8 I/Q 環形緩衝區 + 能量觸發快照"""
+
+    def __init__(
+            self,
+            sample_rate,
+            output_dir,
+            pre_s=5.0,
+            post_s=2.0,
+            trigger_db=10.0,
+            window_s=0.001,
+            warmup_s=0.5,
+            max_files=20,
+        ):
+        """
+        :param sample_rate: 取樣率 (Hz)
+        :param output_dir: 快照輸出目錄
+        :param pre_s: 快照包含觸發前的秒數
+        :param post_s: 快照包含觸發後的秒數
+        :param trigger_db: 時間窗功率高於雜訊底多少 dB 時觸發；None 則只接受手動快照
+        :param window_s: 功率計算的時間窗長度 (秒)
+        :param warmup_s: 啟動後先估計雜訊底的秒數 (期間不觸發)
+        :param max_files: 最多保留的快照檔數，超過時刪除最舊的
+        """
+        self.sample_rate = int(sample_rate)
+        self.output_dir = output_dir
+        self.pre_bytes = int(pre_s * sample_rate) * 2
+        self.post_bytes = int(post_s * sample_rate) * 2
+        self.trigger_db = trigger_db
+        self.window_bytes = max(1, int(round(window_s * sample_rate))) * 2
+        self.warmup_bytes = int(warmup_s * sample_rate) * 2
+        self.max_files = max(1, int(max_files))
+
+        # 緩衝區需容納 pre + post，並保留餘裕給觸發後最後一次讀取超出的部分
+        self._ring = np.zeros(self.pre_bytes + self.post_bytes + RING_MARGIN_BYTES, dtype=np.int8)
+        self.total_bytes = 0
+        self.noise_floor = None
+        self.triggers = 0
+        self.captures = []
+        self.capture_count = 0
+
+        self._lock = threading.Lock()
+        self._carry = b""
+        self._pending = None
+        self._captured = threading.Condition()
+        self._writer_queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="ring-capture-writer", daemon=True)
+        self._writer.start()
+        os.makedirs(output_dir, exist_ok=True)
+
+    # ---------------- 錄製 ----------------
+
+    def start(self, hackrf, freq_hz, amp=False, lna_gain=16, vga_gain=20):
+        """以 HackRFCLI 啟動 hackrf_transfer -r - 並將 stdout 導入此緩衝區"""
+        return hackrf.start_rx("-", freq_hz, sample_rate_hz=self.sample_rate, amp=amp,
+                               lna_gain=lna_gain, vga_gain=vga_gain, on_data=self.feed)
+
+    def feed(self, data) -> None:
+        """寫入 hackrf_transfer 的原始 I/Q 資料 (ProcessSupervisor stdout_handler)"""
+        chunk = np.frombuffer(data, dtype=np.int8)
+        with self._lock:
+            self._write_ring(chunk)
+            if self.trigger_db is not None and self._pending is None:
+                self._check_trigger(data)
+            if self._pending is not None and self.total_bytes >= self._pending[1]:
+                self._dump(*self._pending)
+                self._pending = None
+
+    def _write_ring(self, chunk):
+        size = len(self._ring)
+        end = self.total_bytes + len(chunk)
+        if len(chunk) > size:
+            chunk = chunk[-size:]
+        pos = (end - len(chunk)) % size
+        first = min(len(chunk), size - pos)
+        self._ring[pos:pos + first] = chunk[:first]
+        self._ring[:len(chunk) - first] = chunk[first:]
+        self.total_bytes = end
+
+    def _check_trigger(self, data):
+        data = self._carry + bytes(data)
+        base = self.total_bytes - len(data)
+        n_windows = len(data) // self.window_bytes
+        self._carry = data[n_windows * self.window_bytes:]
+        if n_windows == 0:
+            return
+
+        iq = np.frombuffer(data, dtype=np.int8, count=n_windows * self.window_bytes).astype(np.float32)
+        power = (iq * iq).reshape(n_windows, self.window_bytes).sum(axis=1) / (self.window_bytes // 2)
+
+        # 雜訊底: 各區塊功率中位數的指數平均 (觸發期間不更新)
+        median = float(np.median(power))
+        self.noise_floor = median if self.noise_floor is None else 0.95 * self.noise_floor + 0.05 * median
+        if self.total_bytes < self.warmup_bytes:
+            return
+
+        threshold = max(self.noise_floor, 1e-3) * 10 ** (self.trigger_db / 10)
+        hits = np.flatnonzero(power > threshold)
+        if len(hits):
+            # 觸發點 = 第一個超過門檻的時間窗 (以總位元組數計)
+            trigger_pos = base + int(hits[0]) * self.window_bytes
+            self.triggers += 1
+            print(f"[RX] 能量觸發 (超過雜訊底 {10 * np.log10(power[hits[0]] / max(self.noise_floor, 1e-3)):.1f} dB)")
+            self._arm(trigger_pos)
+
+    def snapshot(self) -> None:
+        """操作者手動快照：以目前位置為觸發點"""
+        with self._lock:
+            if self._pending is None:
+                print("[RX] 手動快照")
+                self._arm(self.total_bytes)
+
+    def _arm(self, trigger_pos):
+        trigger_pos -= trigger_pos % 2
+        self._pending = (max(0, trigger_pos - self.pre_bytes), trigger_pos + self.post_bytes)
+        self._carry = b""
+
+    def _dump(self, start, end):
+        """自環形緩衝區複製 [start, end) 並交給寫檔執行緒 (呼叫端需持有 lock)"""
+        size = len(self._ring)
+        start = max(start, self.total_bytes - size)
+        start += start % 2
+        a, b = start % size, end % size
+        if a < b:
+            data = self._ring[a:b].copy()
+        else:
+            data = np.concatenate((self._ring[a:], self._ring[:b]))
+        self._writer_queue.put((start, data))
+
+    # ---------------- 寫檔 ----------------
+
+    def _write_loop(self):
+        while True:
+            start, data = self._writer_queue.get()
+            name = f"capture_{datetime.datetime.now():%Y%m%d_%H%M%S}_{start // 2}.bin"
+            path = os.path.join(self.output_dir, name)
+            data.tofile(path)
+            print(f"[V] 快照已儲存: {path} ({len(data) / 2 / self.sample_rate:.2f} s)")
+
+            with self._captured:
+                self.captures.append(path)
+                self.capture_count += 1
+                while len(self.captures) > self.max_files:
+                    old = self.captures.pop(0)
+                    try:
+                        os.remove(old)
+                    except FileNotFoundError:
+                        pass
+                self._captured.notify_all()
+
+    def wait_capture(self, timeout=None, after=None):
+        """
+        等待下一個快照寫入完成，回傳檔案路徑 (逾時回傳 None)
+        :param after: 基準的 capture_count，快照數超過此值即返回；None 為呼叫當下的數量。
+            以逾時輪詢時應在迴圈外取得一次基準，避免漏掉兩次呼叫之間完成的快照
+        """
+        with self._captured:
+            count = self.capture_count if after is None else after
+            if self._captured.wait_for(lambda: self.capture_count > count, timeout):
+                return self.captures[-1]
+        return None
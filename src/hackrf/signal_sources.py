@@ -0,0 +1,101 @@
+"""
+程序化 I/Q 信號來源
+每個來源皆為產生 int8 交錯 I/Q 區塊 (1 維 numpy 陣列，長度為 2 x 樣本數) 的迭代器，
+可直接交給 HackRFCLI.start_tx_stream() 發射，不需先寫入檔案；duration_s 為 None 時無限產生
+"""
+
+import os
+
+import numpy as np
+
+
+DEFAULT_BLOCK_S = 0.01
+
+
+def _block_counts(sample_rate, block_s, duration_s):
+    """依總時長切出每個區塊的樣本數 (最後一塊可能較短)"""
+    block = max(1, int(sample_rate * block_s))
+    if duration_s is None:
+        while True:
+            yield block
+    remaining = int(sample_rate * duration_s)
+    while remaining > 0:
+        n = min(block, remaining)
+        yield n
+        remaining -= n
+
+
+def _to_int8(i, q, amplitude):
+    out = np.empty(2 * len(i), dtype=np.int8)
+    out[0::2] = np.clip(np.rint(i * amplitude), -127, 127)
+    out[1::2] = np.clip(np.rint(q * amplitude), -127, 127)
+    return out
+
+
+def noise_source(sample_rate, duration_s=None, block_s=DEFAULT_BLOCK_S, seed=None):
+    """
+    均勻分布的寬頻雜訊 (等同 hackrf_transfer -t /dev/urandom)
+    parameter:
+        sample_rate (int): 取樣率 (Hz)，決定每個區塊的樣本數
+        duration_s (float): 總時長，None 為無限
+        seed (int): 亂數種子
+    yield: np.ndarray int8
+    """
+    rng = np.random.default_rng(seed)
+    for n in _block_counts(sample_rate, block_s, duration_s):
+        yield rng.integers(-128, 128, 2 * n, dtype=np.int16).astype(np.int8)
+
+
+def tone_source(sample_rate, offset_hz=0.0, amplitude=100, duration_s=None, block_s=DEFAULT_BLOCK_S):
+    """
+    單頻載波 (相對中心頻率偏移 offset_hz)，區塊之間相位連續
+    yield: np.ndarray int8
+    """
+    phase = 0.0
+    step = 2 * np.pi * offset_hz / sample_rate
+    for n in _block_counts(sample_rate, block_s, duration_s):
+        ph = phase + step * np.arange(n)
+        phase = float((phase + step * n) % (2 * np.pi))
+        yield _to_int8(np.cos(ph), np.sin(ph), amplitude)
+
+
+def chirp_source(sample_rate, f_start_hz, f_stop_hz, sweep_s, amplitude=100, duration_s=None,
+                 block_s=DEFAULT_BLOCK_S):
+    """
+    線性調頻 (頻率在 sweep_s 秒內由 f_start_hz 掃到 f_stop_hz 後重頭開始)，相位連續
+    parameter:
+        f_start_hz, f_stop_hz (float): 相對中心頻率的起訖偏移 (需在 ±sample_rate/2 內)
+        sweep_s (float): 每次掃頻的秒數
+    yield: np.ndarray int8
+    """
+    period = max(1, int(round(sweep_s * sample_rate)))
+    rate = (f_stop_hz - f_start_hz) / period  # 每個樣本的頻率增量 (Hz)
+    phase = 0.0
+    pos = 0
+    for n in _block_counts(sample_rate, block_s, duration_s):
+        k = (pos + np.arange(n)) % period
+        inst_freq = f_start_hz + rate * k
+        ph = phase + 2 * np.pi * np.cumsum(inst_freq) / sample_rate
+        phase = float(ph[-1] % (2 * np.pi))
+        pos = (pos + n) % period
+        yield _to_int8(np.cos(ph), np.sin(ph), amplitude)
+
+
+def file_source(path, repeat=1, block_bytes=1024 * 1024):
+    """
+    以 memmap 分塊讀取 int8 I/Q 檔 (例如重放檔)，可重複 repeat 次 (None 為無限)
+    檔案在呼叫時即檢查 (不等到第一次迭代)，空檔案在 repeat=None 時會空轉，直接拒絕
+    return: 產生 np.ndarray int8 (memmap 切片，不複製) 的迭代器
+    raise: ValueError 檔案長度為 0 時
+    """
+    if os.path.getsize(path) == 0:
+        raise ValueError(f"I/Q 檔案是空的: {path}")
+    return _iter_file_blocks(np.memmap(path, dtype=np.int8, mode="r"), repeat, block_bytes)
+
+
+def _iter_file_blocks(data, repeat, block_bytes):
+    count = 0
+    while repeat is None or count < repeat:
+        for start in range(0, len(data), block_bytes):
+            yield data[start:start + block_bytes]
+        count += 1
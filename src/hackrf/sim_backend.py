@@ -0,0 +1,363 @@
+"""
+HackRF 模擬後端 (離線測試 / 效能量測用)
+以同一個腳本模擬 hackrf_transfer / hackrf_sweep / hackrf_info 的命令列行為：
+- transfer: 依取樣率即時消耗 (-t) 或產生 (-r) I/Q，每秒在 stderr 輸出與真機相同格式的統計行
+- sweep:    產生合成頻譜 (雜訊底 + 數個固定信號)，支援文字與 -B 二進位輸出
+- info:     列出模擬裝置
+install_stub_executables() 會在指定目錄建立三個同名的執行檔，
+讓 HackRFCLI(transfer_exec=..., sweep_exec=..., info_exec=...) 在沒有硬體的機器上執行
+
+    python sim_backend.py transfer -t file.bin -f 1575420000 -s 2600000
+    python sim_backend.py bench
+"""
+
+import datetime
+import os
+import signal
+import stat
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+# 環境變數: 模擬速度倍率 (1.0 為真實速度)、模擬裝置數、RX 叢發週期 (秒，0 為關閉)
+SPEED_ENV = "HACKRF_SIM_SPEED"
+DEVICES_ENV = "HACKRF_SIM_DEVICES"
+BURST_ENV = "HACKRF_SIM_BURST_PERIOD"
+
+# 每個處理區塊的秒數 (與真機 USB 傳輸的粒度同級)
+BLOCK_S = 0.01
+STATS_INTERVAL_S = 1.0
+# hackrf_sweep 每次調諧 20 MHz，真機約 8 GHz/s
+TUNE_STEP_HZ = 20_000_000
+SWEEP_RATE_HZ_PER_S = 8e9
+# 合成頻譜中的固定信號 (Hz, dB)
+SIM_SIGNALS = ((915_500_000, -30.0), (1_575_420_000, -55.0), (2_437_000_000, -25.0), (5_805_000_000, -35.0))
+
+_stop = False
+
+
+def _handle_signal(signum, frame):
+    global _stop
+    _stop = True
+
+
+def _speed() -> float:
+    return max(1e-3, float(os.environ.get(SPEED_ENV, "1.0")))
+
+
+def _parse_args(argv, flags):
+    """簡易的 getopt：flags 為不帶值的選項集合，其餘 -x 選項皆帶一個值"""
+    opts = {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in flags:
+            opts[arg] = True
+        elif arg.startswith("-") and len(arg) == 2 and i + 1 < len(argv):
+            opts[arg] = argv[i + 1]
+            i += 1
+        i += 1
+    return opts
+
+
+def _power_dbfs(block) -> float:
+    if len(block) == 0:
+        return float("-inf")
+    iq = np.frombuffer(block, dtype=np.int8).astype(np.float32)
+    mean = float(np.mean(iq * iq)) * 2 / (127.0 ** 2)
+    return 10 * np.log10(mean) if mean > 0 else float("-inf")
+
+
+class _StatsPrinter:
+    """每秒輸出一行 hackrf_transfer 格式的統計"""
+
+    def __init__(self):
+        self.last = time.monotonic()
+        self.bytes = 0
+        self.power_sum = 0.0
+        self.power_n = 0
+        self.underruns = 0
+
+    def add(self, block, underrun=False):
+        self.bytes += len(block)
+        self.underruns += int(underrun)
+        p = _power_dbfs(block[:65536])
+        if np.isfinite(p):
+            self.power_sum += p
+            self.power_n += 1
+        now = time.monotonic()
+        if now - self.last >= STATS_INTERVAL_S / _speed():
+            self.flush(now)
+
+    def flush(self, now=None):
+        now = now or time.monotonic()
+        dt = max(now - self.last, 1e-6)
+        # hackrf_transfer 統計行的 "MiB" 實際為 10^6 bytes
+        mib = self.bytes / 1e6
+        power = self.power_sum / self.power_n if self.power_n else float("-inf")
+        sys.stderr.write(
+            f"{mib:4.1f} MiB / {dt:5.3f} sec = {mib / dt:4.1f} MiB/second, "
+            f"average power {power:3.1f} dBfs, 14336 bytes free in buffer, "
+            f"{self.underruns} underruns, longest 0 bytes\n"
+        )
+        sys.stderr.flush()
+        self.last, self.bytes, self.power_sum, self.power_n = now, 0, 0.0, 0
+
+
+# ---------------- hackrf_transfer ----------------
+
+def _transfer_tx(source, sample_rate, repeat):
+    block_bytes = int(sample_rate * BLOCK_S) * 2
+    f = sys.stdin.buffer if source == "-" else open(source, "rb")
+    stats = _StatsPrinter()
+    period = BLOCK_S / _speed()
+    deadline = time.monotonic()
+    while not _stop:
+        block = f.read(block_bytes)
+        if not block:
+            if repeat and source != "-":
+                f.seek(0)
+                continue
+            break
+        now = time.monotonic()
+        # 資料來得比取樣率慢 (超過一個區塊時間) 視為 underrun
+        underrun = now - deadline > period
+        if underrun:
+            deadline = now
+        deadline += period
+        stats.add(block, underrun)
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    stats.flush()
+
+
+def _transfer_rx(dest, sample_rate, num_samples):
+    block_samples = int(sample_rate * BLOCK_S)
+    out = sys.stdout.buffer if dest == "-" else open(dest, "wb")
+    burst_period = float(os.environ.get(BURST_ENV, "0"))
+    rng = np.random.default_rng()
+    stats = _StatsPrinter()
+    period = BLOCK_S / _speed()
+    deadline = time.monotonic()
+    sent = 0
+    k = 0
+    try:
+        while not _stop and (num_samples is None or sent < num_samples):
+            n = block_samples if num_samples is None else min(block_samples, num_samples - sent)
+            iq = rng.normal(0.0, 3.0, 2 * n)
+            if burst_period > 0 and (k * BLOCK_S) % burst_period < BLOCK_S * 5:
+                iq += 40 * np.sin(np.arange(2 * n) * 0.3)
+            block = np.clip(iq, -127, 127).astype(np.int8).tobytes()
+            out.write(block)
+            out.flush()
+            stats.add(block)
+            sent += n
+            k += 1
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except BrokenPipeError:
+        pass
+    stats.flush()
+
+
+def run_transfer(argv) -> int:
+    opts = _parse_args(argv, {"-R"})
+    sample_rate = int(float(opts.get("-s", 10_000_000)))
+    if "-t" in opts:
+        _transfer_tx(opts["-t"], sample_rate, opts.get("-R", False))
+    elif "-r" in opts:
+        n = opts.get("-n")
+        _transfer_rx(opts["-r"], sample_rate, int(float(n)) if n is not None else None)
+    else:
+        sys.stderr.write("specify either transmit (-t) or receive (-r) mode\n")
+        return 1
+    sys.stderr.write("\nUser cancel, exiting...\n" if _stop else "\nExiting...\n")
+    return 0
+
+
+# ---------------- hackrf_sweep ----------------
+
+def _sweep_spectrum(freqs, rng):
+    """合成頻譜: -75 dB 雜訊底 + 固定信號 (高斯形狀)"""
+    db = -75.0 + rng.normal(0.0, 1.5, len(freqs))
+    for f0, level in SIM_SIGNALS:
+        db = np.maximum(db, level - ((freqs - f0) / 1e6) ** 2 * 6 + rng.normal(0.0, 1.0, len(freqs)))
+    return db.astype(np.float32)
+
+
+def run_sweep(argv) -> int:
+    opts = _parse_args(argv, {"-1", "-B"})
+    fmin, fmax = (int(v) for v in opts.get("-f", "0:6000").split(":"))
+    bin_width = int(float(opts.get("-w", 1_000_000)))
+    num_sweeps = 1 if opts.get("-1") else int(opts.get("-N", 0)) or None
+    binary = opts.get("-B", False)
+    out = open(opts["-r"], "wb") if "-r" in opts else sys.stdout.buffer
+
+    steps = max(1, -(-(fmax - fmin) * 1_000_000 // TUNE_STEP_HZ))
+    n = max(1, int(5_000_000 // bin_width))
+    width = 5_000_000 / n
+    rng = np.random.default_rng()
+    step_delay = TUNE_STEP_HZ / SWEEP_RATE_HZ_PER_S / _speed()
+
+    sys.stderr.write(f"Sweeping from {fmin} MHz to {fmin + steps * 20} MHz\n")
+    count = 0
+    t0 = time.monotonic()
+    try:
+        while not _stop and (num_sweeps is None or count < num_sweeps):
+            now = datetime.datetime.now()
+            stamp = f"{now:%Y-%m-%d}, {now:%H:%M:%S.%f}"
+            for k in range(steps):
+                base = fmin * 1_000_000 + k * TUNE_STEP_HZ
+                # 與真機相同的交錯順序: 每次調諧輸出兩段 5 MHz
+                for offset in (0, 10_000_000, 5_000_000, 15_000_000):
+                    lo = base + offset
+                    db = _sweep_spectrum(lo + np.arange(n) * width, rng)
+                    if binary:
+                        out.write(struct.pack("<IQQ", 16 + 4 * n, lo, lo + 5_000_000) + db.tobytes())
+                    else:
+                        values = ", ".join(f"{v:.2f}" for v in db)
+                        out.write(f"{stamp}, {lo}, {lo + 5_000_000}, {width:.2f}, 20, {values}\n".encode())
+                out.flush()
+                time.sleep(step_delay)
+            count += 1
+    except BrokenPipeError:
+        pass
+    elapsed = max(time.monotonic() - t0, 1e-6)
+    sys.stderr.write(f"\n{count} total sweeps completed, {count / elapsed:.2f} sweeps/second\n")
+    return 0
+
+
+# ---------------- hackrf_info ----------------
+
+def sim_serials(count=None) -> list:
+    count = int(os.environ.get(DEVICES_ENV, "1")) if count is None else count
+    return [f"0000000000000000{0x5100 + i:04x}5133d1a1b1c" for i in range(count)]
+
+
+def run_info(argv) -> int:
+    print("hackrf_info version: sim")
+    print("libhackrf version: sim (0.8)")
+    for i, serial in enumerate(sim_serials()):
+        print("Found HackRF")
+        print(f"Index: {i}")
+        print(f"Serial number: {serial}")
+        print("Board ID Number: 2 (HackRF One)")
+        print("Firmware Version: sim (API:1.07)")
+        print("Hardware Revision: r9")
+        print("")
+    return 0
+
+
+# ---------------- 執行檔 / 量測 ----------------
+
+def install_stub_executables(bin_dir, speed=None, devices=None) -> dict:
+    """
+    建立模擬用的 hackrf_transfer / hackrf_sweep / hackrf_info 執行檔
+    parameter:
+        bin_dir (str): 輸出目錄
+        speed (float): 模擬速度倍率，None 則沿用執行時的環境變數
+        devices (int): 模擬裝置數
+    return: dict (transfer_exec, sweep_exec, info_exec)，可直接傳給 HackRFCLI(**paths)
+    """
+    os.makedirs(bin_dir, exist_ok=True)
+    env = ""
+    if speed is not None:
+        env += f"{SPEED_ENV}={float(speed)} "
+    if devices is not None:
+        env += f"{DEVICES_ENV}={int(devices)} "
+
+    paths = {}
+    for tool, key in (("transfer", "transfer_exec"), ("sweep", "sweep_exec"), ("info", "info_exec")):
+        path = os.path.join(bin_dir, f"hackrf_{tool}")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\n{env}exec "{sys.executable}" "{os.path.abspath(__file__)}" {tool} "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        paths[key] = path
+    return paths
+
+
+def benchmark(seconds=3.0, sample_rate=2600000, speed=10.0, work_dir=None) -> dict:
+    """
+    以模擬後端量測 HackRFCLI 的 TX / RX / sweep 路徑
+    parameter:
+        seconds (float): 每項測試的模擬秒數 (實際時間為 seconds / speed)
+        sample_rate (int): 取樣率 (Hz)
+        speed (float): 模擬速度倍率
+    return: dict 各項結果
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in (here, os.path.dirname(here)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    from hackrf_wrapper import HackRFCLI
+
+    work_dir = work_dir or tempfile.mkdtemp(prefix="hackrf_sim_")
+    cli = HackRFCLI(**install_stub_executables(os.path.join(work_dir, "bin"), speed=speed))
+    results = {}
+
+    tx_file = os.path.join(work_dir, "tx.bin")
+    np.random.default_rng(0).integers(-40, 40, int(seconds * sample_rate) * 2, dtype=np.int8).tofile(tx_file)
+    t = time.monotonic()
+    cli.start_tx(tx_file, 1575420000, sample_rate_hz=sample_rate)
+    rc = cli.supervisor.wait()
+    elapsed = time.monotonic() - t
+    results["tx"] = {
+        "returncode": rc,
+        "wall_s": elapsed,
+        "rate_mib_s": os.path.getsize(tx_file) / 1e6 / elapsed,
+        "stats_lines": len(cli.throughput_samples()),
+    }
+
+    rx_file = os.path.join(work_dir, "rx.bin")
+    t = time.monotonic()
+    cli.start_rx(rx_file, 915500000, sample_rate_hz=sample_rate, num_samples=int(seconds * sample_rate))
+    rc = cli.supervisor.wait()
+    elapsed = time.monotonic() - t
+    results["rx"] = {
+        "returncode": rc,
+        "wall_s": elapsed,
+        "rate_mib_s": os.path.getsize(rx_file) / 1e6 / elapsed,
+    }
+
+    sweeps = []
+    t = time.monotonic()
+    cli.start_sweep(None, 2400, 2500, bin_width_hz=100000, num_sweeps=20, binary=True, on_sweep=sweeps.append)
+    rc = cli.supervisor.wait()
+    elapsed = time.monotonic() - t
+    results["sweep"] = {"returncode": rc, "wall_s": elapsed, "sweeps": len(sweeps), "sweeps_per_s": len(sweeps) / elapsed}
+    return results
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 1
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+
+    tool, rest = argv[0], argv[1:]
+    if tool == "transfer":
+        return run_transfer(rest)
+    if tool == "sweep":
+        return run_sweep(rest)
+    if tool == "info":
+        return run_info(rest)
+    if tool == "bench":
+        for name, result in benchmark().items():
+            print(f"[{name}] " + ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                                           for k, v in result.items()))
+        return 0
+    print(f"未知的模擬工具: {tool}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
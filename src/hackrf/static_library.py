@@ -0,0 +1,148 @@
+"""
+靜態定點基頻信號庫
+針對實驗室常用的固定座標，依當日星曆預先生成靜態模式 .bin 並建立索引，
+靜態模式請求若命中已知座標即可立即取得；星曆更新 (換日) 時整個信號庫失效重建
+"""
+
+import json
+import os
+import threading
+import time
+
+from hackrf.bin_cache import hash_file
+
+
+INDEX_NAME = "index.json"
+COORDS_NAME = "coords.json"
+
+
+def coord_key(coords) -> str:
+    """座標正規化為索引 key (緯經度取到 1e-6 度，高度取到 0.1 m)"""
+    lat, lon, alt = (float(v) for v in coords)
+    return f"{lat:.6f},{lon:.6f},{alt:.1f}"
+
+
+class StaticSignalLibrary:
+    """以星曆為單位的靜態座標信號庫 (index.json + 每個座標一個 .bin)"""
+
+    def __init__(self, library_dir, coords=None):
+        """
+        :param library_dir: 信號庫目錄
+        :param coords: 需預先生成的座標 list [(lat, lon, alt), ...]，
+                       None 則讀取目錄中的 coords.json
+        """
+        self.library_dir = library_dir
+        self.index_path = os.path.join(library_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+
+        os.makedirs(library_dir, exist_ok=True)
+        self.coords = list(coords) if coords is not None else self._load_coords()
+        self._index = self._load_index()
+
+    # ---------------- 設定 / 索引 ----------------
+
+    def _load_coords(self) -> list:
+        path = os.path.join(self.library_dir, COORDS_NAME)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return [tuple(c) for c in json.load(f)]
+        except (OSError, ValueError) as e:
+            print(f"[Warning] 讀取 {COORDS_NAME} 失敗: {e}")
+            return []
+
+    def save_coords(self) -> None:
+        """將目前的座標清單寫回 coords.json"""
+        path = os.path.join(self.library_dir, COORDS_NAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([list(c) for c in self.coords], f, indent=2)
+
+    def _empty_index(self) -> dict:
+        return {"ephemeris": None, "ephemeris_sha256": None, "duration": None, "entries": {}}
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return self._empty_index()
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Warning] 信號庫索引讀取失敗，將重新建立: {e}")
+            return self._empty_index()
+
+    def _save_index(self) -> None:
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+
+    # ---------------- 查詢 ----------------
+
+    def is_current(self, ephemeris_file_path, duration) -> bool:
+        """信號庫是否以此星曆與時長建立"""
+        if self._index["ephemeris_sha256"] is None:
+            return False
+        return (
+            self._index["duration"] == duration
+            and self._index["ephemeris_sha256"] == hash_file(ephemeris_file_path).hexdigest()
+        )
+
+    def lookup(self, coords, ephemeris_file_path, duration):
+        """
+        查詢已預先生成的靜態信號
+        :return: str (.bin 路徑) 或 None (不在信號庫中，或信號庫已過期)
+        """
+        with self._lock:
+            entry = self._index["entries"].get(coord_key(coords))
+            if entry is None or not self.is_current(ephemeris_file_path, duration):
+                return None
+            path = os.path.join(self.library_dir, entry["file"])
+            if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+                return None
+            return path
+
+    def missing_coords(self, ephemeris_file_path, duration) -> list:
+        """尚未為此星曆生成的座標"""
+        with self._lock:
+            if not self.is_current(ephemeris_file_path, duration):
+                return list(self.coords)
+            return [c for c in self.coords if coord_key(c) not in self._index["entries"]]
+
+    # ---------------- 更新 ----------------
+
+    def reset(self, ephemeris_file_path, duration) -> None:
+        """星曆更換時清空信號庫，並記錄新的星曆"""
+        with self._lock:
+            for entry in self._index["entries"].values():
+                try:
+                    os.remove(os.path.join(self.library_dir, entry["file"]))
+                except FileNotFoundError:
+                    pass
+            self._index = {
+                "ephemeris": os.path.basename(ephemeris_file_path),
+                "ephemeris_sha256": hash_file(ephemeris_file_path).hexdigest(),
+                "duration": duration,
+                "entries": {},
+            }
+            self._save_index()
+
+    def temp_path_for(self, coords) -> str:
+        return os.path.join(self.library_dir, self.file_name_for(coords) + ".part")
+
+    def file_name_for(self, coords) -> str:
+        return "static_" + coord_key(coords).replace(",", "_") + ".bin"
+
+    def add(self, coords) -> str:
+        """將 temp_path_for(coords) 生成完成的檔案加入信號庫"""
+        name = self.file_name_for(coords)
+        path = os.path.join(self.library_dir, name)
+        os.replace(self.temp_path_for(coords), path)
+        with self._lock:
+            self._index["entries"][coord_key(coords)] = {
+                "file": name,
+                "size": os.path.getsize(path),
+                "created": time.time(),
+            }
+            self._save_index()
+        return path
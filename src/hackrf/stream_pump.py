@@ -0,0 +1,242 @@
+"""
+串流幫浦模組
+在兩個程序之間 (例如 gps-sdr-sim -> hackrf_transfer) 以有界佇列搬運 I/Q 資料，
+提供背壓 (佇列滿時暫停讀取上游) 與吞吐量 / underrun 統計
+"""
+
+import errno
+import fcntl
+import os
+import queue
+import threading
+import time
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# 等待 FIFO 讀取端開啟時的重試間隔 (秒)
+FIFO_OPEN_RETRY_S = 0.05
+
+
+def iter_fd_chunks(fd, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    從檔案描述子持續讀取固定大小的區塊直到 EOF (最後一塊可能較小)
+    parameter:
+        fd (int): 檔案描述子 (例如子程序 stdout)
+        chunk_size (int): 每個區塊的位元組數
+    yield: bytearray / memoryview
+    """
+    raw = open(fd, "rb", buffering=0, closefd=False)
+    while True:
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        filled = 0
+        while filled < chunk_size:
+            n = raw.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+
+        if filled == 0:
+            return
+        if filled < chunk_size:
+            yield view[:filled]
+            return
+        yield buf
+
+
+class StreamPump:
+    """
+    上游資料來源 -> 有界佇列 -> 下游檔案描述子
+    - 背壓: 佇列滿時讀取執行緒阻塞，上游程序的 pipe 隨之填滿而自然暫停
+    - underrun: 預緩衝完成後，若下游要資料時佇列為空，視為一次上游供應不及
+    """
+
+    _EOF = object()
+
+    def __init__(self, source, sink, queue_chunks=16, prebuffer_chunks=4, name="pump", reader=None):
+        """
+        :param source:           可迭代的資料來源，每次產生一個 bytes-like 區塊
+        :param sink:             下游檔案物件 (需有 fileno)，或路徑字串 (例如 FIFO，於寫入執行緒中開啟)
+        :param queue_chunks:     佇列最多容納的區塊數 (決定記憶體上限)
+        :param prebuffer_chunks: 開始寫入下游前需累積的區塊數
+        :param name:             執行緒名稱前綴
+        :param reader:           讀取 sink 的下游程序 (subprocess.Popen)，等待 FIFO 開啟時用來判斷是否已結束
+        """
+        self.source = source
+        self.sink = sink
+        self.reader = reader
+        self.prebuffer_chunks = max(0, min(prebuffer_chunks, queue_chunks))
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=queue_chunks)
+        self._stop = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.underruns = 0
+        self.start_time = None
+        self.first_write_time = None
+        self.end_time = None
+
+        self._reader = threading.Thread(target=self._read_loop, name=f"{name}-reader", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name=f"{name}-writer", daemon=True)
+
+    def start(self):
+        self.start_time = time.monotonic()
+        self._reader.start()
+        self._writer.start()
+        return self
+
+    def stop(self):
+        """要求停止搬運 (不等待執行緒結束)"""
+        self._stop.set()
+
+    def join(self, timeout=None) -> bool:
+        """等待搬運結束，回傳是否已完成"""
+        return self.done.wait(timeout)
+
+    # ---------------- 執行緒 ----------------
+
+    def _put(self, item) -> bool:
+        """放入佇列；佇列滿時阻塞 (背壓)，但仍定期檢查停止旗標"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self):
+        """自佇列取出；佇列空時阻塞，收到停止要求則回傳 None"""
+        while not self._stop.is_set():
+            try:
+                return self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return None
+
+    def _read_loop(self):
+        try:
+            for chunk in self.source:
+                if not self._put(chunk):
+                    break
+                self.bytes_in += len(chunk)
+        except Exception as e:
+            self.error = self.error or e
+        finally:
+            # 結束標記一定要送出，否則寫入端會一直等待
+            while True:
+                try:
+                    self._queue.put(self._EOF, timeout=0.2)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        self._drain_queue()
+
+    def _drain_queue(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _wait_prebuffer(self):
+        while not self._stop.is_set() and self._queue.qsize() < self.prebuffer_chunks:
+            if not self._reader.is_alive():
+                return
+            time.sleep(0.01)
+
+    def _open_fifo(self, path):
+        """
+        以非阻塞方式開啟 FIFO 的寫入端並重試到讀取端開啟為止
+        (阻塞的 open() 在讀取端未開啟前會一直卡住，也無法回應 stop())
+        :return: int (已改回阻塞模式的檔案描述子)，停止要求或讀取端已結束時回傳 None
+        """
+        while not self._stop.is_set():
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO:  # ENXIO: 讀取端尚未開啟
+                    raise
+            else:
+                flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+                fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+                return fd
+            if self.reader is not None and self.reader.poll() is not None:
+                self.error = self.error or BrokenPipeError(f"讀取端程序已結束，未開啟 FIFO: {path}")
+                return None
+            time.sleep(FIFO_OPEN_RETRY_S)
+        return None
+
+    def _write_loop(self):
+        sink = self.sink
+        fifo_fd = None
+        try:
+            if isinstance(sink, str):
+                fifo_fd = self._open_fifo(sink)
+                if fifo_fd is None:
+                    self._stop.set()
+                    return
+            fd = fifo_fd if fifo_fd is not None else sink.fileno()
+
+            self._wait_prebuffer()
+            while not self._stop.is_set():
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    if self._reader.is_alive():
+                        self.underruns += 1
+                    item = self._get()
+
+                if item is self._EOF or item is None:
+                    break
+
+                view = memoryview(item).cast("B")
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                if self.first_write_time is None:
+                    self.first_write_time = time.monotonic()
+                self.bytes_out += len(item)
+        except BrokenPipeError:
+            # 下游已結束 (例如 hackrf_transfer 被停止)
+            self._stop.set()
+        except Exception as e:
+            self.error = self.error or e
+            self._stop.set()
+        finally:
+            try:
+                if fifo_fd is not None:
+                    os.close(fifo_fd)
+                elif not isinstance(sink, str):
+                    sink.close()
+            except OSError:
+                pass
+            self.end_time = time.monotonic()
+            self.done.set()
+
+    # ---------------- 統計 ----------------
+
+    def stats(self) -> dict:
+        """
+        目前的搬運統計
+        return: dict (bytes_in, bytes_out, elapsed_s, rate_mib_s, underruns, queued_chunks, latency_s)
+        """
+        now = self.end_time or time.monotonic()
+        elapsed = now - self.start_time if self.start_time else 0.0
+        rate = self.bytes_out / elapsed / 1024**2 if elapsed > 0 else 0.0
+        latency = None
+        if self.first_write_time is not None:
+            latency = self.first_write_time - self.start_time
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "elapsed_s": elapsed,
+            "rate_mib_s": rate,
+            "underruns": self.underruns,
+            "queued_chunks": self._queue.qsize(),
+            "latency_s": latency,
+        }
@@ -0,0 +1,156 @@
+"""
+hackrf_sweep 串流解析模組
+直接解析 hackrf_sweep 的 stdout (文字 CSV 行或 -B 二進位記錄)，
+將每一輪完整掃描組合成一列 float32 功率陣列 (以頻率 bin 為索引) 並推送給訂閱者，
+不需再寫入 / 重新讀取 CSV 檔
+"""
+
+import math
+import struct
+import time
+
+import numpy as np
+
+
+# hackrf_sweep 每次調諧涵蓋 20 MHz，掃描範圍會被補齊到 20 MHz 的整數倍
+TUNE_STEP_HZ = 20_000_000
+
+_RECORD_LEN = struct.Struct("<I")
+_BAND_EDGES = struct.Struct("<QQ")
+
+
+class SweepStream:
+    """
+    hackrf_sweep 輸出 -> 完整掃描 (float32 陣列)
+    以 feed(bytes) 餵入 stdout 原始資料；每完成一輪掃描呼叫一次訂閱者
+    """
+
+    def __init__(self, freq_min_mhz, freq_max_mhz, binary=False, bin_width_hz=None):
+        """
+        :param freq_min_mhz: 掃描起始頻率 (MHz，與 hackrf_sweep -f 相同)
+        :param freq_max_mhz: 掃描結束頻率 (MHz)
+        :param binary: 輸入是否為 hackrf_sweep -B 的二進位格式
+        :param bin_width_hz: 頻率 bin 寬度；None 則依第一筆記錄推算 (實際寬度由 FFT 大小決定)
+        """
+        self.freq_min_hz = int(freq_min_mhz) * 1_000_000
+        steps = max(1, math.ceil((int(freq_max_mhz) - int(freq_min_mhz)) * 1_000_000 / TUNE_STEP_HZ))
+        self.freq_max_hz = self.freq_min_hz + steps * TUNE_STEP_HZ
+        self.binary = binary
+        self.bin_width_hz = bin_width_hz
+
+        self.num_bins = None
+        self.sweep_count = 0
+        self.records = 0
+
+        self._buffer = bytearray()
+        self._row = None
+        self._row_records = 0
+        self._first_hz_low = None
+        self._callbacks = []
+
+    # ---------------- 訂閱 ----------------
+
+    def subscribe(self, callback):
+        """
+        訂閱完整掃描，callback(sweep)
+        sweep: dict (index, time, power_db)；power_db 為 float32 陣列，未涵蓋的 bin 為 NaN
+        """
+        self._callbacks.append(callback)
+        return callback
+
+    def frequencies(self):
+        """各 bin 的起始頻率 (Hz)，尚未收到資料時回傳 None"""
+        if self.num_bins is None:
+            return None
+        return self.freq_min_hz + np.arange(self.num_bins, dtype=np.float64) * self.bin_width_hz
+
+    # ---------------- 輸入 ----------------
+
+    def feed(self, data) -> None:
+        """餵入 hackrf_sweep stdout 的原始資料 (可為任意切割的片段)"""
+        self._buffer += data
+        if self.binary:
+            self._parse_binary()
+        else:
+            self._parse_text()
+
+    def close(self) -> None:
+        """輸入結束：處理剩餘資料並送出最後一輪 (可能不完整的) 掃描"""
+        if not self.binary and self._buffer.strip():
+            self._buffer += b"\n"
+            self._parse_text()
+        self._buffer.clear()
+        self._emit()
+
+    def _parse_text(self):
+        # 每行: date, time, hz_low, hz_high, hz_bin_width, num_samples, dB, dB, ...
+        *lines, rest = bytes(self._buffer).split(b"\n")
+        self._buffer = bytearray(rest)
+        for line in lines:
+            parts = line.split(b",")
+            if len(parts) < 7:
+                continue
+            try:
+                hz_low = int(parts[2])
+                hz_high = int(parts[3])
+                values = np.array(parts[6:], dtype=np.float32)
+            except ValueError:
+                continue
+            self._add_record(hz_low, hz_high, values)
+
+    def _parse_binary(self):
+        # 每筆記錄: uint32 record_length, uint64 hz_low, uint64 hz_high, float32 dB x N
+        buf = self._buffer
+        pos = 0
+        while len(buf) - pos >= _RECORD_LEN.size:
+            (length,) = _RECORD_LEN.unpack_from(buf, pos)
+            end = pos + _RECORD_LEN.size + length
+            if len(buf) < end:
+                break
+            hz_low, hz_high = _BAND_EDGES.unpack_from(buf, pos + _RECORD_LEN.size)
+            values = np.frombuffer(
+                buf, dtype="<f4",
+                count=(length - _BAND_EDGES.size) // 4,
+                offset=pos + _RECORD_LEN.size + _BAND_EDGES.size,
+            ).copy()
+            self._add_record(hz_low, hz_high, values)
+            pos = end
+        del buf[:pos]
+
+    # ---------------- 組合掃描 ----------------
+
+    def _allocate(self, hz_low, hz_high, n_values):
+        if self.bin_width_hz is None:
+            self.bin_width_hz = (hz_high - hz_low) / n_values
+        self.num_bins = int(round((self.freq_max_hz - self.freq_min_hz) / self.bin_width_hz))
+
+    def _add_record(self, hz_low, hz_high, values):
+        if len(values) == 0:
+            return
+        if self.num_bins is None:
+            self._allocate(hz_low, hz_high, len(values))
+
+        # 調諧回到本輪第一筆記錄的頻率 (或更低) 代表上一輪掃描完成
+        if self._row_records and hz_low <= self._first_hz_low:
+            self._emit()
+        if self._row is None:
+            self._row = np.full(self.num_bins, np.nan, dtype=np.float32)
+            self._first_hz_low = hz_low
+
+        start = int(round((hz_low - self.freq_min_hz) / self.bin_width_hz))
+        stop = start + len(values)
+        lo, hi = max(start, 0), min(stop, self.num_bins)
+        if lo < hi:
+            self._row[lo:hi] = values[lo - start:hi - start]
+        self._row_records += 1
+        self.records += 1
+
+    def _emit(self):
+        if self._row is None or not self._row_records:
+            return
+        sweep = {"index": self.sweep_count, "time": time.time(), "power_db": self._row}
+        self.sweep_count += 1
+        self._row = None
+        self._row_records = 0
+        for cb in self._callbacks:
+            cb(sweep)
@@ -0,0 +1,415 @@
+"""
+軌跡計算模組 (NumPy 向量化)
+負責 KML 航點的距離計算、插值 (固定速度線性插值 / ENU 速度剖面)、
+gps-sdr-sim 軌跡 CSV 的批次輸出，以及二進位軌跡檔 (.npy) 的儲存、記憶體映射讀取與 CSV 串流轉換
+"""
+
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal, ROUND_HALF_EVEN
+
+import numpy as np
+
+
+EARTH_RADIUS_M = 6371000  # 地球半徑 (米)，與 FakeGPS._get_dist_meters 一致
+
+# WGS84 橢球參數
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_EP2 = (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+
+# 每次寫入檔案的列數 (避免一次格式化整條超長航線佔用過多記憶體)
+CSV_CHUNK_ROWS = 200000
+# 各欄位小數位數，對應 "%.1f,%.6f,%.6f,%.1f"
+CSV_DECIMALS = (1, 6, 6, 1)
+
+# 二進位軌跡檔的欄位 (每列 32 bytes，可直接以 np.load(mmap_mode="r") 映射)
+TRAJECTORY_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("alt", "<f8"),
+])
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    向量化的 Haversine 距離計算
+    parameter:
+        lat1, lon1, lat2, lon2 (array-like): 起訖點經緯度 (度)
+    return: np.ndarray 兩點間距離 (米)
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlambda = np.radians(np.subtract(lon2, lon1))
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def interpolate_track(points, speed_mps, dt) -> np.ndarray:
+    """
+    以固定速度對航點做線性插值 (與舊版逐段迴圈的計算順序完全相同)
+    parameter:
+        points (array-like): 航點，shape (N, 3)，欄位為 (lat, lon, alt)
+        speed_mps (float): 移動速度 (m/s)
+        dt (float): 取樣間隔 (秒)
+    return: np.ndarray shape (M, 4)，欄位為 (time, lat, lon, alt)，第一列為起點
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    p1, p2 = points[:-1], points[1:]
+
+    dist = haversine_m(p1[:, 0], p1[:, 1], p2[:, 0], p2[:, 1])
+    duration = dist / speed_mps
+    num_steps = (duration / dt).astype(np.int64)
+    # 距離為 0 或不足一個取樣間隔的航段直接略過
+    num_steps[dist == 0] = 0
+
+    valid = num_steps > 0
+    p1, p2, num_steps = p1[valid], p2[valid], num_steps[valid]
+    total = int(num_steps.sum())
+
+    track = np.empty((total + 1, 4), dtype=np.float64)
+    track[0, 0] = 0.0
+    track[0, 1:] = points[0]
+    if total == 0:
+        return track
+
+    # 每個插值點所屬的航段與步數索引 s = 1..num_steps
+    seg = np.repeat(np.arange(len(num_steps)), num_steps)
+    seg_start = np.cumsum(num_steps) - num_steps
+    s = np.arange(1, total + 1) - np.repeat(seg_start, num_steps)
+
+    steps = (p2 - p1) / num_steps[:, None]
+    track[1:, 1:] = p1[seg] + steps[seg] * s[:, None].astype(np.float64)
+
+    # np.cumsum 為逐項累加，與舊版 current_time += dt 的浮點誤差一致
+    track[1:, 0] = np.cumsum(np.full(total, dt))
+    return track
+
+
+def geodetic_to_ecef(lat, lon, alt) -> np.ndarray:
+    """
+    經緯高 (度, 度, m) -> ECEF (m)
+    return: np.ndarray shape (..., 3)
+    """
+    phi, lam = np.radians(lat), np.radians(lon)
+    sin_phi = np.sin(phi)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_phi**2)
+    x = (n + alt) * np.cos(phi) * np.cos(lam)
+    y = (n + alt) * np.cos(phi) * np.sin(lam)
+    z = (n * (1 - WGS84_E2) + alt) * sin_phi
+    return np.stack([x, y, z], axis=-1)
+
+
+def ecef_to_geodetic(xyz) -> tuple:
+    """
+    ECEF (m) -> 經緯高 (Bowring 法，近地表誤差在 mm 等級)
+    return: tuple (lat, lon, alt)
+    """
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    phi = np.arctan2(
+        z + WGS84_EP2 * WGS84_B * np.sin(theta) ** 3,
+        p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3,
+    )
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+    alt = p / np.cos(phi) - n
+    return np.degrees(phi), np.degrees(np.arctan2(y, x)), alt
+
+
+def ecef_to_enu_matrix(lat0, lon0) -> np.ndarray:
+    """以 (lat0, lon0) 為原點的 ECEF -> ENU 旋轉矩陣"""
+    phi, lam = np.radians(lat0), np.radians(lon0)
+    return np.array([
+        [-np.sin(lam), np.cos(lam), 0.0],
+        [-np.sin(phi) * np.cos(lam), -np.sin(phi) * np.sin(lam), np.cos(phi)],
+        [np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)],
+    ])
+
+
+def _per_waypoint(values, n, default) -> np.ndarray:
+    """將純量或 list 展開成長度 n 的 float64 陣列"""
+    if values is None:
+        return np.full(n, float(default))
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.ndim == 0:
+        return np.full(n, float(arr))
+    if len(arr) < n:
+        raise ValueError(f"航點參數長度不足: 需要 {n} 個，只有 {len(arr)} 個")
+    return arr[:n]
+
+
+def profile_track(points, dt, speed_mps, speeds=None, hover_s=None, accel_mps2=None) -> np.ndarray:
+    """
+    以區域 ENU 座標計算航段長度，依速度剖面一次產生整條航線
+    - 取樣時間為全域的 k * dt，航段之間不捨去餘數，總飛行時間與實際相符
+    - 水平位置沿 ECEF 弦線插值後投影回橢球 (即大圓路徑)，高度另以線性插值
+    parameter:
+        points (array-like): 航點，shape (N, 3)，欄位為 (lat, lon, alt)
+        dt (float): 取樣間隔 (秒)
+        speed_mps (float): 預設航段速度 (m/s)
+        speeds (float | list): 各航點出發的航段速度 (長度 N-1 或 N)，None 使用 speed_mps
+        hover_s (float | list): 各航點的停留 (懸停) 秒數 (長度 N)，None 為不停留
+        accel_mps2 (float): 加減速度 (m/s^2)，None 為瞬間變速；
+                            設定時每個航段由靜止加速、巡航、再減速停在下一個航點
+    return: np.ndarray shape (M, 4)，欄位為 (time, lat, lon, alt)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    n_wp = len(points)
+    n_seg = n_wp - 1
+
+    seg_speed = _per_waypoint(speeds, n_seg, speed_mps)
+    hover = _per_waypoint(hover_s, n_wp, 0.0)
+    if np.any(seg_speed <= 0):
+        raise ValueError("航段速度必須大於 0")
+
+    # 1. 航點轉為以第一點為原點的 ENU，計算航段長度
+    ecef = geodetic_to_ecef(points[:, 0], points[:, 1], points[:, 2])
+    enu = (ecef - ecef[0]) @ ecef_to_enu_matrix(points[0, 0], points[0, 1]).T
+    length = np.linalg.norm(np.diff(enu, axis=0), axis=1)
+
+    # 2. 各航段飛行時間 (梯形速度剖面時，短航段改為三角形剖面)
+    if accel_mps2:
+        full = length >= seg_speed**2 / accel_mps2
+        peak = np.where(full, seg_speed, np.sqrt(accel_mps2 * length))
+        t_acc = peak / accel_mps2
+        seg_time = np.where(full, length / seg_speed + seg_speed / accel_mps2, 2 * t_acc)
+    else:
+        peak = seg_speed
+        t_acc = np.zeros(n_seg)
+        seg_time = length / seg_speed
+
+    # 3. 時間軸: 到達航點 i -> 停留 hover[i] -> 飛行航段 i
+    arrive = np.zeros(n_wp)
+    arrive[1:] = np.cumsum(hover[:-1] + seg_time)
+    depart = arrive + hover
+    total = arrive[-1] + hover[-1]
+
+    t = np.arange(int(np.floor(total / dt + 1e-9)) + 1) * dt
+
+    # 4. 每個取樣時間所在的航段與航段內經過時間
+    seg = np.clip(np.searchsorted(depart[:-1], t, side="right") - 1, 0, max(n_seg - 1, 0))
+    if n_seg == 0:
+        track = np.empty((len(t), 4))
+        track[:, 0] = t
+        track[:, 1:] = points[0]
+        return track
+
+    tau = np.clip(t - depart[seg], 0.0, seg_time[seg])
+    seg_len = length[seg]
+    if accel_mps2:
+        a, ta, vp, T = accel_mps2, t_acc[seg], peak[seg], seg_time[seg]
+        dist = np.where(
+            tau < ta,
+            0.5 * a * tau**2,
+            np.where(
+                tau <= T - ta,
+                0.5 * a * ta**2 + vp * (tau - ta),
+                seg_len - 0.5 * a * (T - tau) ** 2,
+            ),
+        )
+    else:
+        dist = peak[seg] * tau
+    frac = np.divide(dist, seg_len, out=np.ones_like(dist), where=seg_len > 0)
+    frac = np.clip(frac, 0.0, 1.0)
+
+    # 5. 水平位置沿 ECEF 弦線插值再轉回經緯度，高度線性插值
+    p1, p2 = ecef[seg], ecef[seg + 1]
+    lat, lon, _ = ecef_to_geodetic(p1 + (p2 - p1) * frac[:, None])
+    alt = points[seg, 2] + (points[seg + 1, 2] - points[seg, 2]) * frac
+
+    return np.column_stack([t, lat, lon, alt])
+
+
+def _fixed_point_ints(values, decimals) -> np.ndarray:
+    """將 |values| 四捨五入為 10^-decimals 的整數倍 (與 "%.nf" 的 round-half-even 相同)"""
+    scaled = np.abs(values) * (10 ** decimals)
+    ints = np.rint(scaled).astype(np.int64)
+
+    # 乘法本身有捨入誤差，極靠近 .5 的少數值改用 Decimal 精確計算
+    frac = scaled - np.floor(scaled)
+    near_tie = np.flatnonzero(np.abs(frac - 0.5) < 1e-6)
+    if len(near_tie):
+        quantum = Decimal(1).scaleb(-decimals)
+        for i in near_tie.tolist():
+            exact = abs(Decimal(float(values[i]))).quantize(quantum, rounding=ROUND_HALF_EVEN)
+            ints[i] = int(exact.scaleb(decimals))
+    return ints
+
+
+def _format_fixed_column(values, decimals) -> tuple:
+    """
+    將一欄浮點數格式化為右對齊的 ASCII 字元矩陣
+    return: tuple (chars, mask)，chars 為 shape (N, W) 的 uint8，mask 標記有效字元
+    """
+    n = len(values)
+    ints = _fixed_point_ints(values, decimals)
+    neg = np.signbit(values)
+    int_part = ints // (10 ** decimals)
+
+    int_width = len(str(int(int_part.max())))
+    int_digits = np.ones(n, dtype=np.int64)
+    for k in range(1, int_width):
+        int_digits += int_part >= 10 ** k
+
+    # 版面: [符號][整數位...][.][小數位...]
+    width = 1 + int_width + 1 + decimals
+    dot = width - 1 - decimals
+    chars = np.empty((n, width), dtype=np.uint8)
+    rem = ints.copy()
+    for col in list(range(width - 1, dot, -1)) + list(range(dot - 1, -1, -1)):
+        chars[:, col] = 48 + rem % 10
+        rem //= 10
+    chars[:, dot] = ord(".")
+
+    start = width - (int_digits + 1 + decimals + neg)
+    rows = np.arange(n)
+    chars[rows[neg], start[neg]] = ord("-")
+    mask = np.arange(width)[None, :] >= start[:, None]
+    return chars, mask
+
+
+def format_track_csv(track) -> bytes:
+    """
+    以向量化方式將軌跡格式化為 CSV 位元組，輸出與逐列 f-string 完全相同
+    parameter:
+        track (np.ndarray): shape (M, 4) 的軌跡陣列
+    return: bytes
+    """
+    n = len(track)
+    if n == 0:
+        return b""
+
+    blocks, masks = [], []
+    for j, decimals in enumerate(CSV_DECIMALS):
+        chars, mask = _format_fixed_column(track[:, j], decimals)
+        sep = "," if j < len(CSV_DECIMALS) - 1 else "\n"
+        blocks += [chars, np.full((n, 1), ord(sep), dtype=np.uint8)]
+        masks += [mask, np.ones((n, 1), dtype=bool)]
+
+    chars = np.concatenate(blocks, axis=1)
+    mask = np.concatenate(masks, axis=1)
+    return chars[mask].tobytes()
+
+
+def write_track_csv(track, csv_file, chunk_rows=CSV_CHUNK_ROWS) -> None:
+    """
+    將軌跡批次寫入 gps-sdr-sim 使用的 CSV (time,lat,lon,alt)
+    parameter:
+        track (np.ndarray): shape (M, 4) 的軌跡陣列
+        csv_file (str): 輸出 CSV 路徑
+        chunk_rows (int): 每批寫入的列數
+    return: None
+    """
+    with open(csv_file, "wb") as f:
+        for start in range(0, len(track), chunk_rows):
+            f.write(format_track_csv(track[start:start + chunk_rows]))
+
+
+# ================= 二進位軌跡檔 =================
+
+def save_trajectory(track, npy_file) -> None:
+    """
+    將 shape (M, 4) 的軌跡存為結構化 .npy (欄位 t, lat, lon, alt)
+    parameter:
+        track (np.ndarray): interpolate_track 的輸出
+        npy_file (str): 輸出路徑
+    return: None
+    """
+    track = np.asarray(track, dtype=np.float64).reshape(-1, 4)
+    traj = np.empty(len(track), dtype=TRAJECTORY_DTYPE)
+    for j, name in enumerate(TRAJECTORY_DTYPE.names):
+        traj[name] = track[:, j]
+
+    # 先寫暫存檔再改名，避免中斷時留下不完整的檔案
+    tmp = npy_file + ".tmp.npy"
+    np.save(tmp, traj)
+    os.replace(tmp, npy_file)
+
+
+def load_trajectory(npy_file, mmap=True) -> np.ndarray:
+    """
+    讀取二進位軌跡檔
+    parameter:
+        npy_file (str): .npy 路徑
+        mmap (bool): True 時以記憶體映射開啟 (超長航線不需整個載入)
+    return: np.ndarray (dtype=TRAJECTORY_DTYPE)
+    """
+    traj = np.load(npy_file, mmap_mode="r" if mmap else None)
+    if traj.dtype != TRAJECTORY_DTYPE:
+        raise ValueError(f"不是有效的軌跡檔 (dtype={traj.dtype}): {npy_file}")
+    return traj
+
+
+def trajectory_to_track(traj) -> np.ndarray:
+    """結構化軌跡 -> shape (M, 4) 的 float64 陣列"""
+    return np.column_stack([traj[name] for name in TRAJECTORY_DTYPE.names])
+
+
+def iter_trajectory_csv(traj, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    依區塊將軌跡轉為 gps-sdr-sim CSV 格式 (記憶體映射的檔案只會讀取目前的區塊)
+    yield: bytes
+    """
+    for start in range(0, len(traj), chunk_rows):
+        yield format_track_csv(trajectory_to_track(traj[start:start + chunk_rows]))
+
+
+def write_trajectory_csv(traj, dest, chunk_rows=CSV_CHUNK_ROWS) -> None:
+    """
+    將軌跡輸出為 CSV
+    parameter:
+        traj (np.ndarray): 結構化軌跡
+        dest (str | file): 輸出路徑，或已開啟的二進位檔案物件 (例如 pipe)
+    return: None
+    """
+    if isinstance(dest, str):
+        with open(dest, "wb") as f:
+            write_trajectory_csv(traj, f, chunk_rows)
+        return
+    for chunk in iter_trajectory_csv(traj, chunk_rows):
+        dest.write(chunk)
+
+
+@contextlib.contextmanager
+def trajectory_csv_fifo(traj):
+    """
+    建立具名管道，在背景將軌跡以 CSV 格式串流寫入，供 gps-sdr-sim -u 直接讀取
+    用法:
+        with trajectory_csv_fifo(traj) as csv_path:
+            subprocess.run([..., "-u", csv_path])
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="trajectory_")
+    path = os.path.join(tmp_dir, "motion.csv")
+    os.mkfifo(path)
+
+    def _writer():
+        try:
+            # open 會阻塞直到讀取端開啟 FIFO
+            with open(path, "wb") as f:
+                write_trajectory_csv(traj, f)
+        except BrokenPipeError:
+            # 讀取端提早關閉
+            pass
+
+    writer = threading.Thread(target=_writer, name="trajectory-fifo", daemon=True)
+    writer.start()
+    try:
+        yield path
+    finally:
+        if writer.is_alive():
+            # 讀取端未開啟或提早結束: 開啟後立即關閉，解除寫入端的阻塞
+            try:
+                os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+            writer.join(timeout=2)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,202 @@
+"""
+衛星可見度預先計算 (NumPy 向量化)
+由 rinex_nav 的星曆結構化陣列，一次批次計算整條軌跡每個時間點的衛星位置、仰角、
+可見衛星數與 DOP，在花費數分鐘生成基頻信號前先排除衛星幾何不佳的情境
+"""
+
+import numpy as np
+
+from hackrf.rinex_nav import GPS_EPOCH, SECONDS_PER_WEEK
+from hackrf.trajectory import geodetic_to_ecef
+
+
+# WGS84 地球重力常數 (m^3/s^2) 與地球自轉角速度 (rad/s)，依 IS-GPS-200
+GM = 3.986005e14
+OMEGA_E = 7.2921151467e-5
+KEPLER_ITERATIONS = 10
+# 同一 PRN 的星曆與基準記錄軌道的容許差異
+MAX_SQRT_A_DEVIATION = 0.05  # sqrt(m)，正常每日變化約 0.01 以內
+MAX_ECCENTRICITY_DEVIATION = 1e-3
+
+DEFAULT_ELEVATION_MASK = 10.0
+DEFAULT_STEP_S = 1.0
+
+
+def gps_seconds(times) -> np.ndarray:
+    """datetime64 (GPS 時間) -> 自 GPS 起始時刻的秒數 (float64)"""
+    return (np.asarray(times, dtype="M8[ms]") - GPS_EPOCH).astype(np.float64) / 1000.0
+
+
+def select_ephemeris(records, t) -> tuple:
+    """
+    每個時間點、每顆衛星選取 TOE 最接近的一筆星曆
+    健康狀態非 0 的記錄，以及軌道 (sqrt_a, e) 與同 PRN 多數記錄差異過大的記錄
+    (合併的 brdc 檔偶有同 PRN 的其他衛星或異常資料) 不列入
+    parameter:
+        records (np.ndarray): rinex_nav.NAV_DTYPE 陣列
+        t (np.ndarray): shape (N,)，自 GPS 起始時刻的秒數
+    return: tuple (prns, eph)
+        prns (np.ndarray): shape (S,)
+        eph (np.ndarray): shape (N, S) 的 NAV_DTYPE 陣列
+    """
+    records = records[records["sv_health"] == 0]
+    prns = np.unique(records["prn"])
+    eph = np.empty((len(t), len(prns)), dtype=records.dtype)
+    for j, prn in enumerate(prns):
+        sat = records[records["prn"] == prn]
+        # 以離心率最接近中位數的記錄為基準 (記錄數為偶數時中位數可能不屬於任何記錄)
+        ref = sat[np.argmin(np.abs(sat["e"] - np.median(sat["e"])))]
+        sat = sat[
+            (np.abs(sat["sqrt_a"] - ref["sqrt_a"]) < MAX_SQRT_A_DEVIATION)
+            & (np.abs(sat["e"] - ref["e"]) < MAX_ECCENTRICITY_DEVIATION)
+        ]
+        toe = sat["week"] * SECONDS_PER_WEEK + sat["toe"]
+        order = np.argsort(toe)
+        sat, toe = sat[order], toe[order]
+        # 以相鄰兩筆的中點為分界，找出最接近的星曆
+        k = np.searchsorted((toe[1:] + toe[:-1]) / 2, t)
+        eph[:, j] = sat[k]
+    return prns, eph
+
+
+def satellite_ecef(eph, t) -> np.ndarray:
+    """
+    廣播星曆 -> 衛星 ECEF 位置 (IS-GPS-200 演算法，未含信號傳播時間修正)
+    parameter:
+        eph (np.ndarray): NAV_DTYPE 陣列，任意形狀
+        t (np.ndarray): 自 GPS 起始時刻的秒數，可與 eph 廣播 (例如 shape (N, 1))
+    return: np.ndarray shape eph.shape + (3,)
+    """
+    toe = eph["week"] * SECONDS_PER_WEEK + eph["toe"]
+    tk = t - toe
+
+    a = eph["sqrt_a"] ** 2
+    n = np.sqrt(GM / a**3) + eph["delta_n"]
+    m = eph["m0"] + n * tk
+    e = eph["e"]
+    ecc_anomaly = m
+    for _ in range(KEPLER_ITERATIONS):
+        ecc_anomaly = m + e * np.sin(ecc_anomaly)
+
+    nu = np.arctan2(np.sqrt(1 - e**2) * np.sin(ecc_anomaly), np.cos(ecc_anomaly) - e)
+    phi = nu + eph["omega"]
+    sin2, cos2 = np.sin(2 * phi), np.cos(2 * phi)
+    u = phi + eph["cus"] * sin2 + eph["cuc"] * cos2
+    r = a * (1 - e * np.cos(ecc_anomaly)) + eph["crs"] * sin2 + eph["crc"] * cos2
+    i = eph["i0"] + eph["idot"] * tk + eph["cis"] * sin2 + eph["cic"] * cos2
+
+    x_orb, y_orb = r * np.cos(u), r * np.sin(u)
+    omega = eph["omega0"] + (eph["omega_dot"] - OMEGA_E) * tk - OMEGA_E * eph["toe"]
+    cos_o, sin_o, cos_i = np.cos(omega), np.sin(omega), np.cos(i)
+    return np.stack([
+        x_orb * cos_o - y_orb * cos_i * sin_o,
+        x_orb * sin_o + y_orb * cos_i * cos_o,
+        y_orb * np.sin(i),
+    ], axis=-1)
+
+
+def _dop(unit_enu, visible) -> np.ndarray:
+    """
+    依可見衛星的 ENU 單位向量計算 DOP
+    return: np.ndarray shape (N, 5)，欄位為 GDOP, PDOP, HDOP, VDOP, TDOP (可見衛星不足 4 顆時為 NaN)
+    """
+    g = np.concatenate([-unit_enu, np.ones(unit_enu.shape[:-1] + (1,))], axis=-1)
+    g = g * visible[..., None]
+    h = np.einsum("nsi,nsj->nij", g, g)
+
+    dop = np.full((len(h), 5), np.nan)
+    ok = visible.sum(axis=1) >= 4
+    ok[ok] = np.abs(np.linalg.det(h[ok])) > 1e-12
+    if ok.any():
+        q = np.linalg.inv(h[ok])
+        d = np.diagonal(q, axis1=1, axis2=2)
+        dop[ok] = np.sqrt(np.column_stack([
+            d.sum(axis=1), d[:, :3].sum(axis=1), d[:, :2].sum(axis=1), d[:, 2], d[:, 3],
+        ]))
+    return dop
+
+
+def compute_visibility(records, track, start_time=None, elevation_mask_deg=DEFAULT_ELEVATION_MASK,
+                       step_s=DEFAULT_STEP_S) -> dict:
+    """
+    計算軌跡上每個時間點的衛星可見度與 DOP
+    parameter:
+        records (np.ndarray): rinex_nav.load_nav 的結果
+        track (np.ndarray): shape (M, 4) 的軌跡 (t, lat, lon, alt)，與 kml_to_csv 輸出相同
+        start_time (np.datetime64 | datetime.datetime): 軌跡 t=0 對應的 GPS 時間，
+            None 為星曆最早的時刻 (gps-sdr-sim 未指定 -t 時的起始時間)
+        elevation_mask_deg (float): 仰角遮罩 (度)
+        step_s (float): 計算間隔 (秒)，None 則使用軌跡每一列
+    return: dict
+        t (N,) 軌跡時間, prn (S,), elevation (N, S) 度, visible (N,) 可見衛星數,
+        gdop / pdop / hdop / vdop / tdop (N,), start_time
+    """
+    track = np.asarray(track, dtype=np.float64).reshape(-1, 4)
+    if step_s:
+        t_rel = np.arange(track[0, 0], track[-1, 0] + step_s / 2, step_s)
+        lat, lon, alt = (np.interp(t_rel, track[:, 0], track[:, k]) for k in (1, 2, 3))
+    else:
+        t_rel, lat, lon, alt = track.T
+
+    if start_time is None:
+        start_time = records["epoch"].min()
+    start_time = np.datetime64(start_time, "ms")
+    t = gps_seconds(start_time) + t_rel
+
+    prns, eph = select_ephemeris(records, t)
+    sat = satellite_ecef(eph, t[:, None])
+    rx = geodetic_to_ecef(lat, lon, alt)
+
+    # 視線向量轉到各時間點的當地 ENU
+    los = sat - rx[:, None, :]
+    los /= np.linalg.norm(los, axis=-1, keepdims=True)
+    phi, lam = np.radians(lat)[:, None], np.radians(lon)[:, None]
+    dx, dy, dz = los[..., 0], los[..., 1], los[..., 2]
+    east = -np.sin(lam) * dx + np.cos(lam) * dy
+    north = -np.sin(phi) * np.cos(lam) * dx - np.sin(phi) * np.sin(lam) * dy + np.cos(phi) * dz
+    up = np.cos(phi) * np.cos(lam) * dx + np.cos(phi) * np.sin(lam) * dy + np.sin(phi) * dz
+
+    elevation = np.degrees(np.arcsin(np.clip(up, -1, 1)))
+    visible = elevation >= elevation_mask_deg
+    dop = _dop(np.stack([east, north, up], axis=-1), visible)
+
+    return {
+        "t": t_rel,
+        "prn": prns,
+        "elevation": elevation,
+        "visible": visible.sum(axis=1),
+        "gdop": dop[:, 0],
+        "pdop": dop[:, 1],
+        "hdop": dop[:, 2],
+        "vdop": dop[:, 3],
+        "tdop": dop[:, 4],
+        "start_time": start_time,
+    }
+
+
+def scenario_problems(report, min_visible=4, max_pdop=6.0) -> list:
+    """
+    檢查可見度結果是否適合生成欺騙信號
+    parameter:
+        report (dict): compute_visibility 的結果
+        min_visible (int): 每個時間點至少需要的可見衛星數
+        max_pdop (float): PDOP 上限
+    return: list of str (問題描述，空 list 代表通過)
+    """
+    problems = []
+    t = report["t"]
+    low = report["visible"] < min_visible
+    if low.any():
+        problems.append(
+            f"{int(low.sum())} / {len(t)} 個時間點可見衛星少於 {min_visible} 顆 "
+            f"(最少 {int(report['visible'].min())} 顆，首次於 t={t[low][0]:.1f}s)"
+        )
+    pdop = report["pdop"]
+    bad = ~(pdop <= max_pdop)
+    bad &= ~low
+    if bad.any():
+        problems.append(
+            f"{int(bad.sum())} / {len(t)} 個時間點 PDOP 超過 {max_pdop} "
+            f"(最大 {np.nanmax(pdop):.1f}，首次於 t={t[bad][0]:.1f}s)"
+        )
+    return problems
@@ -0,0 +1,285 @@
+"""
+瀑布圖 (時頻圖) 儲存模組
+長時間頻譜掃描時：
+- 記憶體中只保留固定列數的環形緩衝區 (可做時間抽取 max / mean hold 與頻率合併)，供即時顯示
+- 全解析度的每一輪掃描依序附加到磁碟檔案，查詢時以 memmap 讀取指定時間區段，不需整檔載入
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+SPECTRUM_NAME = "spectrum.f32"
+TIMES_NAME = "times.f8"
+META_NAME = "meta.json"
+
+
+def _reduce(data, hold, axis):
+    """依 hold 模式合併 (忽略 NaN；整段皆為 NaN 時結果為 NaN)"""
+    valid = ~np.isnan(data)
+    if hold == "max":
+        out = np.where(valid, data, -np.inf).max(axis=axis)
+    else:
+        count = valid.sum(axis=axis)
+        total = np.where(valid, data, 0.0).sum(axis=axis)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = total / count
+    out = out.astype(np.float32)
+    out[valid.sum(axis=axis) == 0] = np.nan
+    return out
+
+
+def load_spill(spill_dir):
+    """
+    讀取 WaterfallStore 寫到磁碟的全解析度資料 (唯讀 memmap)
+    parameter:
+        spill_dir (str): 溢寫目錄
+    return: tuple (meta dict, times memmap [N], spectrum memmap [N, num_bins])，沒有資料時兩者為 None
+    """
+    with open(os.path.join(spill_dir, META_NAME), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    num_bins = meta["num_bins"]
+    spectrum_path = os.path.join(spill_dir, SPECTRUM_NAME)
+    times_path = os.path.join(spill_dir, TIMES_NAME)
+
+    rows = min(os.path.getsize(times_path) // 8, os.path.getsize(spectrum_path) // (4 * num_bins))
+    if rows == 0:
+        return meta, None, None
+    times = np.memmap(times_path, dtype="<f8", mode="r", shape=(rows,))
+    spectrum = np.memmap(spectrum_path, dtype="<f4", mode="r", shape=(rows, num_bins))
+    return meta, times, spectrum
+
+
+class WaterfallStore:
+    """
+    固定記憶體的瀑布圖緩衝區 + 磁碟全解析度紀錄
+    可直接訂閱 SweepStream: store.attach(hackrf.sweep_stream) 或 start_sweep(..., on_sweep=store.add_sweep)
+    """
+
+    def __init__(self, ring_rows=1024, decimate=1, hold="max", freq_bin=1, spill_dir=None):
+        """
+        :param ring_rows: 記憶體中保留的瀑布圖列數
+        :param decimate: 每幾輪掃描合併為一列 (時間抽取)
+        :param hold: 時間抽取與頻率合併的方式，"max" 或 "mean"
+        :param freq_bin: 每幾個頻率 bin 合併為一個 (頻率合併)
+        :param spill_dir: 全解析度資料的溢寫目錄，None 則不寫入磁碟；
+                          目錄中已有先前的紀錄時接續附加 (bin 數需相同)
+        """
+        if hold not in ("max", "mean"):
+            raise ValueError(f"hold 必須為 'max' 或 'mean': {hold}")
+        self.ring_rows = int(ring_rows)
+        self.decimate = max(1, int(decimate))
+        self.hold = hold
+        self.freq_bin = max(1, int(freq_bin))
+        self.spill_dir = spill_dir
+
+        self.num_bins = None
+        self.freq_min_hz = None
+        self.bin_width_hz = None
+        self.total_sweeps = 0
+
+        self._lock = threading.Lock()
+        self._ring = None
+        self._ring_times = np.full(self.ring_rows, np.nan)
+        self._ring_count = 0
+        self._pending = []
+        self._pending_time = None
+
+        self._spectrum_file = None
+        self._times_file = None
+        self.spill_rows = 0
+
+    # ---------------- 輸入 ----------------
+
+    def attach(self, sweep_stream):
+        """訂閱 SweepStream，並沿用其頻率軸"""
+        sweep_stream.subscribe(self._add_from_stream(sweep_stream))
+        return self
+
+    def _add_from_stream(self, sweep_stream):
+        def _callback(sweep):
+            if self.freq_min_hz is None:
+                self.freq_min_hz = sweep_stream.freq_min_hz
+                self.bin_width_hz = sweep_stream.bin_width_hz
+            self.add_sweep(sweep)
+        return _callback
+
+    def add_sweep(self, sweep, timestamp=None):
+        """
+        加入一輪掃描
+        :param sweep: SweepStream 推送的 dict (time, power_db)，或直接傳入 1 維功率陣列
+        :param timestamp: 傳入陣列時的時間 (epoch 秒)，None 為目前時間
+        """
+        if isinstance(sweep, dict):
+            row, timestamp = sweep["power_db"], sweep["time"]
+        else:
+            row = sweep
+        if timestamp is None:
+            # 時間軸需為有效數值，時間區段查詢 (searchsorted) 才正確
+            timestamp = time.time()
+        row = np.asarray(row, dtype=np.float32)
+
+        with self._lock:
+            if self.num_bins is None:
+                self._allocate(len(row))
+            elif len(row) != self.num_bins:
+                raise ValueError(f"掃描長度 {len(row)} 與先前的 {self.num_bins} 不同")
+
+            self.total_sweeps += 1
+            if self.spill_dir:
+                self._spectrum_file.write(row.tobytes())
+                self._times_file.write(np.float64(timestamp).tobytes())
+                self.spill_rows += 1
+
+            if not self._pending:
+                self._pending_time = timestamp
+            self._pending.append(row)
+            if len(self._pending) >= self.decimate:
+                self._push_ring()
+
+    def _allocate(self, num_bins):
+        if self.spill_dir:
+            self._open_spill(num_bins)
+        self.num_bins = num_bins
+        cols = -(-num_bins // self.freq_bin)
+        self._ring = np.full((self.ring_rows, cols), np.nan, dtype=np.float32)
+        if self.spill_dir:
+            self._write_meta()
+
+    def _open_spill(self, num_bins):
+        """開啟溢寫檔；目錄中已有紀錄時檢查格式相同後接續附加，不覆蓋先前的紀錄"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        spectrum_path = os.path.join(self.spill_dir, SPECTRUM_NAME)
+        times_path = os.path.join(self.spill_dir, TIMES_NAME)
+        rows = 0
+        if os.path.exists(os.path.join(self.spill_dir, META_NAME)):
+            for path in (spectrum_path, times_path):
+                open(path, "ab").close()
+            meta, times, _ = load_spill(self.spill_dir)
+            if meta["num_bins"] != num_bins:
+                raise ValueError(
+                    f"溢寫目錄 {self.spill_dir} 的既有紀錄為 {meta['num_bins']} 個 bin，與本次掃描的 {num_bins} 不同"
+                )
+            for key in ("freq_min_hz", "bin_width_hz"):
+                old, new = meta.get(key), getattr(self, key)
+                if old is not None and new is not None and old != new:
+                    raise ValueError(f"溢寫目錄 {self.spill_dir} 的既有紀錄 {key}={old} 與本次的 {new} 不同")
+                if new is None:
+                    setattr(self, key, old)
+            rows = 0 if times is None else len(times)
+            del times
+            # 捨棄上次中斷時寫到一半的列，兩個檔案的列數保持一致
+            os.truncate(spectrum_path, rows * 4 * num_bins)
+            os.truncate(times_path, rows * 8)
+
+        self._spectrum_file = open(spectrum_path, "ab")
+        self._times_file = open(times_path, "ab")
+        self.spill_rows = rows
+
+    def _push_ring(self):
+        """將累積的掃描做時間抽取與頻率合併後寫入環形緩衝區 (呼叫端需持有 lock)"""
+        block = np.stack(self._pending)
+        row = block[0] if len(block) == 1 else _reduce(block, self.hold, axis=0)
+        if self.freq_bin > 1:
+            cols = self._ring.shape[1]
+            padded = np.full(cols * self.freq_bin, np.nan, dtype=np.float32)
+            padded[:len(row)] = row
+            row = _reduce(padded.reshape(cols, self.freq_bin), self.hold, axis=1)
+
+        slot = self._ring_count % self.ring_rows
+        self._ring[slot] = row
+        self._ring_times[slot] = self._pending_time
+        self._ring_count += 1
+        self._pending = []
+
+    # ---------------- 查詢 ----------------
+
+    def latest(self, n=None):
+        """
+        環形緩衝區中最新的 n 列 (依時間由舊到新)
+        :return: tuple (times [n], rows [n, cols])
+        """
+        with self._lock:
+            if self._ring is None:
+                return np.empty(0), np.empty((0, 0), dtype=np.float32)
+            filled = min(self._ring_count, self.ring_rows)
+            n = filled if n is None else min(n, filled)
+            idx = (self._ring_count - n + np.arange(n)) % self.ring_rows
+            return self._ring_times[idx].copy(), self._ring[idx].copy()
+
+    def query(self, t0=None, t1=None, full_resolution=False):
+        """
+        查詢時間區段 [t0, t1] 的資料
+        :param full_resolution: True 時從磁碟讀取全解析度資料 (需設定 spill_dir)，
+                                否則從記憶體中的 (已抽取 / 合併的) 環形緩衝區取得
+        :return: tuple (times, rows)；全解析度時 rows 為 memmap 切片，不會整檔載入
+        """
+        if not full_resolution:
+            times, rows = self.latest()
+            mask = np.ones(len(times), dtype=bool)
+            if t0 is not None:
+                mask &= times >= t0
+            if t1 is not None:
+                mask &= times <= t1
+            return times[mask], rows[mask]
+
+        if not self.spill_dir:
+            raise ValueError("未設定 spill_dir，無法查詢全解析度資料")
+        self.flush()
+        _, times, spectrum = load_spill(self.spill_dir)
+        if times is None:
+            return np.empty(0), np.empty((0, self.num_bins or 0), dtype=np.float32)
+        lo = 0 if t0 is None else int(np.searchsorted(times, t0, side="left"))
+        hi = len(times) if t1 is None else int(np.searchsorted(times, t1, side="right"))
+        return times[lo:hi], spectrum[lo:hi]
+
+    def frequencies(self, binned=True):
+        """
+        頻率軸 (各 bin 起始頻率，Hz)；未知時回傳 None
+        :param binned: True 為環形緩衝區 (頻率合併後) 的頻率軸，False 為全解析度
+        """
+        if self.num_bins is None or self.freq_min_hz is None:
+            return None
+        if binned:
+            cols = self._ring.shape[1]
+            return self.freq_min_hz + np.arange(cols) * self.bin_width_hz * self.freq_bin
+        return self.freq_min_hz + np.arange(self.num_bins) * self.bin_width_hz
+
+    # ---------------- 磁碟 ----------------
+
+    def _write_meta(self):
+        meta = {
+            "num_bins": self.num_bins,
+            "freq_min_hz": self.freq_min_hz,
+            "bin_width_hz": self.bin_width_hz,
+            "rows": self.spill_rows,
+        }
+        tmp = os.path.join(self.spill_dir, META_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.spill_dir, META_NAME))
+
+    def flush(self) -> None:
+        """將緩衝中的資料寫入磁碟"""
+        with self._lock:
+            if self._spectrum_file is not None:
+                self._spectrum_file.flush()
+                self._times_file.flush()
+                self._write_meta()
+
+    def close(self) -> None:
+        """寫出尚未滿 decimate 的最後一列並關閉溢寫檔"""
+        with self._lock:
+            if self._pending:
+                self._push_ring()
+        self.flush()
+        with self._lock:
+            if self._spectrum_file is not None:
+                self._spectrum_file.close()
+                self._times_file.close()
+                self._spectrum_file = None
+                self._times_file = None
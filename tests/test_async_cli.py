@@ -0,0 +1,78 @@
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from hackrf.async_cli import AsyncHackRF
+from hackrf.process_monitor import terminate_tracked, tracked_processes
+
+from test_process_monitor import ROOT, _alive
+
+
+def test_spawned_session_is_tracked_until_it_ends():
+    async def scenario():
+        hackrf = AsyncHackRF()
+        session = await hackrf._spawn(["sleep", "60"], "sleep")
+        assert session.process.pid in [p.pid for p in tracked_processes(owner=hackrf.cli)]
+        # 同步的登錄表清理 (atexit / 信號處理) 也能終止 asyncio 子程序
+        assert terminate_tracked(owner=hackrf.cli, timeout=1.0) == 1
+        assert await asyncio.wait_for(session.wait(), 5) != 0
+        assert tracked_processes(owner=hackrf.cli) == []
+
+    asyncio.run(scenario())
+
+
+CHILD = textwrap.dedent("""
+    import asyncio, sys
+    sys.path[:0] = [{src!r}, {hackrf!r}]
+    from hackrf.async_cli import AsyncHackRF
+
+    async def main():
+        session = await AsyncHackRF()._spawn(["sleep", "60"], "sleep")
+        print(session.process.pid, flush=True)
+
+    # 未等待 session 即結束事件迴圈
+    asyncio.run(main())
+""").format(src=os.path.join(ROOT, "src"), hackrf=os.path.join(ROOT, "src", "hackrf"))
+
+
+def test_closing_event_loop_stops_running_session():
+    parent = subprocess.Popen([sys.executable, "-c", CHILD], stdout=subprocess.PIPE, text=True)
+    child_pid = int(parent.stdout.readline())
+    assert parent.wait(timeout=10) == 0
+
+    deadline = time.monotonic() + 5
+    while _alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(child_pid)
+
+
+def test_sweep_and_rx_match_sync_signatures(tmp_path):
+    from hackrf.sim_backend import install_stub_executables
+
+    paths = install_stub_executables(str(tmp_path / "bin"), speed=20.0)
+
+    async def scenario():
+        hackrf = AsyncHackRF(transfer_exec=paths["transfer_exec"], sweep_exec=paths["sweep_exec"])
+        # 與 HackRFCLI.start_sweep 相同的位置參數順序 (output_file 在前)
+        session = await hackrf.start_sweep(None, 2400, 2500, bin_width_hz=100000, num_sweeps=3)
+        sweeps = [sweep async for sweep in session.sweeps()]
+        assert await session.wait() == 0
+        assert sweeps and len(sweeps[0]["power_db"]) == 1000
+
+        out = tmp_path / "sweep.csv"
+        session = await hackrf.start_sweep(str(out), 2400, 2500, num_sweeps=1)
+        assert await session.wait() == 0
+        assert out.stat().st_size > 0
+
+        # stdout 的原始 I/Q 必須交給 on_data
+        assert await hackrf.start_rx("-", 915500000) is None
+        received = []
+        session = await hackrf.start_rx("-", 915500000, sample_rate_hz=1000000, num_samples=100000,
+                                        on_data=received.append)
+        assert await session.wait() == 0
+        assert sum(map(len, received)) == 200000
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import json
+import os
+
+from hackrf.bin_cache import BasebandCache
+
+
+def _commit(cache, key, size):
+    with open(cache.temp_path_for(key), "wb") as f:
+        f.write(b"\0" * size)
+    return cache.commit(key)
+
+
+def _manifest_keys(cache_dir):
+    with open(os.path.join(cache_dir, "manifest.json"), encoding="utf-8") as f:
+        return set(json.load(f)["entries"])
+
+
+def test_instances_merge_manifest(tmp_path):
+    a = BasebandCache(str(tmp_path))
+    b = BasebandCache(str(tmp_path))
+    _commit(a, "aa", 10)
+    _commit(b, "bb", 10)
+    _commit(a, "cc", 10)
+
+    assert _manifest_keys(str(tmp_path)) == {"aa", "bb", "cc"}
+    # 其他實例寫入的項目也查得到
+    assert a.lookup("bb") and b.lookup("cc")
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_evict_counts_untracked_files(tmp_path):
+    orphan = tmp_path / "dd.bin"
+    orphan.write_bytes(b"\0" * 60)
+    os.utime(orphan, (0, 0))
+    cache = BasebandCache(str(tmp_path), max_bytes=100)
+    _commit(cache, "aa", 30)
+    assert orphan.exists()
+
+    # 30 + 60 + 30 > 100: 最舊的未記錄檔案先淘汰
+    _commit(cache, "bb", 30)
+    assert not orphan.exists()
+    assert _manifest_keys(str(tmp_path)) == {"aa", "bb"}
+    assert cache.lookup("aa") and cache.lookup("bb")
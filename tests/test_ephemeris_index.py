@@ -0,0 +1,57 @@
+import datetime
+
+import numpy as np
+
+from hackrf.ephemeris_index import EphemerisIndex, shift_nav_file
+from hackrf.rinex_nav import parse_rinex_nav
+
+NAV = """\
+     2              NAVIGATION DATA                         RINEX VERSION / TYPE
+CCRINEXN V1.6.0 UX  CDDIS               04-DEC-25 02:18     PGM / RUN BY / DATE 
+IGS BROADCAST EPHEMERIS FILE                                COMMENT             
+    0.3260D-07  0.2235D-07 -0.1192D-06  0.5960D-07          ION ALPHA           
+    0.1536D+06 -0.1802D+06  0.0000D+00  0.1966D+06          ION BETA            
+   -0.279396772385D-08-0.355271367880D-14   589824     2395 DELTA-UTC: A0,A1,T,W
+    18                                                      LEAP SECONDS        
+                                                            END OF HEADER       
+ 1 25 12  4  0  0  0.0 0.353004317731D-03-0.136424205266D-11 0.000000000000D+00
+    0.123000000000D+03-0.685312500000D+02 0.497806449923D-08 0.131414159568D+01
+   -0.344775617123D-05 0.113078427967D-02-0.170990824699D-05 0.515364207840D+04
+    0.345600000000D+06 0.242143869400D-07-0.151755365883D+01 0.130385160446D-07
+    0.958300060587D+00 0.408125000000D+03-0.958594626457D-01-0.875822195796D-08
+   -0.272511351192D-09 0.100000000000D+01 0.239500000000D+04 0.000000000000D+00
+    0.200000000000D+01 0.000000000000D+00-0.884756445885D-08 0.635000000000D+03
+    0.338418000000D+06 0.400000000000D+01 0.000000000000D+00 0.000000000000D+00
+"""
+
+
+def test_shift_nav_file_moves_times_by_whole_days(tmp_path):
+    src = tmp_path / "brdc3380.25n"
+    src.write_text(NAV)
+    dst = tmp_path / "shifted.25n"
+    shift_nav_file(str(src), str(dst), 10)
+
+    a, _ = parse_rinex_nav(str(src))
+    b, _ = parse_rinex_nav(str(dst))
+    delta = 10 * 86400
+    assert b["epoch"][0] == a["epoch"][0] + np.timedelta64(delta, "s")
+    # 跨週: 週數與 TOE 一起平移
+    assert b["week"][0] == a["week"][0] + 2 and b["toe"][0] == 0
+    assert b["week"][0] * 604800 + b["toe"][0] == a["week"][0] * 604800 + a["toe"][0] + delta
+    assert b["week"][0] * 604800 + b["transmit_time"][0] == a["week"][0] * 604800 + a["transmit_time"][0] + delta
+    for name in ("prn", "af0", "m0", "e", "sqrt_a", "omega0", "i0", "omega", "sv_health"):
+        assert b[name][0] == a[name][0]
+
+
+def test_shifted_copy_targets_requested_day(tmp_path):
+    (tmp_path / "brdc3380.25n").write_text(NAV)
+    index = EphemerisIndex(str(tmp_path))
+    entry = index.refresh()[0]
+    src = index.path_of(entry)
+
+    assert index.shifted_copy(src, when=datetime.datetime(2025, 12, 4, 1)) is None
+    path = index.shifted_copy(src, when=datetime.datetime(2026, 1, 20, 6))
+    b, _ = parse_rinex_nav(path)
+    assert b["epoch"][0] == np.datetime64("2026-01-20T00:00:00")
+    # 平移後的副本不列入索引
+    assert [e["file"] for e in index.refresh()] == ["brdc3380.25n"]
@@ -0,0 +1,86 @@
+import datetime
+import stat
+import sys
+import textwrap
+
+from hackrf.fake_gps import FakeGPS
+from hackrf.parallel_gen import read_first_nav_epoch
+
+from test_ephemeris_index import NAV
+
+# gps-sdr-sim 替身: 記錄使用的星曆 (-e) 到輸出檔
+SIM_STUB = textwrap.dedent(f"""\
+    #!{sys.executable}
+    import sys
+    args = sys.argv[1:]
+    with open(args[args.index("-o") + 1], "w") as f:
+        f.write(args[args.index("-e") + 1])
+""")
+
+
+def _stub_sim(tmp_path):
+    sim = tmp_path / "gps-sdr-sim"
+    sim.write_text(SIM_STUB)
+    sim.chmod(sim.stat().st_mode | stat.S_IXUSR)
+    return str(sim)
+
+
+def test_static_library_uses_one_resolved_ephemeris(tmp_path, monkeypatch):
+    old_eph, new_eph = tmp_path / "brdc0010.26n", tmp_path / "brdc0020.26n"
+    old_eph.write_text("old")
+    new_eph.write_text("new")
+    gps = FakeGPS(
+        gps_sim_exe_path=_stub_sim(tmp_path),
+        cache_dir=str(tmp_path / "cache"),
+        static_library_dir=str(tmp_path / "library"),
+        ephemeris_dir=None,
+    )
+
+    # 第一次解析得到舊星曆，之後 (背景下載完成) 改為新星曆
+    resolved = []
+
+    def _resolve(path):
+        resolved.append(path)
+        return str(old_eph) if len(resolved) == 1 else str(new_eph)
+
+    monkeypatch.setattr(gps, "_resolve_ephemeris", _resolve)
+    coords = [(25.0, 121.5, 10.0), (25.1, 121.6, 20.0), (25.2, 121.7, 30.0)]
+    assert gps.precompute_static_library(coords=coords, background=False)
+
+    assert len(resolved) == 1
+    for c in coords:
+        path = gps.static_library.lookup(c, str(old_eph), gps.static_duration)
+        assert path and open(path).read() == str(old_eph)
+
+
+def test_visibility_check_uses_shifted_ephemeris(tmp_path, monkeypatch):
+    eph_dir = tmp_path / "ephemeris"
+    eph_dir.mkdir()
+    (eph_dir / "brdc3380.25n").write_text(NAV)
+    gps = FakeGPS(
+        gps_sim_exe_path=_stub_sim(tmp_path),
+        cache_dir=None,
+        static_library_dir=None,
+        ephemeris_dir=str(eph_dir),
+    )
+    gps.ephemeris_index.refresh()
+    monkeypatch.setattr(gps, "_resolve_ephemeris", lambda path: path)
+
+    checked = []
+
+    def _check(ephemeris_file_path, *args, **kwargs):
+        checked.append(ephemeris_file_path)
+        return {"problems": []}
+
+    monkeypatch.setattr(gps, "check_visibility", _check)
+    assert gps.generate_bin(
+        str(tmp_path / "out" / "gpssim.bin"),
+        ephemeris_file_path=str(eph_dir / "brdc3380.25n"),
+        static_mode=True,
+        manual_coords=(25.0, 121.5, 10.0),
+        visibility_check=True,
+    )
+
+    # 檢查用的星曆起始於今天 (與 -T 平移後的 gps-sdr-sim 一致)
+    assert len(checked) == 1 and checked[0] != str(eph_dir / "brdc3380.25n")
+    assert read_first_nav_epoch(checked[0]).date() == datetime.datetime.utcnow().date()
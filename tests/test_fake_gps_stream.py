@@ -0,0 +1,71 @@
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+
+from hackrf.fake_gps import FakeGPS
+from hackrf.get_latest_brdc import get_brdc_url
+from hackrf.sim_backend import install_stub_executables
+from hackrf_wrapper import HackRFCLI
+
+SAMPLE_RATE = 1000000
+BURSTS = 5
+BURST_BYTES = SAMPLE_RATE * 2 // 5  # 0.2 秒的 8-bit I/Q
+
+# gps-sdr-sim 替身: 以 -o - 分批輸出，批次之間暫停 (供應不及時下游應記錄 underrun)
+SIM_STUB = textwrap.dedent(f"""\
+    #!{sys.executable}
+    import sys, time
+    assert sys.argv[sys.argv.index("-o") + 1] == "-"
+    for k in range({BURSTS}):
+        sys.stdout.buffer.write(bytes([k]) * {BURST_BYTES})
+        sys.stdout.buffer.flush()
+        time.sleep(0.3)
+""")
+
+
+@pytest.fixture
+def simulator(tmp_path):
+    sim = tmp_path / "gps-sdr-sim"
+    sim.write_text(SIM_STUB)
+    sim.chmod(sim.stat().st_mode | stat.S_IXUSR)
+
+    # 星曆目錄中已有當日的星曆檔 (不需下載)
+    eph_dir = tmp_path / "ephemeris"
+    eph_dir.mkdir()
+    eph = eph_dir / get_brdc_url()[1].replace(".gz", "")
+    eph.write_text("")
+
+    hackrf = HackRFCLI(**install_stub_executables(str(tmp_path / "bin"), speed=20.0))
+    gps = FakeGPS(
+        gps_sim_exe_path=str(sim),
+        cache_dir=str(tmp_path / "cache"),
+        static_library_dir=str(tmp_path / "library"),
+        ephemeris_dir=str(eph_dir),
+        ephemeris_time_shift=False,
+        hackrf=hackrf,
+    )
+    return gps, str(eph)
+
+
+@pytest.mark.parametrize("use_fifo", [False, True])
+def test_stream_transmit_through_stub_tools(simulator, tmp_path, use_fifo):
+    gps, eph = simulator
+    stats = gps.stream_transmit(
+        ephemeris_file_path=eph,
+        static_mode=True,
+        manual_coords=(25.0, 121.5, 100.0),
+        sample_rate=SAMPLE_RATE,
+        fifo_path=str(tmp_path / "iq.fifo") if use_fifo else None,
+        prebuffer_s=0.1,
+    )
+    assert stats is not None
+    assert stats["bytes_in"] == stats["bytes_out"] == BURSTS * BURST_BYTES
+    assert stats["underruns"] >= 1
+    # hackrf_transfer 替身收到全部資料 (統計行的 MiB 為 10^6 bytes)
+    assert gps.hackrf.supervisor.returncode == 0
+    assert gps.hackrf.supervisor.total_mib == pytest.approx(BURSTS * BURST_BYTES / 1e6, abs=0.01)
+    if use_fifo:
+        assert stat.S_ISFIFO(os.stat(tmp_path / "iq.fifo").st_mode)
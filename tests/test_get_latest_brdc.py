@@ -0,0 +1,144 @@
+import gzip
+import http.server
+import os
+import re
+import threading
+
+import pytest
+
+from hackrf.get_latest_brdc import _gunzip_to_file, download_file, load_manifest
+
+
+@pytest.mark.parametrize("chunks", [[], [b""]])
+def test_gunzip_rejects_empty_body(tmp_path, chunks):
+    out = tmp_path / "brdc0010.26n"
+    with pytest.raises(EOFError):
+        _gunzip_to_file(iter(chunks), str(out))
+    assert not out.exists()
+    assert not (tmp_path / "brdc0010.26n.tmp").exists()
+
+
+def test_gunzip_concatenated_members(tmp_path):
+    out = tmp_path / "brdc0010.26n"
+    _gunzip_to_file(iter([gzip.compress(b"abc") + gzip.compress(b"def")]), str(out))
+    assert out.read_bytes() == b"abcdef"
+
+
+# ---------------- download_file (本地 HTTP 替身伺服器) ----------------
+
+class _BrdcHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.payload
+
+        if server.force_status:
+            self.send_response(server.force_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.end_headers()
+            return
+
+        start = 0
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range") == server.etag:
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", server.etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+
+        if server.cut_after is not None:
+            # 送出部分內容後中斷連線
+            self.wfile.write(body[start:start + server.cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _BrdcHandler)
+    httpd.requests = []
+    httpd.etag = '"v1"'
+    httpd.payload = gzip.compress(os.urandom(300_000))
+    httpd.force_status = None
+    httpd.cut_after = None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/brdc0010.26n.gz"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _download(server, save_dir, refresh=False):
+    return download_file(server.url, "brdc0010.26n.gz", str(save_dir), "user", "password", refresh=refresh)
+
+
+def _interrupted_download(server, save_dir):
+    server.cut_after = 150_000
+    assert _download(server, save_dir) is None
+    server.cut_after = None
+    part = save_dir / "brdc0010.26n.gz.part"
+    assert 0 < part.stat().st_size < len(server.payload)
+    return part
+
+
+def test_first_download_records_etag(server, tmp_path):
+    path = _download(server, tmp_path)
+    assert open(path, "rb").read() == gzip.decompress(server.payload)
+    assert load_manifest(str(tmp_path))["brdc0010.26n.gz"]["etag"] == '"v1"'
+    assert not (tmp_path / "brdc0010.26n.gz.part").exists()
+
+
+def test_refresh_not_modified(server, tmp_path):
+    path = _download(server, tmp_path)
+    assert _download(server, tmp_path, refresh=True) == path
+    assert server.requests[-1]["If-None-Match"] == '"v1"'
+    assert open(path, "rb").read() == gzip.decompress(server.payload)
+
+
+def test_resume_with_range(server, tmp_path):
+    part = _interrupted_download(server, tmp_path)
+    offset = part.stat().st_size
+
+    path = _download(server, tmp_path)
+    assert server.requests[-1]["Range"] == f"bytes={offset}-"
+    assert server.requests[-1]["If-Range"] == '"v1"'
+    assert open(path, "rb").read() == gzip.decompress(server.payload)
+    assert not part.exists()
+
+
+def test_resume_restarts_when_file_changed(server, tmp_path):
+    part = _interrupted_download(server, tmp_path)
+    # 伺服器上的檔案已更新: If-Range 不符，回傳完整內容 (200)
+    server.etag = '"v2"'
+    server.payload = gzip.compress(os.urandom(200_000))
+
+    path = _download(server, tmp_path)
+    assert server.requests[-1]["If-Range"] == '"v1"'
+    assert open(path, "rb").read() == gzip.decompress(server.payload)
+    assert load_manifest(str(tmp_path))["brdc0010.26n.gz"]["etag"] == '"v2"'
+    assert not part.exists()
+
+
+def test_range_not_satisfiable_discards_part(server, tmp_path):
+    part = _interrupted_download(server, tmp_path)
+    server.force_status = 416
+
+    assert _download(server, tmp_path) is None
+    assert not part.exists()
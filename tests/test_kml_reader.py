@@ -0,0 +1,27 @@
+import pytest
+
+from hackrf.kml_reader import load_kml_track
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2"><Document>
+  <Placemark><name>a</name><LineString><coordinates>
+    121.5,25.0,10 121.6,25.1,10
+  </coordinates></LineString></Placemark>
+  <Placemark><name>b</name><LineString><coordinates>
+    121.7,25.2,20
+  </coordinates></LineString></Placemark>
+</Document></kml>
+"""
+
+
+def test_multiple_tracks_require_concat(tmp_path):
+    kml = tmp_path / "route.kml"
+    kml.write_text(KML)
+
+    with pytest.raises(ValueError):
+        load_kml_track(str(kml), track=[0, 2])
+    with pytest.raises(ValueError):
+        load_kml_track(str(kml), track=[0, "b"])
+
+    assert load_kml_track(str(kml), track=[1]).tolist() == [[25.2, 121.7, 20.0]]
+    assert len(load_kml_track(str(kml), track=[0, "b"], concat=True)) == 3
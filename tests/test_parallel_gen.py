@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from hackrf.parallel_gen import (
+    DEFAULT_WINDOW_S,
+    MAX_WINDOW_EPOCHS,
+    USER_MOTION_SIZE,
+    split_motion_csv,
+)
+from hackrf.trajectory import write_track_csv
+
+
+def _route(seconds):
+    n = int(seconds * 10) + 1
+    return np.column_stack([
+        np.arange(n) / 10.0,
+        np.linspace(25.0, 25.1, n),
+        np.linspace(121.5, 121.6, n),
+        np.full(n, 100.0),
+    ])
+
+
+def test_split_long_route_fits_user_motion_size(tmp_path):
+    csv_file = tmp_path / "route.csv"
+    write_track_csv(_route(750.0), str(csv_file))
+
+    segments = split_motion_csv(str(csv_file), str(tmp_path / "seg"))
+
+    assert len(segments) == 3
+    for seg in segments:
+        rows = sum(1 for _ in open(seg["csv"]))
+        assert rows <= USER_MOTION_SIZE
+        # N 列軌跡產生 N-1 個 epoch
+        assert seg["epochs"] == rows - 1
+    assert [s["epochs"] for s in segments[:-1]] == [MAX_WINDOW_EPOCHS] * 2
+    assert sum(s["epochs"] for s in segments) == 7500
+    assert segments[1]["offset_s"] == pytest.approx(DEFAULT_WINDOW_S)
+
+
+def test_split_rejects_window_over_limit(tmp_path):
+    csv_file = tmp_path / "route.csv"
+    write_track_csv(_route(400.0), str(csv_file))
+
+    with pytest.raises(ValueError):
+        split_motion_csv(str(csv_file), str(tmp_path / "seg"), window_s=300)
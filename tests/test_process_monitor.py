@@ -0,0 +1,61 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = textwrap.dedent("""
+    import subprocess, sys, time
+    sys.path[:0] = [{src!r}, {hackrf!r}]
+    from hackrf.process_monitor import register_process
+    p = subprocess.Popen(["sleep", "60"], start_new_session=True)
+    register_process(p)
+    print(p.pid, flush=True)
+    time.sleep(60)
+""").format(src=os.path.join(ROOT, "src"), hackrf=os.path.join(ROOT, "src", "hackrf"))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # 殭屍程序 (尚未被回收) 視為已結束
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split(")")[-1].split()[0] != "Z"
+
+
+@pytest.mark.parametrize("sig", [signal.SIGTERM, signal.SIGHUP])
+def test_termination_signal_stops_tracked_children(sig):
+    parent = subprocess.Popen([sys.executable, "-c", CHILD], stdout=subprocess.PIPE, text=True)
+    child_pid = int(parent.stdout.readline())
+    assert _alive(child_pid)
+
+    parent.send_signal(sig)
+    # 原處理方式 (預設) 仍會讓程式以該信號結束
+    assert parent.wait(timeout=10) == -sig
+
+    deadline = time.monotonic() + 5
+    while _alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _alive(child_pid)
+
+
+def test_on_exit_runs_each_callback_once():
+    from hackrf.process_monitor import ProcessSupervisor
+
+    for _ in range(50):
+        process = subprocess.Popen(["true"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        supervisor = ProcessSupervisor(process).start()
+        calls = []
+        # 在程序結束前後的任意時間點訂閱
+        supervisor.on_exit(calls.append)
+        supervisor.wait(timeout=5)
+        supervisor.on_exit(calls.append)
+        supervisor._thread.join(timeout=5)
+        assert calls == [0, 0]
@@ -0,0 +1,21 @@
+import time
+
+from hackrf.ring_capture import RingCapture
+
+
+def test_wait_capture_with_baseline_sees_capture_finished_between_polls(tmp_path):
+    ring = RingCapture(1000, str(tmp_path), pre_s=0.1, post_s=0.1, trigger_db=None)
+    baseline = ring.capture_count
+    ring.feed(bytes(400))
+    ring.snapshot()
+    ring.feed(bytes(400))
+
+    # 快照在兩次輪詢之間寫入完成
+    deadline = time.monotonic() + 5
+    while ring.capture_count == baseline and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert ring.wait_capture(timeout=0.05) is None
+    path = ring.wait_capture(timeout=0.05, after=baseline)
+    assert path == ring.captures[-1]
+    assert (tmp_path / path.split("/")[-1]).stat().st_size == 400
@@ -0,0 +1,25 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from hackrf.signal_sources import file_source
+
+
+def test_file_source_rejects_empty_file(tmp_path):
+    empty = tmp_path / "empty.iq"
+    empty.write_bytes(b"")
+    # 呼叫時即拒絕，不會在 repeat=None 時空轉
+    with pytest.raises(ValueError):
+        file_source(str(empty), repeat=None)
+
+
+def test_file_source_repeats_blocks(tmp_path):
+    path = tmp_path / "replay.iq"
+    path.write_bytes(bytes(range(10)))
+    blocks = list(file_source(str(path), repeat=2, block_bytes=4))
+    assert [len(b) for b in blocks] == [4, 4, 2, 4, 4, 2]
+    assert np.concatenate(blocks).tolist() == list(range(10)) * 2
+
+    endless = file_source(str(path), repeat=None, block_bytes=4)
+    assert len(list(itertools.islice(endless, 7))) == 7
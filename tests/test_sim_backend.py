@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from hackrf.fast_replay import HackRFReplayAttacker
+from hackrf.sim_backend import install_stub_executables
+from hackrf_wrapper import HackRFCLI
+
+SAMPLE_RATE = 2000000
+
+
+@pytest.fixture
+def cli(tmp_path, monkeypatch):
+    # 系統 PATH 上沒有 HackRF Tools 的環境 (例如 CI)
+    monkeypatch.setenv("PATH", os.defpath)
+    return HackRFCLI(**install_stub_executables(str(tmp_path / "bin"), speed=20.0))
+
+
+def test_tx_rx_and_sweep(cli, tmp_path):
+    tx_file = tmp_path / "tx.bin"
+    np.full(SAMPLE_RATE, 20, dtype=np.int8).tofile(tx_file)
+    assert cli.start_tx(str(tx_file), 1575420000, sample_rate_hz=SAMPLE_RATE)
+    assert cli.supervisor.wait(timeout=10) == 0
+    samples = cli.throughput_samples()
+    assert samples
+    # 統計行的 "MiB" 為 10^6 bytes
+    assert samples[-1]["total_mib"] == pytest.approx(tx_file.stat().st_size / 1e6, abs=0.05)
+
+    rx_file = tmp_path / "rx.bin"
+    assert cli.start_rx(str(rx_file), 915500000, sample_rate_hz=SAMPLE_RATE, num_samples=SAMPLE_RATE // 2)
+    assert cli.supervisor.wait(timeout=10) == 0
+    assert rx_file.stat().st_size == SAMPLE_RATE
+
+    sweeps = []
+    assert cli.start_sweep(None, 2400, 2500, bin_width_hz=100000, num_sweeps=5, binary=True,
+                           on_sweep=sweeps.append)
+    assert cli.supervisor.wait(timeout=10) == 0
+    assert len(sweeps) >= 4
+
+
+def test_replay_cycle(cli, tmp_path):
+    capture = tmp_path / "capture.bin"
+    attacker = HackRFReplayAttacker(
+        max_freq=433_920_000, min_freq=433_880_000, sample_rate=SAMPLE_RATE, rx_gain=16, tx_gain=0,
+        duration=0.5, tx_count=1, filename=str(capture), hackrf=cli,
+    )
+    attacker.record_capture()
+    assert capture.stat().st_size == SAMPLE_RATE
+
+    attacker.run_replay()
+    assert cli.supervisor.returncode == 0
+    assert cli.throughput_samples()[-1]["total_mib"] == pytest.approx(SAMPLE_RATE / 1e6, abs=0.05)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+
+from hackrf.stream_pump import StreamPump
+
+CHUNKS = [bytes([n]) * 4096 for n in range(32)]
+PAYLOAD = b"".join(CHUNKS)
+
+
+def test_pump_to_process_stdin(tmp_path):
+    out = tmp_path / "out.bin"
+    with open(out, "wb") as f:
+        reader = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=f)
+    pump = StreamPump(iter(CHUNKS), reader.stdin, queue_chunks=4, prebuffer_chunks=2).start()
+
+    assert pump.join(timeout=5)
+    assert reader.wait(timeout=5) == 0
+    assert pump.error is None
+    assert out.read_bytes() == PAYLOAD
+    assert pump.stats()["bytes_out"] == len(PAYLOAD)
+
+
+def test_pump_waits_for_fifo_reader(tmp_path):
+    fifo = str(tmp_path / "iq.fifo")
+    out = tmp_path / "out.bin"
+    os.mkfifo(fifo)
+    pump = StreamPump(iter(CHUNKS), fifo, queue_chunks=4, prebuffer_chunks=2).start()
+
+    # 讀取端晚一點才開啟 FIFO
+    assert not pump.join(timeout=0.3)
+    with open(out, "wb") as f:
+        reader = subprocess.Popen(["cat", fifo], stdout=f)
+
+    assert pump.join(timeout=5)
+    assert reader.wait(timeout=5) == 0
+    assert pump.error is None
+    assert out.read_bytes() == PAYLOAD
+
+
+def test_fifo_open_gives_up_when_reader_exits(tmp_path):
+    fifo = str(tmp_path / "iq.fifo")
+    os.mkfifo(fifo)
+    reader = subprocess.Popen(["true"])
+    pump = StreamPump(iter(CHUNKS), fifo, reader=reader).start()
+
+    assert pump.join(timeout=5)
+    assert isinstance(pump.error, BrokenPipeError)
+    assert pump.stats()["bytes_out"] == 0
+
+
+def test_stop_while_waiting_for_fifo_reader(tmp_path):
+    fifo = str(tmp_path / "iq.fifo")
+    os.mkfifo(fifo)
+    pump = StreamPump(iter(CHUNKS), fifo).start()
+
+    assert not pump.join(timeout=0.2)
+    pump.stop()
+    assert pump.join(timeout=2)
+    assert pump.error is None
@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+import pytest
+
+from hackrf.waterfall import WaterfallStore
+
+
+def test_bare_array_without_timestamp_uses_current_time(tmp_path):
+    store = WaterfallStore(ring_rows=8, spill_dir=str(tmp_path / "spill"))
+    t0 = time.time()
+    for k in range(3):
+        store.add_sweep(np.full(4, k, dtype=np.float32))
+    t1 = time.time()
+
+    times, rows = store.query(t0, t1, full_resolution=True)
+    assert len(times) == 3 and np.all((times >= t0) & (times <= t1))
+    assert rows[:, 0].tolist() == [0, 1, 2]
+    times, rows = store.query(t0, t1)
+    assert len(times) == 3 and not np.isnan(times).any()
+    store.close()
+
+
+def test_new_store_appends_to_existing_spill(tmp_path):
+    spill = str(tmp_path / "spill")
+    first = WaterfallStore(spill_dir=spill)
+    for k in range(3):
+        first.add_sweep(np.full(4, k, dtype=np.float32), timestamp=100.0 + k)
+    first.close()
+
+    second = WaterfallStore(spill_dir=spill)
+    second.add_sweep(np.full(4, 9, dtype=np.float32), timestamp=200.0)
+    times, rows = second.query(full_resolution=True)
+    assert times.tolist() == [100.0, 101.0, 102.0, 200.0]
+    assert rows[:, 0].tolist() == [0, 1, 2, 9]
+    assert second.spill_rows == 4
+    second.close()
+
+    with pytest.raises(ValueError):
+        WaterfallStore(spill_dir=spill).add_sweep(np.zeros(5, dtype=np.float32), timestamp=300.0)